@@ -0,0 +1,52 @@
+import sys
+import os
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyautogui
+from src.screen_capture import BACKENDS, get_backend
+
+
+def measure(grab, seconds: float) -> float:
+    """在给定时间内反复截图，返回每秒帧数"""
+    grab()
+    frames = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        grab()
+        frames += 1
+    return frames / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="比较各截图后端整屏和区域截图的帧率，"
+                    "无显示器时可用 xvfb-run -s '-screen 0 1920x1080x24' 运行")
+    parser.add_argument("--region", default="40,30,320,80", help="区域截图的 left,top,width,height")
+    parser.add_argument("--seconds", type=float, default=2.0, help="每种方式测量的时间（秒）")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="逗号分隔的后端列表")
+    args = parser.parse_args()
+
+    region = tuple(int(value) for value in args.region.split(","))
+    left, top, width, height = region
+    cases = [
+        # 现有路径：整屏截图后再裁剪
+        ("当前 整屏", lambda: pyautogui.screenshot()),
+        ("当前 整屏+裁剪", lambda: pyautogui.screenshot().crop((left, top, left + width, top + height))),
+    ]
+    for name in args.backends.split(","):
+        backend = get_backend(name)
+        cases.append((f"{name} 整屏", lambda backend=backend: backend.grab()))
+        cases.append((f"{name} 区域", lambda backend=backend: backend.grab(region)))
+
+    print(f"屏幕 {pyautogui.size()}，区域 {region}")
+    print(f"{'方式':<20}{'帧率(FPS)':>12}")
+    print("-" * 32)
+    for name, grab in cases:
+        print(f"{name:<20}{measure(grab, args.seconds):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import sys
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.groq_controller import GroqController
+from src.groq_errors import GroqControllerError
+from src.groq_replay import ReplayClient, make_record
+from src.element_locator import build_locate_prompt, parse_locations
+from scripts.benchmark_image_encoding import synthetic_screenshot
+
+STAGES = ["capture", "analyze", "parse", "click", "total"]
+
+
+def synthetic_records(controller: GroqController, labels, latency: float):
+    """没有录制文件时，为定位提示词构造一条回放记录"""
+    kwargs = {
+        "messages": [{"role": "user", "content": [
+            {"type": "text", "text": build_locate_prompt(labels)},
+            {"type": "image_url", "image_url": {"url": ""}},
+        ]}],
+        "model": controller.model,
+        "max_tokens": 500,
+        "temperature": 0.0,
+        "response_format": {"type": "json_object"},
+    }
+    text = '{"%s": {"x": 0.62, "y": 0.91, "w": 0.1, "h": 0.05, "confidence": 0.9}}' % labels[0]
+    return [make_record(kwargs, text, latency)]
+
+
+def run_iteration(controller, base_image, labels, index, click):
+    """执行一次 截图 → 分析 → 解析 → 点击，返回各阶段耗时"""
+    timings = {}
+    start = time.perf_counter()
+
+    # 每帧画上不同的帧号，避免命中编码缓存
+    image = base_image.copy()
+    ImageDraw.Draw(image).text((10, 10), f"frame {index}", fill="white")
+    timings["capture"] = time.perf_counter() - start
+
+    stage = time.perf_counter()
+    text = controller.analyze_image(
+        image, build_locate_prompt(labels), max_tokens=500, temperature=0.0,
+        response_format={"type": "json_object"}
+    )
+    timings["analyze"] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    location = parse_locations(text, labels, image_size=controller.encoder.output_size(image))[labels[0]]
+    timings["parse"] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    if location is not None:
+        x, y = location.to_absolute(*image.size)
+        if click:
+            import pyautogui
+            pyautogui.click(x, y)
+    timings["click"] = time.perf_counter() - stage
+
+    timings["total"] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线测量 分析→解析→点击 循环的吞吐量和延迟分布")
+    parser.add_argument("--fixture", help="GROQ_RECORD_FILE录制的夹具文件，不指定则使用合成记录")
+    parser.add_argument("--iterations", type=int, default=50, help="循环次数")
+    parser.add_argument("--workers", type=int, default=1, help="并发执行循环的线程数")
+    parser.add_argument("--latency", type=float, default=None,
+                        help="注入的固定延迟（秒），不指定则使用录制延迟（合成记录为0.3秒）")
+    parser.add_argument("--jitter", type=float, default=0.05, help="延迟抖动（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="注入错误的概率")
+    parser.add_argument("--label", default="再来一次", help="要定位的按钮")
+    parser.add_argument("--click", action="store_true", help="真的移动鼠标点击（需要图形界面）")
+    args = parser.parse_args()
+
+    os.environ.setdefault("GROQ_API_KEY", "replay")
+    controller = GroqController()
+    labels = [args.label]
+    records = None if args.fixture else synthetic_records(controller, labels, 0.3)
+    controller.client = ReplayClient(
+        path=args.fixture, records=records, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, seed=0,
+    )
+
+    base_image = synthetic_screenshot()
+    results = []
+    errors = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(run_iteration, controller, base_image, labels, i, args.click)
+            for i in range(args.iterations)
+        ]
+        for future in futures:
+            try:
+                results.append(future.result())
+            except GroqControllerError:
+                errors += 1
+    elapsed = time.perf_counter() - start
+
+    print(f"迭代次数: {args.iterations}  并发: {args.workers}  失败: {errors}  "
+          f"注入错误: {controller.client.injected_errors}  API调用: {controller.client.calls}")
+    print(f"吞吐量: {len(results) / elapsed:.2f} 次/秒")
+    print(f"{'阶段':<10}{'p50(ms)':>12}{'p95(ms)':>12}{'p99(ms)':>12}")
+    print("-" * 46)
+    for stage in STAGES:
+        values = np.array([r[stage] for r in results]) * 1000
+        if len(values) == 0:
+            continue
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        print(f"{stage:<10}{p50:>12.2f}{p95:>12.2f}{p99:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
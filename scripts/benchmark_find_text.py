@@ -0,0 +1,60 @@
+import sys
+import os
+import time
+import argparse
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.ocr_controller import OCRController, text_similarity
+from scripts.benchmark_image_encoding import synthetic_screenshot
+
+# 模拟界面上的按钮文字 (left, top, 文字)
+BUTTONS = [(760, 300, "Start Game"), (760, 420, "Settings"), (760, 540, "Try Again"), (760, 660, "Exit")]
+
+
+def button_screenshot() -> Image.Image:
+    """在模拟截图上绘制几个带文字的按钮"""
+    image = synthetic_screenshot()
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=40)
+    for left, top, text in BUTTONS:
+        draw.rectangle((left, top, left + 400, top + 80), fill="black")
+        draw.text((left + 30, top + 18), text, fill="white", font=font)
+    return image
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较整屏OCR后查找文字与find_text的耗时")
+    parser.add_argument("--image", default=None, help="截图路径，默认使用带按钮文字的模拟截图")
+    parser.add_argument("--query", default="Try Again", help="要查找的文字，如 再来一次")
+    parser.add_argument("--scale", type=float, default=0.5, help="find_text检测时的缩放比例")
+    parser.add_argument("--iterations", type=int, default=3, help="每种方式重复的次数")
+    args = parser.parse_args()
+
+    image = Image.open(args.image).convert("RGB") if args.image else button_screenshot()
+    # 关闭结果缓存，每次都实际识别
+    ocr = OCRController(cache_size=0)
+    # 预热一次，排除模型加载的开销
+    ocr.recognize_image(image)
+    ocr.find_text(image, args.query, scale=args.scale)
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        results = ocr.recognize_image(image)
+        full = max(results, key=lambda item: text_similarity(item[1], args.query), default=None)
+    baseline = (time.perf_counter() - start) / args.iterations
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        found = ocr.find_text(image, args.query, scale=args.scale)
+    elapsed = (time.perf_counter() - start) / args.iterations
+
+    print(f"{'方式':<16}{'每次(ms)':>12}{'加速比':>10}  结果")
+    print("-" * 60)
+    print(f"{'整屏OCR':<16}{baseline * 1000:>12.1f}{1.0:>10.2f}  {full[1:] if full else None}")
+    print(f"{'find_text':<16}{elapsed * 1000:>12.1f}{baseline / elapsed:>10.2f}  {found[1:] if found else None}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import sys
+import os
+import time
+import argparse
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.image_encoder import ImageEncoder
+
+# 待比较的编码设置
+SETTINGS = [
+    ("PNG 原图", dict(format="PNG", max_dimension=None)),
+    ("JPEG q85 1280", dict(format="JPEG", quality=85, max_dimension=1280)),
+    ("JPEG q70 1024", dict(format="JPEG", quality=70, max_dimension=1024)),
+    ("JPEG q70 1024 灰度", dict(format="JPEG", quality=70, max_dimension=1024, grayscale=True)),
+    ("WEBP q80 1280", dict(format="WEBP", quality=80, max_dimension=1280)),
+    ("JPEG q85 1MP", dict(format="JPEG", quality=85, max_dimension=None, max_pixels=1_000_000)),
+]
+
+
+def synthetic_screenshot(width: int = 1920, height: int = 1080, seed: int = 0) -> Image.Image:
+    """生成一张带渐变、色块和噪声的模拟游戏截图，seed不同时色块和噪声不同"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    img = np.stack([
+        (x * 255 // width),
+        (y * 255 // height),
+        ((x + y) * 255 // (width + height)),
+    ], axis=-1).astype(np.int16)
+    for _ in range(40):
+        left, top = rng.integers(0, width - 200), rng.integers(0, height - 80)
+        img[top:top + 80, left:left + 200] = rng.integers(0, 256, size=3)
+    img += rng.integers(-12, 13, size=img.shape, dtype=np.int16)
+    return Image.fromarray(np.clip(img, 0, 255).astype(np.uint8), "RGB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较不同图像编码设置的耗时和体积")
+    parser.add_argument("image", nargs="?", help="截图路径，不指定则使用合成截图")
+    parser.add_argument("--repeat", type=int, default=5, help="每种设置重复编码次数")
+    args = parser.parse_args()
+
+    image = Image.open(args.image).convert("RGB") if args.image else synthetic_screenshot()
+    print(f"输入图像尺寸: {image.size[0]}x{image.size[1]}")
+    print(f"{'设置':<24}{'编码耗时(ms)':>14}{'字节数':>12}{'base64(KB)':>12}{'输出尺寸':>14}")
+    print("-" * 76)
+
+    for name, kwargs in SETTINGS:
+        # 关闭缓存，测量真实编码开销
+        encoder = ImageEncoder(cache_size=0, **kwargs)
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            encoded = encoder.encode(image)
+            timings.append(time.perf_counter() - start)
+        size = f"{encoded.size[0]}x{encoded.size[1]}"
+        print(f"{name:<24}{np.median(timings) * 1000:>14.1f}{len(encoded):>12}"
+              f"{len(encoded.base64) / 1024:>12.1f}{size:>14}")
+
+    # 缓存命中的开销
+    encoder = ImageEncoder()
+    encoder.encode(image)
+    start = time.perf_counter()
+    encoder.encode(image)
+    print(f"\n缓存命中耗时: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
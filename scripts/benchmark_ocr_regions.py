@@ -0,0 +1,67 @@
+import sys
+import os
+import time
+import argparse
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.ocr_controller import OCRController
+from scripts.benchmark_image_encoding import synthetic_screenshot
+
+# 模拟游戏HUD上的文字区域 (left, top, width, height) 和内容
+HUD_FIELDS = {
+    "hp": ((40, 30, 220, 40), "HP 1250/1800"),
+    "mp": ((40, 80, 220, 40), "MP 430/600"),
+    "gold": ((1600, 30, 260, 40), "Gold 98321"),
+    "level": ((880, 20, 160, 40), "Lv. 57"),
+    "timer": ((1640, 1000, 220, 40), "00:12:45"),
+}
+
+
+def hud_screenshot() -> Image.Image:
+    """在模拟截图上绘制HUD文字"""
+    image = synthetic_screenshot()
+    draw = ImageDraw.Draw(image)
+    for (left, top, width, height), text in HUD_FIELDS.values():
+        draw.rectangle((left, top, left + width, top + height), fill="black")
+        draw.text((left + 10, top + 12), text, fill="white")
+    return image
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较逐区域识别与多区域批量识别的耗时")
+    parser.add_argument("--image", default=None, help="截图路径，默认使用带HUD文字的模拟截图")
+    parser.add_argument("--iterations", type=int, default=5, help="每种方式重复的次数")
+    parser.add_argument("--batch-size", type=int, default=8, help="readtext_batched的batch_size")
+    args = parser.parse_args()
+
+    image = Image.open(args.image).convert("RGB") if args.image else hud_screenshot()
+    regions = {name: region for name, (region, _) in HUD_FIELDS.items()}
+
+    # 关闭区域缓存，否则预热之后两种方式都只是在查缓存
+    ocr = OCRController(cache_size=0)
+    # 预热一次，排除模型加载的开销
+    ocr.recognize_regions(image, regions, batch_size=args.batch_size)
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        looped = {name: ocr.recognize_image(image, region) for name, region in regions.items()}
+    baseline = (time.perf_counter() - start) / args.iterations
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        batched = ocr.recognize_regions(image, regions, batch_size=args.batch_size)
+    elapsed = (time.perf_counter() - start) / args.iterations
+
+    print(f"{'方式':<16}{'每帧(ms)':>12}{'加速比':>10}")
+    print("-" * 38)
+    print(f"{'逐区域':<16}{baseline * 1000:>12.1f}{1.0:>10.2f}")
+    print(f"{'批量':<16}{elapsed * 1000:>12.1f}{baseline / elapsed:>10.2f}")
+    print()
+    for name in regions:
+        print(f"{name:<8}逐区域: {[text for _, text, _ in looped[name]]}  批量: {[text for _, text, _ in batched[name]]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import sys
+import os
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyscreeze
+from src.template_matcher import TemplateMatcher
+from scripts.benchmark_image_encoding import synthetic_screenshot
+
+
+def timed(func, iterations: int) -> float:
+    """返回平均每次调用的耗时（秒）"""
+    func()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较pyautogui的逐个模板查找与NumPy模板匹配引擎")
+    parser.add_argument("--templates", type=int, default=5, help="模板数量")
+    parser.add_argument("--size", default="120x60", help="模板尺寸 宽x高")
+    parser.add_argument("--iterations", type=int, default=5, help="每种方式重复的次数")
+    parser.add_argument("--scales", default="1.0", help="逗号分隔的搜索尺度，如 0.8,1.0,1.25")
+    args = parser.parse_args()
+
+    width, height = (int(value) for value in args.size.split("x"))
+    screen = synthetic_screenshot()
+    frame = np.asarray(screen)
+    rng = np.random.default_rng(0)
+    directory = tempfile.mkdtemp()
+    templates, hints = {}, {}
+    for i in range(args.templates):
+        left, top = int(rng.integers(0, 1920 - width)), int(rng.integers(0, 1080 - height))
+        path = os.path.join(directory, f"template{i}.png")
+        screen.crop((left, top, left + width, top + height)).save(path)
+        templates[path] = (left, top)
+        hints[path] = (max(0, left - 100), max(0, top - 100), width + 200, height + 200)
+
+    scales = [float(scale) for scale in args.scales.split(",")]
+    matcher = TemplateMatcher(scales=scales)
+    for path in templates:
+        matcher.add(path)
+
+    def pyautogui_loop():
+        # 与pyautogui.locateOnScreen相同：每次从磁盘读取模板并扫描整张截图
+        for path in templates:
+            pyscreeze.locate(path, screen, confidence=0.9)
+
+    # 与InputController.locate_all_on_screen相同：只截取覆盖所有区域提示的范围
+    bounds = matcher.bounds(templates, hints, (1920, 1080))
+
+    def crop():
+        left, top, width, height = bounds
+        return np.ascontiguousarray(frame[top:top + height, left:left + width])
+
+    cases = [
+        ("pyautogui 逐个", pyautogui_loop),
+        ("引擎 逐个", lambda: [matcher.locate(frame, path) for path in templates]),
+        ("引擎 同一帧", lambda: matcher.locate_all(frame)),
+        ("引擎 区域提示", lambda: matcher.locate_all(frame, regions=hints)),
+        ("引擎 区域截图", lambda: matcher.locate_all(crop(), regions=hints, origin=bounds[:2])),
+    ]
+
+    results = matcher.locate_all(frame)
+    found = sum(1 for path, match in results.items() if match and match[:2] == templates[path])
+    print(f"{args.templates}个 {args.size} 模板，尺度 {scales}，找到 {found}/{args.templates}")
+    print(f"{'方式':<16}{'每帧(ms)':>12}{'加速比':>10}")
+    print("-" * 38)
+    baseline = None
+    for name, func in cases:
+        elapsed = timed(func, args.iterations)
+        baseline = baseline or elapsed
+        print(f"{name:<16}{elapsed * 1000:>12.1f}{baseline / elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
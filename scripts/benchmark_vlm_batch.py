@@ -0,0 +1,56 @@
+import sys
+import os
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.vlm_controller import VLMController
+from scripts.benchmark_image_encoding import synthetic_screenshot
+
+PROMPTS = [
+    "这是什么界面？",
+    "请描述界面中的所有按钮。",
+    "界面右下角的按钮上写着什么文字？请用中文简短回答。",
+    "请详细分析这个界面截图。描述：1. 界面的主要内容和标题 2. 所有可见的文本信息",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较逐条分析与批量分析的吞吐量")
+    parser.add_argument("--model", default="small", help="模型名称、别名或本地路径")
+    parser.add_argument("--device", default="cpu", help="运行设备")
+    parser.add_argument("--items", type=int, default=16, help="分析的图像数量")
+    parser.add_argument("--batch-sizes", default="1,4,8", help="逗号分隔的micro_batch_size列表")
+    parser.add_argument("--max-length", type=int, default=32, help="生成文本的最大长度")
+    parser.add_argument("--num-beams", type=int, default=1, help="beam search的beam数量")
+    args = parser.parse_args()
+
+    # 关闭视觉编码器输出缓存，每张图像都完整经过视觉编码器
+    vlm = VLMController(device=args.device, model_size=args.model, use_server=False, embedding_cache_mb=0)
+    vlm._load_model()
+
+    images = [synthetic_screenshot(seed=i).resize((640, 360)) for i in range(args.items)]
+    prompts = [PROMPTS[i % len(PROMPTS)] for i in range(args.items)]
+    options = dict(max_length=args.max_length, num_beams=args.num_beams, temperature=0)
+
+    # 预热一次，排除首次调用的开销
+    vlm.analyze_image(images[0], prompts[0], **options)
+
+    start = time.perf_counter()
+    for image, prompt in zip(images, prompts):
+        vlm.analyze_image(image, prompt, **options)
+    baseline = time.perf_counter() - start
+
+    print(f"{'方式':<16}{'耗时(秒)':>12}{'条/秒':>12}{'加速比':>10}")
+    print("-" * 50)
+    print(f"{'逐条':<16}{baseline:>12.2f}{args.items / baseline:>12.2f}{1.0:>10.2f}")
+    for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+        start = time.perf_counter()
+        vlm.batch_analyze_images(images, prompts, micro_batch_size=batch_size, **options)
+        elapsed = time.perf_counter() - start
+        print(f"{f'批量({batch_size})':<16}{elapsed:>12.2f}{args.items / elapsed:>12.2f}{baseline / elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import sys
+import os
+import json
+import time
+import argparse
+import resource
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.vlm_controller import VLMController
+from scripts.benchmark_image_encoding import synthetic_screenshot
+
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存（MB），Linux上ru_maxrss单位为KB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(args) -> dict:
+    """在当前进程中加载一种精度的模型并测量"""
+    vlm = VLMController(
+        device="cpu", precision=args.precision,
+        num_threads=args.threads, num_interop_threads=args.interop_threads,
+        model_size=args.model, use_server=False,
+        # 关闭视觉编码器输出缓存，单张延迟包含视觉编码器
+        embedding_cache_mb=0,
+    )
+
+    start = time.perf_counter()
+    vlm._load_model()
+    load_time = time.perf_counter() - start
+
+    image = synthetic_screenshot()
+    options = dict(max_length=args.max_length, num_beams=1, temperature=0)
+    vlm.analyze_image(image, "这是什么界面？", **options)
+
+    latencies = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        vlm.analyze_image(image, "这是什么界面？", **options)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    return {
+        "precision": args.precision,
+        "load_time": load_time,
+        "peak_rss_mb": peak_rss_mb(),
+        "latency": latencies[len(latencies) // 2],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较CPU上各精度模式的加载时间、峰值内存和单张延迟")
+    parser.add_argument("--model", default="small", help="模型名称、别名或本地路径")
+    parser.add_argument("--precisions", default="float32,bfloat16,int8", help="逗号分隔的精度模式列表")
+    parser.add_argument("--threads", type=int, default=None, help="算子内部并行的线程数")
+    parser.add_argument("--interop-threads", type=int, default=None, help="算子之间并行的线程数")
+    parser.add_argument("--iterations", type=int, default=5, help="每种模式分析的次数")
+    parser.add_argument("--max-length", type=int, default=32, help="生成文本的最大长度")
+    parser.add_argument("--precision", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.precision:
+        # 子进程：只测量一种模式，峰值内存不受其他模式影响
+        print(json.dumps(measure(args)))
+        return
+
+    print(f"{'精度':<12}{'加载(秒)':>12}{'峰值内存(MB)':>16}{'单张延迟(ms)':>16}")
+    print("-" * 56)
+    for precision in args.precisions.split(","):
+        command = [sys.executable, os.path.abspath(__file__), "--precision", precision,
+                   "--iterations", str(args.iterations), "--max-length", str(args.max_length)]
+        if args.model:
+            command += ["--model", args.model]
+        if args.threads:
+            command += ["--threads", str(args.threads)]
+        if args.interop_threads:
+            command += ["--interop-threads", str(args.interop_threads)]
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{precision:<12}{result['load_time']:>12.2f}{result['peak_rss_mb']:>16.1f}"
+              f"{result['latency'] * 1000:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
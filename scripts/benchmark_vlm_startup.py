@@ -0,0 +1,70 @@
+import sys
+import os
+import json
+import time
+import argparse
+import subprocess
+import tempfile
+
+START = time.perf_counter()
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def measure(args) -> dict:
+    """在新进程中测量从启动到第一次分析返回的耗时"""
+    from PIL import Image
+    from src.vlm_controller import VLMController
+    imported = time.perf_counter() - START
+
+    vlm = VLMController(
+        device="cpu", model_size=args.model, precision=args.precision, use_server=False,
+        snapshot_dir=args.snapshot_dir, warmup=args.warmup,
+    )
+    if args.warmup:
+        # 模拟脚本在模型预热的同时做其他准备工作
+        time.sleep(args.other_work)
+    vlm.analyze_image(Image.new("RGB", (640, 360)), "这是什么界面？", max_length=16, num_beams=1, temperature=0)
+    return {
+        "import": imported,
+        "first_result": time.perf_counter() - START,
+        "phases": vlm.load_timings.get(vlm.model_name, {}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量本地视觉模型的冷启动耗时")
+    parser.add_argument("--model", default="small", help="模型名称、别名或本地路径")
+    parser.add_argument("--precision", default="float32", help="模型精度")
+    parser.add_argument("--snapshot-dir", default=None, help="快照目录，默认使用临时目录")
+    parser.add_argument("--other-work", type=float, default=2.0, help="预热模式下模拟的其他准备工作（秒）")
+    parser.add_argument("--warmup", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args)))
+        return
+
+    snapshot_dir = args.snapshot_dir or tempfile.mkdtemp(prefix="vlm-snapshot-")
+    base = [sys.executable, os.path.abspath(__file__), "--child", "--model", args.model,
+            "--precision", args.precision, "--other-work", str(args.other_work)]
+    runs = [
+        ("直接加载", base),
+        ("生成快照", base + ["--snapshot-dir", snapshot_dir]),
+        ("快照加载", base + ["--snapshot-dir", snapshot_dir]),
+        ("快照+预热", base + ["--snapshot-dir", snapshot_dir, "--warmup"]),
+    ]
+
+    print(f"{'方式':<12}{'导入(秒)':>10}{'首个结果(秒)':>14}  加载阶段")
+    print("-" * 80)
+    for name, command in runs:
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        phases = " ".join(f"{k}={v:.2f}" for k, v in result["phases"].items())
+        print(f"{name:<12}{result['import']:>10.2f}{result['first_result']:>14.2f}  {phases}")
+    print(f"\n快照目录: {snapshot_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,24 @@ import pyautogui
 from PIL import Image
 import numpy as np
 from src.groq_controller import GroqController
+from src.groq_errors import GroqControllerError
+from src.action_scheduler import ActionScheduler, click, move
+from src.ocr_controller import OCRController
+from src.text_index import TextIndex
 from src.tts_controller import TTSController
 
 class RetryButtonClicker:
-    def __init__(self, button_description="再来一次"):
-        """初始化按钮点击器"""
+    def __init__(self, button_description="再来一次", use_ocr=True):
+        """初始化按钮点击器
+
+        Args:
+            button_description: 按钮上的文字
+            use_ocr: 是否先用本地OCR查找按钮文字，找不到时再请求模型
+        """
         self.button_description = button_description
+        self.ocr = OCRController() if use_ocr else None
         self.groq = GroqController()
+        self.actions = ActionScheduler()
         self.tts = TTSController()
         self.calibration_data = self.load_calibration()
         
@@ -58,64 +69,63 @@ class RetryButtonClicker:
         diff_percentage = (np.sum(diff) / (arr1.size * 255)) * 100
         return diff_percentage
 
-    def analyze_screen(self, screenshot):
-        """分析屏幕内容，查找按钮位置"""
-        # 将PIL图像转换为base64
-        image_data = self.groq._encode_image(screenshot)
-        
-        # 构建提示词
-        prompt = f"""请分析这张图片，找到"{self.button_description}"按钮的位置。
-按钮通常位于屏幕底部，是一个明显的可点击区域。
-请返回按钮中心的相对坐标，格式如下：
-x: 相对位置 (0-1之间的小数，精确到3位)
-y: 相对位置 (0-1之间的小数，精确到3位)
-如果找不到按钮，请返回"未找到按钮"。
-"""
-        
-        # 调用Groq API进行分析
-        result = self.groq.analyze_image(image_data, prompt)
-        return result
+    def locate_with_ocr(self, screenshot):
+        """在本地OCR结果中查找按钮文字
 
-    def parse_coordinates(self, result):
-        """解析坐标"""
-        try:
-            lines = result.split('\n')
-            x = None
-            y = None
-            for line in lines:
-                line = line.strip()
-                if ':' not in line:
-                    continue
-                key, value = line.split(':', 1)
-                key = key.strip().lower()
-                if key == 'x':
-                    try:
-                        x = float(value.strip())
-                    except:
-                        continue
-                elif key == 'y':
-                    try:
-                        y = float(value.strip())
-                    except:
-                        continue
-            
-            if x is not None and y is not None:
-                # 应用校准数据
-                if self.calibration_data:
-                    x_offset = self.calibration_data.get('x_offset', 0)
-                    y_offset = self.calibration_data.get('y_offset', 0)
-                    x += x_offset
-                    y += y_offset
-                
-                # 将相对坐标转换为绝对坐标
-                screen_width, screen_height = pyautogui.size()
-                x = int(x * screen_width)
-                y = int(y * screen_height)
-                return x, y
+        Returns:
+            ElementLocation: 按钮位置（相对截图的比例坐标），没有启用OCR、找不到或OCR出错时返回None
+        """
+        if self.ocr is None:
             return None
+        try:
+            entry = TextIndex(self.ocr.recognize_image(screenshot)).best(self.button_description)
         except Exception as e:
-            print(f"解析坐标时出错: {str(e)}")
+            print(f"OCR识别出错，改为请求模型: {e!r}")
+            return None
+        return None if entry is None else entry.location(screenshot.width, screenshot.height)
+
+    def analyze_screen(self, screenshot, calibrate=True):
+        """分析屏幕内容，查找按钮位置
+
+        Args:
+            screenshot: 截图
+            calibrate: 是否对模型估计的位置应用校准偏移，OCR得到的位置不做校准
+
+        Returns:
+            ElementLocation: 按钮位置（相对截图的比例坐标），找不到或出错时返回None
+        """
+        # 先在本地OCR结果中查找按钮文字，省去一次模型请求
+        location = self.locate_with_ocr(screenshot)
+        if location is not None:
+            return location
+
+        # 调用Groq API定位按钮（图像由GroqController按带宽预算编码）
+        try:
+            locations = self.groq.locate_elements(screenshot, [self.button_description])
+        except GroqControllerError as e:
+            print(f"分析屏幕时出错: {str(e)}")
+            self.tts.speak("分析屏幕时出错")
+            return None
+        location = locations.get(self.button_description)
+        if location is not None and calibrate and self.calibration_data:
+            # 校准偏移是针对模型估计的位置测得的
+            location = location._replace(x=location.x + self.calibration_data.get('x_offset', 0),
+                                         y=location.y + self.calibration_data.get('y_offset', 0))
+        return location
+
+    def parse_coordinates(self, location):
+        """把相对坐标转换为屏幕绝对坐标"""
+        if location is None:
             return None
+        screen_width, screen_height = pyautogui.size()
+        return location.to_absolute(screen_width, screen_height)
+
+    def click_at(self, x, y):
+        """瞬间移动到目标位置并点击，不受pyautogui全局停顿的影响"""
+        for result in self.actions.run([move(x, y), click(delay=0.05)]):
+            print(f"{result.action.kind}: 计划后 {result.lag * 1000:.1f}ms 执行")
+            if result.error is not None:
+                raise result.error
 
     def try_click_with_region(self, before_screenshot):
         """使用鼠标附近区域进行二次尝试"""
@@ -125,67 +135,37 @@ y: 相对位置 (0-1之间的小数，精确到3位)
         region_screenshot, (left, top) = self.capture_region_around_cursor()
         
         # 分析区域图片
-        result = self.analyze_screen(region_screenshot)
-        print(f"区域分析结果: {result}")
-        
-        # 直接解析相对坐标
-        try:
-            lines = result.split('\n')
-            x = None
-            y = None
-            for line in lines:
-                line = line.strip()
-                if ':' not in line:
-                    continue
-                key, value = line.split(':', 1)
-                key = key.strip().lower()
-                if key == 'x':
-                    try:
-                        x = float(value.strip())
-                    except:
-                        continue
-                elif key == 'y':
-                    try:
-                        y = float(value.strip())
-                    except:
-                        continue
-            
-            if x is not None and y is not None:
-                # 将相对坐标转换为区域内的绝对坐标
-                region_width = region_screenshot.width
-                region_height = region_screenshot.height
-                x = left + int(x * region_width)
-                y = top + int(y * region_height)
-                print(f"找到按钮位置: ({x}, {y})")
-                self.tts.speak(f"找到按钮位置，坐标：{x}，{y}")
-                
-                print("移动鼠标并点击...")
-                self.tts.speak("移动鼠标并点击")
-                pyautogui.moveTo(x, y, duration=0.5)
-                pyautogui.click()
-                print("点击完成")
-                
-                # 等待2秒后再次截屏
-                print("等待2秒后检查屏幕变化...")
-                self.tts.speak("等待检查屏幕变化")
-                time.sleep(2)
-                after_screenshot = self.capture_screen()
-                
-                # 比较前后屏幕的差异
-                diff_percentage = self.compare_images(before_screenshot, after_screenshot)
-                print(f"屏幕变化程度: {diff_percentage:.2f}%")
-                
-                if diff_percentage > 1:
-                    self.tts.speak("点击成功")
-                else:
-                    self.tts.speak("点击失败")
-                
-                return diff_percentage > 1
-            return False
-        except Exception as e:
-            print(f"解析坐标时出错: {str(e)}")
-            self.tts.speak("解析坐标时出错")
+        location = self.analyze_screen(region_screenshot, calibrate=False)
+        print(f"区域分析结果: {location}")
+        if location is None:
             return False
+        
+        # 将相对坐标转换为区域内的绝对坐标
+        x, y = location.to_absolute(region_screenshot.width, region_screenshot.height, left, top)
+        print(f"找到按钮位置: ({x}, {y})")
+        self.tts.speak(f"找到按钮位置，坐标：{x}，{y}")
+        
+        print("移动鼠标并点击...")
+        self.tts.speak("移动鼠标并点击")
+        self.click_at(x, y)
+        print("点击完成")
+        
+        # 等待2秒后再次截屏
+        print("等待2秒后检查屏幕变化...")
+        self.tts.speak("等待检查屏幕变化")
+        time.sleep(2)
+        after_screenshot = self.capture_screen()
+        
+        # 比较前后屏幕的差异
+        diff_percentage = self.compare_images(before_screenshot, after_screenshot)
+        print(f"屏幕变化程度: {diff_percentage:.2f}%")
+        
+        if diff_percentage > 1:
+            self.tts.speak("点击成功")
+        else:
+            self.tts.speak("点击失败")
+        
+        return diff_percentage > 1
 
     def click_button(self):
         """执行完整的点击流程"""
@@ -195,10 +175,10 @@ y: 相对位置 (0-1之间的小数，精确到3位)
         
         print("分析屏幕内容...")
         self.tts.speak("分析屏幕内容")
-        result = self.analyze_screen(before_screenshot)
-        print(f"分析结果: {result}")
+        location = self.analyze_screen(before_screenshot)
+        print(f"分析结果: {location}")
         
-        coordinates = self.parse_coordinates(result)
+        coordinates = self.parse_coordinates(location)
         if coordinates:
             x, y = coordinates
             print(f"找到按钮位置: ({x}, {y})")
@@ -206,8 +186,7 @@ y: 相对位置 (0-1之间的小数，精确到3位)
             
             print("移动鼠标并点击...")
             self.tts.speak("移动鼠标并点击")
-            pyautogui.moveTo(x, y, duration=0.5)
-            pyautogui.click()
+            self.click_at(x, y)
             print("点击完成")
             
             # 等待2秒后再次截屏
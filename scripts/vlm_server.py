@@ -0,0 +1,40 @@
+import sys
+import os
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.vlm_controller import VLMController
+from src.vlm_server import VLMClient, VLMServer, default_socket_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻的本地视觉模型推理服务")
+    parser.add_argument("--socket", default=default_socket_path(), help="Unix套接字路径")
+    parser.add_argument("--model", default="small", help="模型名称、别名或本地路径")
+    parser.add_argument("--device", default=None, help="运行设备")
+    parser.add_argument("--precision", default=None, help="模型精度：float16/bfloat16/float32/int8")
+    parser.add_argument("--threads", type=int, default=None, help="算子内部并行的线程数")
+    parser.add_argument("--max-queue", type=int, default=32, help="排队请求数上限")
+    parser.add_argument("--max-batch", type=int, default=8, help="合并analyze_image请求的最大批次")
+    parser.add_argument("--stats", action="store_true", help="查询正在运行的服务的状态后退出")
+    args = parser.parse_args()
+
+    if args.stats:
+        info = VLMClient(args.socket).probe()
+        if info is None:
+            print(f"推理服务未运行: {args.socket}")
+            sys.exit(1)
+        print(json.dumps(info, ensure_ascii=False, indent=2))
+        return
+
+    vlm = VLMController(
+        device=args.device, model_size=args.model, precision=args.precision,
+        num_threads=args.threads, use_server=False,
+    )
+    VLMServer(vlm, socket_path=args.socket, max_queue=args.max_queue, max_batch=args.max_batch).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+按时间表执行输入动作的调度线程
+
+动作序列交给专用线程，按单调时钟计算每个动作的计划执行时间：先等待到计划时间前一小段，
+再忙等到计划时间，避免线程唤醒的误差。每个动作使用自己的delay，不受pyautogui.PAUSE的全局停顿影响；
+移动默认瞬间完成。每个动作都记录计划时间和实际执行时间。
+"""
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+
+class Action(NamedTuple):
+    """一个输入动作，delay是相对上一个动作计划时间的等待时间（秒）"""
+    kind: str
+    args: Dict[str, Any]
+    delay: float = 0.0
+
+
+def move(x: int, y: int, duration: float = 0.0, delay: float = 0.0) -> Action:
+    """移动鼠标，duration为0时瞬间移动"""
+    return Action("move", {"x": x, "y": y, "duration": duration}, delay)
+
+
+def click(x: Optional[int] = None, y: Optional[int] = None, button: str = "left", clicks: int = 1,
+          delay: float = 0.0) -> Action:
+    """点击，不指定位置时在当前位置点击"""
+    return Action("click", {"x": x, "y": y, "button": button, "clicks": clicks}, delay)
+
+
+def key(name: str, delay: float = 0.0) -> Action:
+    """按下并释放一个键"""
+    return Action("key", {"key": name}, delay)
+
+
+def key_down(name: str, delay: float = 0.0) -> Action:
+    """按住一个键"""
+    return Action("key_down", {"key": name}, delay)
+
+
+def key_up(name: str, delay: float = 0.0) -> Action:
+    """释放一个键"""
+    return Action("key_up", {"key": name}, delay)
+
+
+def hotkey(*keys: str, delay: float = 0.0) -> Action:
+    """组合键"""
+    return Action("hotkey", {"keys": keys}, delay)
+
+
+def type_text(text: str, interval: float = 0.0, delay: float = 0.0) -> Action:
+    """输入一串文本"""
+    return Action("type", {"text": text, "interval": interval}, delay)
+
+
+def wait(seconds: float) -> Action:
+    """等待，推迟之后所有动作的计划时间"""
+    return Action("wait", {}, seconds)
+
+
+_HANDLERS: Dict[str, Callable] = {
+    "move": lambda backend, x, y, duration: backend.moveTo(x, y, duration=duration, _pause=False),
+    "click": lambda backend, x, y, button, clicks: backend.click(x, y, clicks=clicks, button=button, _pause=False),
+    "key": lambda backend, key: backend.press(key, _pause=False),
+    "key_down": lambda backend, key: backend.keyDown(key, _pause=False),
+    "key_up": lambda backend, key: backend.keyUp(key, _pause=False),
+    "hotkey": lambda backend, keys: backend.hotkey(*keys, _pause=False),
+    "type": lambda backend, text, interval: backend.write(text, interval=interval, _pause=False),
+    "wait": lambda backend: None,
+}
+
+
+class ActionResult(NamedTuple):
+    """一个动作的执行情况，时间都是time.monotonic()时间"""
+    action: Action
+    scheduled: float
+    started: float
+    finished: float
+    error: Optional[BaseException] = None
+
+    @property
+    def lag(self) -> float:
+        """实际开始时间比计划时间晚了多少秒"""
+        return self.started - self.scheduled
+
+
+class ActionBatch:
+    """提交给调度线程的一组动作，可以等待其完成"""
+
+    def __init__(self, actions: Sequence[Action]):
+        self.actions = list(actions)
+        self.results: List[ActionResult] = []
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> List[ActionResult]:
+        """
+        等待这组动作执行完
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            已执行动作的结果
+
+        Raises:
+            TimeoutError: 超时仍未执行完
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"动作在{timeout}秒内未执行完")
+        return self.results
+
+    def cancel(self):
+        """取消尚未执行的动作，正在等待中的动作也会立即停止等待"""
+        self._cancelled.set()
+
+
+class ActionScheduler:
+    """在专用线程上按单调时钟执行输入动作"""
+
+    def __init__(self, backend=None, spin_threshold: float = 0.002):
+        """
+        Args:
+            backend: 执行输入的模块，默认为pyautogui
+            spin_threshold: 计划时间前最后多少秒改为忙等，提高时间精度
+        """
+        if backend is None:
+            import pyautogui as backend
+        self.backend = backend
+        self.spin_threshold = spin_threshold
+        self._queue: "queue.Queue[Optional[ActionBatch]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="action-scheduler", daemon=True)
+        self._thread.start()
+
+    def _sleep_until(self, target: float, batch: ActionBatch):
+        while not batch.cancelled:
+            remaining = target - time.monotonic()
+            if remaining <= 0:
+                return
+            if remaining > self.spin_threshold:
+                batch._cancelled.wait(remaining - self.spin_threshold)
+
+    def _execute(self, batch: ActionBatch):
+        scheduled = time.monotonic()
+        for action in batch.actions:
+            scheduled += action.delay
+            self._sleep_until(scheduled, batch)
+            if batch.cancelled:
+                break
+            started = time.monotonic()
+            error = None
+            try:
+                _HANDLERS[action.kind](self.backend, **action.args)
+            except Exception as e:
+                error = e
+            batch.results.append(ActionResult(action, scheduled, started, time.monotonic(), error))
+            if error is not None:
+                # 后续动作通常依赖前一个动作的结果，出错后不再继续
+                break
+
+    def _run(self):
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                return
+            try:
+                if not batch.cancelled:
+                    self._execute(batch)
+            finally:
+                batch._done.set()
+
+    def submit(self, actions: Sequence[Action]) -> ActionBatch:
+        """
+        提交一组动作，立即返回
+
+        Args:
+            actions: 按顺序执行的动作，第一个动作相对调度线程开始执行这组动作的时间计时
+
+        Returns:
+            ActionBatch，可以wait或cancel
+        """
+        for action in actions:
+            if action.kind not in _HANDLERS:
+                raise ValueError(f"未知的动作类型: {action.kind}")
+        batch = ActionBatch(actions)
+        self._queue.put(batch)
+        return batch
+
+    def run(self, actions: Sequence[Action], timeout: Optional[float] = None) -> List[ActionResult]:
+        """提交一组动作并等待执行完，返回各动作的结果"""
+        return self.submit(actions).wait(timeout)
+
+    def close(self):
+        """执行完已提交的动作后停止调度线程"""
+        self._queue.put(None)
+        self._thread.join()
@@ -0,0 +1,329 @@
+import asyncio
+import inspect
+import os
+import threading
+import time
+import weakref
+from typing import List, Optional, Dict, Any, Tuple, Sequence, Union, Callable
+from groq import AsyncGroq
+from PIL import Image
+from .groq_controller import GroqController
+from .image_encoder import ImageEncoder
+from .response_cache import ResponseCache
+from .completion_stream import AsyncCompletionStream
+from .groq_replay import AsyncRecordingClient, AsyncReplayClient
+from .rate_limiter import RateLimiter
+from .request_coalescer import request_key
+
+
+class BatchResult:
+    """批量请求中单个条目的结果"""
+
+    def __init__(self, index: int, value: Optional[str] = None, error: Optional[BaseException] = None):
+        """
+        Args:
+            index: 条目在输入中的位置
+            value: 成功时的回复文本
+            error: 失败时的异常
+        """
+        self.index = index
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        """条目是否成功"""
+        return self.error is None
+
+    def __repr__(self) -> str:
+        if self.ok:
+            return f"BatchResult(index={self.index}, value={self.value!r})"
+        return f"BatchResult(index={self.index}, error={self.error!r})"
+
+
+class AsyncGroqController(GroqController):
+    """基于AsyncGroq客户端的异步控制器，支持有界并发的批量请求
+
+    继承GroqController的同步方法，阻塞调用方（如RetryButtonClicker）可以继续使用
+    analyze_image/chat，或通过analyze_images_sync/chat_many_sync使用批量接口。
+    GROQ_REPLAY_FILE和GROQ_RECORD_FILE同样作用于异步请求。
+    """
+
+    def __init__(self,
+                 encoder: Optional[ImageEncoder] = None,
+                 cache: Optional[ResponseCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 max_retries: int = 3,
+                 coalesce: bool = True,
+                 base_url: Optional[str] = None,
+                 max_concurrency: int = 4):
+        """
+        Args:
+            encoder: 图像编码器
+            cache: 可选的图像分析回复缓存
+            rate_limiter: 客户端速率限制器，与同步方法共享
+            max_retries: 遇到429/5xx/连接错误时的最大重试次数
+            coalesce: 是否合并相同的并发请求
+            base_url: 可选的API地址
+            max_concurrency: 同时进行的最大请求数
+        """
+        super().__init__(encoder=encoder, cache=cache, rate_limiter=rate_limiter,
+                         max_retries=max_retries, coalesce=coalesce, base_url=base_url)
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency必须大于0")
+        self.max_concurrency = max_concurrency
+        self.async_client = AsyncGroq(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            max_retries=0
+        )
+        replay_file = os.getenv("GROQ_REPLAY_FILE")
+        record_file = os.getenv("GROQ_RECORD_FILE")
+        if replay_file:
+            # 复用同步客户端已读取的回放记录
+            self.async_client = AsyncReplayClient(records=self.client.records)
+        elif record_file:
+            self.async_client = AsyncRecordingClient(self.async_client, record_file)
+
+        # 每个事件循环一个信号量
+        self._semaphores = weakref.WeakKeyDictionary()
+        # 同步门面使用的后台事件循环
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        """获取当前事件循环的并发信号量"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def _send_async(self, kwargs: Dict[str, Any]):
+        """在并发限制内发出一次请求，返回 (响应, 响应头)"""
+        completions = self.async_client.chat.completions
+        async with self._semaphore():
+            if kwargs.get("stream"):
+                return await completions.create(**kwargs), None
+            raw = await completions.with_raw_response.create(**kwargs)
+        response = raw.parse()
+        if inspect.isawaitable(response):
+            response = await response
+        return response, raw.headers
+
+    async def _create_with_retry_async(self, kwargs: Dict[str, Any]):
+        """_create_with_retry的异步版本"""
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire_async(kwargs.get("max_tokens", 0))
+            try:
+                response, headers = await self._send_async(kwargs)
+            except Exception as e:
+                await asyncio.sleep(self._handle_failure(e, attempt))
+                continue
+            if headers is not None:
+                self.rate_limiter.update_from_headers(headers)
+            return response
+
+    async def _create_async(self, **kwargs):
+        """_create的异步版本，在同一事件循环内合并相同的并发请求"""
+        kwargs.setdefault("model", self.model)
+        if self.coalescer is None or kwargs.get("stream"):
+            return await self._create_with_retry_async(kwargs)
+        return await self.coalescer.run_async(
+            request_key(**kwargs), lambda: self._create_with_retry_async(kwargs)
+        )
+
+    async def _complete_async(self,
+                              messages: List[Dict[str, Any]],
+                              max_tokens: int,
+                              temperature: float) -> str:
+        """发送一次非流式请求并返回回复文本"""
+        response = await self._create_async(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        return response.choices[0].message.content
+
+    async def _analyze_image_async(self,
+                                   image: Image.Image,
+                                   prompt: str,
+                                   max_tokens: int,
+                                   temperature: float,
+                                   region: Optional[Tuple[int, int, int, int]]) -> str:
+        """异步分析图像"""
+        # 哈希和编码是CPU密集操作，放到线程中避免阻塞事件循环
+        image_hash = await asyncio.to_thread(self._image_hash, image, region)
+        if image_hash is not None:
+            cached = self.cache.get(image_hash, prompt, self.model, temperature, max_tokens)
+            if cached is not None:
+                return cached
+
+        messages = await asyncio.to_thread(self._build_image_messages, image, prompt, region)
+        content = await self._complete_async(messages, max_tokens, temperature)
+        if image_hash is not None:
+            self.cache.put(image_hash, prompt, self.model, temperature, max_tokens, content)
+        return content
+
+    async def analyze_image_async(self,
+                                  image: Image.Image,
+                                  prompt: str = "请详细描述这个图像中的内容。",
+                                  max_tokens: int = 1000,
+                                  temperature: float = 0.7,
+                                  region: Optional[Tuple[int, int, int, int]] = None) -> str:
+        """异步分析图像内容，参数和异常与analyze_image相同"""
+        return await self._analyze_image_async(image, prompt, max_tokens, temperature, region)
+
+    async def chat_async(self,
+                         messages: List[Dict[str, str]],
+                         max_tokens: int = 1000,
+                         temperature: float = 0.7) -> str:
+        """异步文本聊天，参数和异常与chat相同"""
+        return await self._complete_async(messages, max_tokens, temperature)
+
+    async def chat_stream_async(self,
+                                messages: List[Dict[str, Any]],
+                                max_tokens: int = 1000,
+                                temperature: float = 0.7,
+                                on_delta: Optional[Callable[[str], None]] = None) -> AsyncCompletionStream:
+        """异步流式文本聊天，使用async for读取返回的AsyncCompletionStream
+
+        流式请求占用一个并发名额直到响应头返回；读取过程中的错误直接抛出。
+        """
+        start_time = time.perf_counter()
+        chunks = await self._create_async(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        )
+        return AsyncCompletionStream(chunks, on_delta=on_delta, start_time=start_time)
+
+    async def analyze_image_stream_async(self,
+                                         image: Image.Image,
+                                         prompt: str = "请详细描述这个图像中的内容。",
+                                         max_tokens: int = 1000,
+                                         temperature: float = 0.7,
+                                         region: Optional[Tuple[int, int, int, int]] = None,
+                                         on_delta: Optional[Callable[[str], None]] = None) -> AsyncCompletionStream:
+        """异步流式分析图像内容，参数与analyze_image_stream相同"""
+        start_time = time.perf_counter()
+        image_hash = await asyncio.to_thread(self._image_hash, image, region)
+        if image_hash is not None:
+            cached = self.cache.get(image_hash, prompt, self.model, temperature, max_tokens)
+            if cached is not None:
+                async def replay():
+                    yield cached
+                return AsyncCompletionStream(replay(), on_delta=on_delta, start_time=start_time)
+
+        on_complete = None
+        if image_hash is not None:
+            def on_complete(text):
+                self.cache.put(image_hash, prompt, self.model, temperature, max_tokens, text)
+
+        messages = await asyncio.to_thread(self._build_image_messages, image, prompt, region)
+        chunks = await self._create_async(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        )
+        return AsyncCompletionStream(chunks, on_delta=on_delta, on_complete=on_complete,
+                                     start_time=start_time)
+
+    async def _gather(self, coroutines) -> List[BatchResult]:
+        """并发执行并按输入顺序收集结果，单个条目失败不影响其他条目"""
+        async def run(index, coroutine):
+            try:
+                return BatchResult(index, value=await coroutine)
+            except Exception as e:
+                return BatchResult(index, error=e)
+
+        return list(await asyncio.gather(*(run(i, c) for i, c in enumerate(coroutines))))
+
+    async def analyze_images(self,
+                             images: Union[Image.Image, Sequence[Image.Image]],
+                             prompts: Union[str, Sequence[str]],
+                             max_tokens: int = 1000,
+                             temperature: float = 0.7,
+                             region: Optional[Tuple[int, int, int, int]] = None) -> List[BatchResult]:
+        """批量分析图像
+
+        images和prompts可以一一对应；也可以传入单张图像配多个提示词，
+        或多张图像配同一个提示词。
+
+        Args:
+            images: 图像或图像列表
+            prompts: 提示词或提示词列表
+            max_tokens: 最大生成token数
+            temperature: 生成温度
+            region: 可选的裁剪区域
+
+        Returns:
+            按输入顺序排列的BatchResult列表
+        """
+        if isinstance(images, Image.Image):
+            images = [images] * (1 if isinstance(prompts, str) else len(prompts))
+        if isinstance(prompts, str):
+            prompts = [prompts] * len(images)
+        if len(images) != len(prompts):
+            raise ValueError("图像数量必须与提示词数量相同")
+
+        return await self._gather(
+            self._analyze_image_async(image, prompt, max_tokens, temperature, region)
+            for image, prompt in zip(images, prompts)
+        )
+
+    async def chat_many(self,
+                        conversations: Sequence[List[Dict[str, str]]],
+                        max_tokens: int = 1000,
+                        temperature: float = 0.7) -> List[BatchResult]:
+        """批量文本聊天
+
+        Args:
+            conversations: 消息列表的列表，每个元素是一次独立的chat请求
+            max_tokens: 最大生成token数
+            temperature: 生成温度
+
+        Returns:
+            按输入顺序排列的BatchResult列表
+        """
+        return await self._gather(
+            self._complete_async(messages, max_tokens, temperature)
+            for messages in conversations
+        )
+
+    # 同步门面
+    def _run_sync(self, coroutine):
+        """在后台事件循环中执行协程并阻塞等待结果"""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+                thread.start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def analyze_images_sync(self, images, prompts, **kwargs) -> List[BatchResult]:
+        """analyze_images的阻塞版本"""
+        return self._run_sync(self.analyze_images(images, prompts, **kwargs))
+
+    def chat_many_sync(self, conversations, **kwargs) -> List[BatchResult]:
+        """chat_many的阻塞版本"""
+        return self._run_sync(self.chat_many(conversations, **kwargs))
+
+    async def aclose(self):
+        """关闭异步客户端的连接，在使用过异步接口的事件循环中调用"""
+        close = getattr(self.async_client, "close", None)
+        if close is not None:
+            result = close()
+            if inspect.isawaitable(result):
+                await result
+
+    def close(self):
+        """在后台事件循环中关闭异步客户端，然后停止后台事件循环"""
+        self._run_sync(self.aclose())
+        with self._loop_lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
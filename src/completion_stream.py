@@ -0,0 +1,122 @@
+import time
+from typing import Callable, Optional, Dict, Any, Iterator, AsyncIterator
+
+
+class _StreamMetrics:
+    """流式回复的聚合文本和延迟统计"""
+
+    def __init__(self,
+                 on_delta: Optional[Callable[[str], None]] = None,
+                 on_complete: Optional[Callable[[str], None]] = None,
+                 start_time: Optional[float] = None):
+        """
+        Args:
+            on_delta: 每收到一段文本时调用的回调
+            on_complete: 流结束后以完整文本调用的回调
+            start_time: 请求发出的时间（time.perf_counter），默认为创建时刻
+        """
+        self.on_delta = on_delta
+        self.on_complete = on_complete
+        self.start_time = time.perf_counter() if start_time is None else start_time
+        self.time_to_first_token = None
+        self.total_latency = None
+        self.finished = False
+        self._parts = []
+
+    @property
+    def text(self) -> str:
+        """目前为止收到的全部文本"""
+        return "".join(self._parts)
+
+    def _on_delta(self, delta: str):
+        if self.time_to_first_token is None:
+            self.time_to_first_token = time.perf_counter() - self.start_time
+        self._parts.append(delta)
+        if self.on_delta:
+            self.on_delta(delta)
+
+    def _on_finish(self):
+        self.total_latency = time.perf_counter() - self.start_time
+        self.finished = True
+        if self.on_complete:
+            self.on_complete(self.text)
+
+    def metrics(self) -> Dict[str, Any]:
+        """返回延迟统计（秒）"""
+        return {
+            "time_to_first_token": self.time_to_first_token,
+            "total_latency": self.total_latency,
+            "characters": sum(len(part) for part in self._parts),
+        }
+
+
+def _chunk_delta(chunk) -> Optional[str]:
+    """从ChatCompletionChunk中取出文本增量"""
+    if not chunk.choices:
+        return None
+    return chunk.choices[0].delta.content
+
+
+class CompletionStream(_StreamMetrics):
+    """同步流式回复，迭代得到文本增量
+
+    用法:
+        stream = controller.chat_stream(messages)
+        for delta in stream:
+            print(delta, end="")
+        print(stream.text, stream.time_to_first_token)
+    """
+
+    def __init__(self, chunks: Iterator, **kwargs):
+        """
+        Args:
+            chunks: SDK返回的ChatCompletionChunk迭代器，也可以直接是文本片段
+            **kwargs: 传递给_StreamMetrics的回调和起始时间
+        """
+        super().__init__(**kwargs)
+        self._chunks = iter(chunks)
+
+    def __iter__(self) -> Iterator[str]:
+        if self.finished:
+            return
+        for chunk in self._chunks:
+            delta = chunk if isinstance(chunk, str) else _chunk_delta(chunk)
+            if delta:
+                self._on_delta(delta)
+                yield delta
+        self._on_finish()
+
+    def result(self) -> str:
+        """读完剩余内容并返回完整文本"""
+        for _ in self:
+            pass
+        return self.text
+
+
+class AsyncCompletionStream(_StreamMetrics):
+    """异步流式回复，使用async for得到文本增量"""
+
+    def __init__(self, chunks: AsyncIterator, **kwargs):
+        """
+        Args:
+            chunks: SDK返回的异步ChatCompletionChunk迭代器，也可以直接是文本片段
+            **kwargs: 传递给_StreamMetrics的回调和起始时间
+        """
+        super().__init__(**kwargs)
+        self._chunks = chunks.__aiter__()
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        if self.finished:
+            return
+        async for chunk in self._chunks:
+            delta = chunk if isinstance(chunk, str) else _chunk_delta(chunk)
+            if delta:
+                self._on_delta(delta)
+                yield delta
+        self._on_finish()
+
+    async def result(self) -> str:
+        """读完剩余内容并返回完整文本"""
+        async for _ in self:
+            pass
+        return self.text
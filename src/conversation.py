@@ -0,0 +1,275 @@
+import hashlib
+from typing import List, Optional, Dict, Any, Callable
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的token数
+
+    不依赖分词器：中日韩字符按每字1个token计，其余字符按每4个字符1个token计。
+    """
+    if not text:
+        return 0
+    cjk = sum(1 for char in text if "⺀" <= char <= "鿿" or "豈" <= char <= "￯")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _message_tokens(message: Dict[str, Any]) -> int:
+    """估算一条消息的token数，包含角色等固定开销"""
+    content = message.get("content") or ""
+    if not isinstance(content, str):
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return estimate_tokens(content) + 4
+
+
+class Attachment:
+    """只存储一次、在对话中按编号引用的大段文本（例如图像分析结果）"""
+
+    def __init__(self, attachment_id: str, label: str, text: str):
+        """
+        Args:
+            attachment_id: 附件编号，如 "#1"
+            label: 附件说明，如 "当前界面分析"
+            text: 附件全文
+        """
+        self.id = attachment_id
+        self.label = label
+        self.text = text
+        self.tokens = estimate_tokens(text)
+        # 超出预算时只展示开头的字符数，None表示不限制
+        self.max_chars: Optional[int] = None
+
+    def reference(self) -> str:
+        """在消息中引用附件时使用的简短文本"""
+        return f"[附件{self.id}: {self.label}]"
+
+    def render(self, max_chars: Optional[int] = None) -> str:
+        """在参考资料块中展示附件，max_chars限制展示长度"""
+        text = self.text
+        if self.max_chars is not None:
+            max_chars = self.max_chars if max_chars is None else min(max_chars, self.max_chars)
+        if max_chars is not None and len(text) > max_chars:
+            text = text[:max_chars] + "……（已截断）"
+        return f"附件{self.id}（{self.label}）:\n{text}"
+
+
+class Conversation:
+    """带token预算的对话记忆
+
+    记录对话历史，构建请求时把历史裁剪到预算以内：超出预算时丢弃最早的轮次，
+    或者（strategy="summarize"）把它们合并进滚动摘要。大段的图像分析结果作为附件
+    只放在系统消息的参考资料块里一次，对话中只保留简短引用；历史裁剪到keep_last_turns后
+    仍超出预算时，先移除不再被引用的旧附件，再截短、最后移除仍被引用的旧附件。
+    """
+
+    def __init__(self,
+                 controller=None,
+                 system_prompt: Optional[str] = None,
+                 token_budget: int = 4000,
+                 strategy: str = "drop",
+                 keep_last_turns: int = 2,
+                 max_attachments: int = 3,
+                 summarizer: Optional[Callable[[str, List[Dict[str, Any]]], str]] = None):
+        """
+        Args:
+            controller: 用于发送请求的GroqController
+            system_prompt: 系统提示词
+            token_budget: 每次请求的提示词token预算
+            strategy: 超出预算时的处理方式，"drop"丢弃最早轮次，"summarize"合并进摘要
+            keep_last_turns: 无论预算如何都保留的最近轮次数
+            max_attachments: 参考资料块中完整展示的最近附件数，更早的附件只展示开头
+            summarizer: 自定义摘要函数 (旧摘要, 被移出的消息) -> 新摘要，默认调用controller生成
+        """
+        if strategy not in ("drop", "summarize"):
+            raise ValueError(f"不支持的裁剪策略: {strategy}")
+        self.controller = controller
+        self.system_prompt = system_prompt
+        self.token_budget = token_budget
+        self.strategy = strategy
+        self.keep_last_turns = keep_last_turns
+        self.max_attachments = max_attachments
+        self.summarizer = summarizer
+
+        # 每个轮次是一组消息（用户消息及随后的助手回复）
+        self.turns: List[List[Dict[str, Any]]] = []
+        self.summary = ""
+        self.attachments: Dict[str, Attachment] = {}
+        self._attachment_hashes: Dict[str, str] = {}
+        self._attachment_count = 0
+        self.dropped_turns = 0
+        self.evicted_attachments = 0
+
+    # 附件
+    def attach(self, text: str, label: str = "图像分析结果") -> Attachment:
+        """存储一段大文本，相同内容只存一次
+
+        Returns:
+            Attachment: 附件对象，可用reference()在消息中引用
+        """
+        digest = hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+        attachment_id = self._attachment_hashes.get(digest)
+        if attachment_id is not None:
+            return self.attachments[attachment_id]
+        # 附件可能被移除，编号按累计数分配，避免与仍在引用的编号重复
+        self._attachment_count += 1
+        attachment = Attachment(f"#{self._attachment_count}", label, text)
+        self.attachments[attachment.id] = attachment
+        self._attachment_hashes[digest] = attachment.id
+        return attachment
+
+    def analyze_image(self, image, prompt: str, label: Optional[str] = None, **kwargs) -> Attachment:
+        """调用controller分析图像，并把结果存为附件"""
+        result = self.controller.analyze_image(image, prompt, **kwargs)
+        return self.attach(result, label or prompt[:20])
+
+    # 历史
+    def add_user(self, content: str, attachments: Optional[List[Attachment]] = None):
+        """追加一条用户消息，附件以引用形式附在消息末尾"""
+        if attachments:
+            content = content + "\n" + " ".join(a.reference() for a in attachments)
+        self.turns.append([{"role": "user", "content": content}])
+
+    def add_assistant(self, content: str):
+        """追加一条助手回复"""
+        message = {"role": "assistant", "content": content}
+        if self.turns and self.turns[-1][-1]["role"] == "user":
+            self.turns[-1].append(message)
+        else:
+            self.turns.append([message])
+
+    def clear(self):
+        """清空历史、摘要和附件"""
+        self.turns.clear()
+        self.summary = ""
+        self.attachments.clear()
+        self._attachment_hashes.clear()
+        self._attachment_count = 0
+        self.dropped_turns = 0
+        self.evicted_attachments = 0
+
+    # 构建请求
+    def _system_message(self) -> Optional[Dict[str, str]]:
+        parts = []
+        if self.system_prompt:
+            parts.append(self.system_prompt)
+        if self.summary:
+            parts.append(f"之前对话的摘要:\n{self.summary}")
+        if self.attachments:
+            attachments = list(self.attachments.values())
+            rendered = []
+            for index, attachment in enumerate(attachments):
+                recent = index >= len(attachments) - self.max_attachments
+                rendered.append(attachment.render(None if recent else 80))
+            parts.append("参考资料:\n" + "\n\n".join(rendered))
+        if not parts:
+            return None
+        return {"role": "system", "content": "\n\n".join(parts)}
+
+    def token_count(self) -> int:
+        """当前请求的估算token数"""
+        return sum(_message_tokens(m) for m in self.messages(trim=False))
+
+    def _summarize(self, removed: List[Dict[str, Any]]):
+        """把移出预算的消息合并进滚动摘要"""
+        if self.summarizer is not None:
+            self.summary = self.summarizer(self.summary, removed)
+            return
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in removed)
+        prompt = "请把以下对话内容合并进已有摘要，保留关键事实和未完成的任务，不超过200字。\n\n"
+        if self.summary:
+            prompt += f"已有摘要:\n{self.summary}\n\n"
+        prompt += f"新的对话内容:\n{transcript}"
+        self.summary = self.controller.chat([{"role": "user", "content": prompt}], max_tokens=400)
+
+    def _trim(self):
+        """丢弃或摘要最早的轮次，直到估算token数不超过预算
+
+        先确定要移出的轮次，摘要成功后才从历史中删除；摘要请求失败时历史保持不变。
+        历史已经裁剪到keep_last_turns仍超出预算时，再移除或截短旧附件。
+        """
+        excess = self.token_count() - self.token_budget
+        count = 0
+        removable = len(self.turns) - max(self.keep_last_turns, 1)
+        while count < removable and excess > 0:
+            excess -= sum(_message_tokens(m) for m in self.turns[count])
+            count += 1
+        if count:
+            if self.strategy == "summarize":
+                self._summarize([m for turn in self.turns[:count] for m in turn])
+            del self.turns[:count]
+            self.dropped_turns += count
+        if self.attachments and self.token_count() > self.token_budget:
+            self._trim_attachments()
+
+    def _referenced(self, attachment: Attachment) -> bool:
+        reference = attachment.reference()
+        return any(isinstance(m.get("content"), str) and reference in m["content"]
+                   for turn in self.turns for m in turn)
+
+    def _evict(self, attachment: Attachment):
+        del self.attachments[attachment.id]
+        for digest, attachment_id in list(self._attachment_hashes.items()):
+            if attachment_id == attachment.id:
+                del self._attachment_hashes[digest]
+        self.evicted_attachments += 1
+
+    def _trim_attachments(self):
+        """从最早的附件开始移除或截短，直到估算token数不超过预算"""
+        def over_budget() -> bool:
+            return self.token_count() > self.token_budget
+
+        # 1. 移除历史中已不再引用的附件
+        for attachment in list(self.attachments.values()):
+            if not over_budget():
+                return
+            if not self._referenced(attachment):
+                self._evict(attachment)
+        # 2. 仍被引用的附件只保留开头，与较早附件的展示长度一致
+        for attachment in list(self.attachments.values()):
+            if not over_budget():
+                return
+            attachment.max_chars = 80
+        # 3. 仍超出预算时移除最早的附件
+        for attachment in list(self.attachments.values()):
+            if not over_budget():
+                return
+            self._evict(attachment)
+
+    def messages(self, trim: bool = True) -> List[Dict[str, Any]]:
+        """构建发送给API的消息列表
+
+        Args:
+            trim: 是否先把历史裁剪到预算以内
+        """
+        if trim:
+            self._trim()
+        messages = []
+        system = self._system_message()
+        if system:
+            messages.append(system)
+        for turn in self.turns:
+            messages.extend(turn)
+        return messages
+
+    def send(self,
+             content: str,
+             attachments: Optional[List[Attachment]] = None,
+             **kwargs) -> str:
+        """追加用户消息、发送请求并记录回复
+
+        Args:
+            content: 用户消息
+            attachments: 本轮引用的附件
+            **kwargs: 传递给controller.chat的参数
+
+        Returns:
+            str: 助手回复
+        """
+        self.add_user(content, attachments)
+        try:
+            reply = self.controller.chat(self.messages(), **kwargs)
+        except Exception:
+            # 请求失败时撤回本轮用户消息，便于调用方重试
+            self.turns.pop()
+            raise
+        self.add_assistant(reply)
+        return reply
@@ -0,0 +1,274 @@
+import json
+import re
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+
+class ElementLocation(NamedTuple):
+    """界面元素的位置，坐标和尺寸都是相对图像的比例 (0-1)"""
+    x: float
+    y: float
+    width: float = 0.0
+    height: float = 0.0
+    confidence: float = 1.0
+
+    def to_absolute(self, width: int, height: int, left: int = 0, top: int = 0) -> Tuple[int, int]:
+        """把中心点转换为像素坐标
+
+        Args:
+            width: 图像（或区域）宽度
+            height: 图像（或区域）高度
+            left: 区域左上角在屏幕上的X坐标
+            top: 区域左上角在屏幕上的Y坐标
+        """
+        return left + int(self.x * width), top + int(self.y * height)
+
+
+def build_locate_prompt(labels: Sequence[str]) -> str:
+    """构建要求模型以JSON返回元素位置的提示词"""
+    example = {label: {"x": 0.5, "y": 0.9, "w": 0.1, "h": 0.05, "confidence": 0.9} for label in labels[:1]}
+    names = "、".join(f'"{label}"' for label in labels)
+    return (
+        f"请在这张图片中找到以下界面元素：{names}。\n"
+        "只返回一个JSON对象，键为元素名称，值包含元素中心的相对坐标x、y，"
+        "相对宽高w、h（都是0-1之间的小数，精确到3位）以及0-1之间的置信度confidence。"
+        "找不到的元素值为null。示例：\n"
+        f"{json.dumps(example, ensure_ascii=False)}"
+    )
+
+
+def _extract_json_object(text: str) -> Optional[str]:
+    """从回复中取出第一个JSON对象，去掉代码块标记并补全被截断的括号"""
+    text = re.sub(r"```(?:json)?", "", text)
+    start = text.find("{")
+    if start < 0:
+        return None
+    depth = 0
+    in_string = False
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+
+    # 回复被截断：去掉不完整的尾部后补全括号
+    body = text[start:]
+    if in_string:
+        body += '"'
+    body = re.sub(r"[,:]\s*$", "", body.rstrip())
+    stack = []
+    in_string = False
+    escaped = False
+    for char in body:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    return body + "".join(reversed(stack))
+
+
+def _mask_strings(text: str) -> Tuple[str, List[str]]:
+    """把字符串字面量替换为占位符，单引号字符串转换为双引号字符串
+
+    Returns:
+        (替换后的文本, 按顺序排列的JSON字符串字面量)
+    """
+    literals = []
+    parts = []
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if char == '"':
+            end = index + 1
+            while end < len(text) and text[end] != '"':
+                end += 2 if text[end] == "\\" else 1
+            literal = text[index:end + 1]
+        elif char == "'" and not (index and (text[index - 1].isalnum() or text[index - 1] in "_\"")):
+            end = text.find("'", index + 1)
+            if end < 0 or "\n" in text[index + 1:end]:
+                parts.append(char)
+                index += 1
+                continue
+            literal = json.dumps(text[index + 1:end], ensure_ascii=False)
+        else:
+            parts.append(char)
+            index += 1
+            continue
+        parts.append(f'"\0{len(literals)}\0"')
+        literals.append(literal)
+        index = end + 1
+    return "".join(parts), literals
+
+
+def _repair_json(text: str) -> str:
+    """修复常见的JSON格式问题：单引号、尾随逗号、未加引号的键、Python字面量
+
+    只修改字符串字面量以外的部分，标签中的撇号和逗号等保持不变。
+    """
+    text, literals = _mask_strings(text)
+    text = re.sub(r",\s*([}\]])", r"\1", text)
+    text = re.sub(r"([{,]\s*)([^\W\d][\w-]*)(\s*:)", r'\1"\2"\3', text)
+    text = re.sub(r"\bNone\b", "null", text)
+    text = re.sub(r"\bTrue\b", "true", text)
+    text = re.sub(r"\bFalse\b", "false", text)
+    return re.sub(r'"\0(\d+)\0"', lambda match: literals[int(match.group(1))], text)
+
+
+def _load_json(text: str) -> Optional[dict]:
+    """尽量把回复解析为字典，失败时返回None"""
+    candidate = _extract_json_object(text)
+    if candidate is None:
+        return None
+    for attempt in (candidate, _repair_json(candidate)):
+        try:
+            data = json.loads(attempt)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict):
+            return data
+    return None
+
+
+def _to_float(value) -> Optional[float]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        match = re.search(r"-?\d+(?:\.\d+)?", value)
+        if match:
+            number = float(match.group())
+            return number / 100 if value.strip().endswith("%") else number
+    return None
+
+
+def _normalize(value: Optional[float], extent: Optional[int]) -> Optional[float]:
+    """把坐标统一为0-1的比例：像素值按图像尺寸换算，百分数除以100"""
+    if value is None:
+        return None
+    if value > 1:
+        if extent and value <= extent:
+            value = value / extent
+        elif value <= 100:
+            value = value / 100
+    return min(max(value, 0.0), 1.0)
+
+
+def _location_from_value(value, image_size: Optional[Tuple[int, int]]) -> Optional[ElementLocation]:
+    """把JSON中的单个元素值转换为ElementLocation"""
+    if value is None:
+        return None
+    width, height = image_size or (None, None)
+
+    if isinstance(value, (list, tuple)):
+        numbers = [_to_float(v) for v in value]
+        if len(numbers) < 2 or numbers[0] is None or numbers[1] is None:
+            return None
+        keys = ["x", "y", "w", "h", "confidence"]
+        value = dict(zip(keys, numbers))
+    if not isinstance(value, dict):
+        return None
+
+    lowered = {str(k).lower(): v for k, v in value.items()}
+
+    def pick(*names):
+        for name in names:
+            if name in lowered:
+                return _to_float(lowered[name])
+        return None
+
+    # 支持以边界框 [x1, y1, x2, y2] 表示的位置
+    bbox = lowered.get("bbox") or lowered.get("box")
+    if isinstance(bbox, (list, tuple)) and len(bbox) == 4:
+        x1, y1, x2, y2 = (_normalize(_to_float(v), e) for v, e in zip(bbox, (width, height, width, height)))
+        if None in (x1, y1, x2, y2):
+            return None
+        x, y, w, h = (x1 + x2) / 2, (y1 + y2) / 2, abs(x2 - x1), abs(y2 - y1)
+    else:
+        x = _normalize(pick("x", "cx", "center_x"), width)
+        y = _normalize(pick("y", "cy", "center_y"), height)
+        if x is None or y is None:
+            return None
+        w = _normalize(pick("w", "width"), width) or 0.0
+        h = _normalize(pick("h", "height"), height) or 0.0
+
+    confidence = pick("confidence", "conf", "score")
+    if confidence is None:
+        confidence = 1.0
+    elif confidence > 1:
+        confidence = confidence / 100
+    return ElementLocation(x, y, w, h, min(max(confidence, 0.0), 1.0))
+
+
+def _parse_plain_text(text: str, labels: Sequence[str]) -> Dict[str, Optional[ElementLocation]]:
+    """JSON完全无法解析时，退回解析 "x: 0.5 y: 0.8" 形式的文本"""
+    x_match = re.search(r"\bx\s*[:：=]\s*(-?\d+(?:\.\d+)?)", text, re.IGNORECASE)
+    y_match = re.search(r"\by\s*[:：=]\s*(-?\d+(?:\.\d+)?)", text, re.IGNORECASE)
+    results = {label: None for label in labels}
+    if x_match and y_match and len(labels) == 1:
+        x = _normalize(float(x_match.group(1)), None)
+        y = _normalize(float(y_match.group(1)), None)
+        results[labels[0]] = ElementLocation(x, y, confidence=0.5)
+    return results
+
+
+def parse_locations(text: str,
+                    labels: Sequence[str],
+                    image_size: Optional[Tuple[int, int]] = None) -> Dict[str, Optional[ElementLocation]]:
+    """把模型回复解析为 {标签: ElementLocation或None}
+
+    在本地修复格式问题（代码块、截断、单引号、尾随逗号、像素或百分比坐标等），
+    不需要再请求一次模型。
+
+    Args:
+        text: 模型回复
+        labels: 需要的元素标签
+        image_size: 发送给模型的图像尺寸，用于把像素坐标换算为比例
+
+    Returns:
+        每个标签对应的位置，找不到时为None
+    """
+    labels = list(labels)
+    data = _load_json(text or "")
+    if data is None:
+        return _parse_plain_text(text or "", labels)
+
+    # 兼容 {"elements": [{"label": ..., ...}]} 形式
+    for key in ("elements", "results", "items"):
+        if isinstance(data.get(key), list):
+            data = {
+                item.get("label") or item.get("name"): item
+                for item in data[key] if isinstance(item, dict)
+            }
+            break
+
+    results = {}
+    normalized_keys = {str(k).strip().lower(): v for k, v in data.items()}
+    for label in labels:
+        value = data.get(label, normalized_keys.get(label.strip().lower()))
+        results[label] = _location_from_value(value, image_size)
+
+    # 只找一个元素时，模型常常直接返回 {"x": ..., "y": ...}
+    if len(labels) == 1 and results[labels[0]] is None and "x" in normalized_keys:
+        results[labels[0]] = _location_from_value(data, image_size)
+    return results
+
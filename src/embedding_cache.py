@@ -0,0 +1,81 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import torch
+from PIL import Image
+
+
+def image_digest(image: Image.Image, *extra: Any) -> str:
+    """按图像内容和附加参数（如模型名称、精度）生成缓存键"""
+    digest = hashlib.blake2b(image.tobytes(), digest_size=16)
+    digest.update(repr((image.mode, image.size) + extra).encode())
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """按图像哈希缓存视觉编码器输出的张量，总大小超过上限时按LRU淘汰"""
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            max_bytes: 缓存张量占用的内存上限（字节），0表示不缓存
+        """
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _size(tensor: torch.Tensor) -> int:
+        return tensor.element_size() * tensor.nelement()
+
+    def get(self, key: str) -> Optional[torch.Tensor]:
+        """查找缓存的张量，未命中返回None"""
+        with self._lock:
+            tensor = self._entries.get(key)
+            if tensor is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return tensor
+
+    def put(self, key: str, tensor: torch.Tensor):
+        """写入缓存，单个张量超过上限时不缓存"""
+        size = self._size(tensor)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= self._size(old)
+            self._entries[key] = tensor
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= self._size(evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,269 @@
+"""
+后台连续截图的环形缓冲区
+
+后台线程按目标帧率截图，写入预先分配的固定大小环形缓冲区，每帧带有编号和单调时钟时间戳。
+OCR、画面变化检测、模型分析等使用方从缓冲区取帧，不再各自截图，同一时刻的帧可以互相对应。
+缓冲区的帧数受内存上限约束，占用的内存在stats中报告。
+后台截图出错时（显示器变化、截图后端异常等）线程不会退出，而是记录错误并逐渐延长重试间隔，
+errors和last_error可以说明缓冲区为什么没有新帧。
+截图尺寸变化（调整分辨率、换显示器）时丢弃旧帧，按新尺寸重新分配缓冲区，帧编号继续递增。
+"""
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .pixel_probe import local_points
+from .screen_capture import CaptureBackend
+
+
+class Frame(NamedTuple):
+    """缓冲区中的一帧"""
+    frame_id: int
+    timestamp: float
+    image: np.ndarray
+
+    def to_image(self) -> Image.Image:
+        """转换为PIL Image"""
+        return Image.fromarray(self.image, "RGB")
+
+
+class FrameBuffer:
+    """后台截图线程和帧环形缓冲区"""
+
+    def __init__(self,
+                 capture: CaptureBackend,
+                 fps: float = 10.0,
+                 capacity: int = 32,
+                 region: Optional[Tuple[int, int, int, int]] = None,
+                 max_memory_mb: float = 256):
+        """
+        Args:
+            capture: 截图后端
+            fps: 目标帧率
+            capacity: 缓冲的帧数，超过内存上限时自动减少
+            region: 可选的截图区域 (left, top, width, height)，不指定时截取整个屏幕
+            max_memory_mb: 缓冲区占用内存的上限（MB），至少要能放下一帧
+        """
+        self.capture = capture
+        self.fps = fps
+        self.region = region
+        self.max_bytes = int(max_memory_mb * 1024 * 1024)
+        self._requested_capacity = capacity
+        self.capacity = 0
+        self._frames: Optional[np.ndarray] = None
+        self._ids = np.full(0, -1, dtype=np.int64)
+        self._timestamps = np.zeros(0)
+        self._next_id = 0
+        # 当前缓冲区中第一帧的编号，重新分配后之前的帧都不再可用
+        self._first_id = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.late_frames = 0
+        self.reallocations = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.last_error: Optional[BaseException] = None
+        self._started_at = 0.0
+
+    def _allocate(self, shape: Tuple[int, ...]):
+        # 调用方持有锁；先丢弃原有的帧，新尺寸放不下时缓冲区保持为空
+        self._frames = None
+        self.capacity = 0
+        self._ids = np.full(0, -1, dtype=np.int64)
+        self._timestamps = np.zeros(0)
+        self._first_id = self._next_id
+        frame_bytes = int(np.prod(shape))
+        if frame_bytes > self.max_bytes:
+            raise ValueError(f"一帧需要 {frame_bytes} 字节，超过缓冲区内存上限 {self.max_bytes} 字节")
+        self.capacity = min(self._requested_capacity, self.max_bytes // frame_bytes)
+        self._frames = np.empty((self.capacity,) + tuple(shape), dtype=np.uint8)
+        self._ids = np.full(self.capacity, -1, dtype=np.int64)
+        self._timestamps = np.zeros(self.capacity)
+
+    def _write(self, image: np.ndarray, timestamp: float):
+        with self._cond:
+            if self._frames is None or image.shape != self._frames.shape[1:]:
+                if self._frames is not None:
+                    print(f"截图尺寸从 {self._frames.shape[1:]} 变为 {image.shape}，重新分配缓冲区")
+                    self.reallocations += 1
+                self._allocate(image.shape)
+            slot = self._next_id % self.capacity
+            self._frames[slot] = image
+            self._ids[slot] = self._next_id
+            self._timestamps[slot] = timestamp
+            self._next_id += 1
+            self._cond.notify_all()
+
+    def capture_once(self) -> int:
+        """截取一帧写入缓冲区，返回帧编号"""
+        start = time.monotonic()
+        image = self.capture.grab(self.region)
+        timestamp = (start + time.monotonic()) / 2
+        self._write(image, timestamp)
+        return self._next_id - 1
+
+    def _run(self):
+        period = 1.0 / self.fps
+        next_time = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.capture_once()
+            except Exception as e:
+                self.errors += 1
+                self.last_error = e
+                if self.consecutive_errors == 0:
+                    print(f"后台截图失败，稍后重试: {e!r}")
+                # 连续失败时逐渐延长重试间隔，最长5秒
+                self.consecutive_errors += 1
+                self._stop.wait(min(period * 2 ** self.consecutive_errors, 5.0))
+                next_time = time.monotonic()
+                continue
+            if self.consecutive_errors:
+                print(f"后台截图在连续失败 {self.consecutive_errors} 次后恢复")
+                self.consecutive_errors = 0
+            next_time += period
+            delay = next_time - time.monotonic()
+            if delay < 0:
+                # 截图跟不上目标帧率时跳过错过的时刻，不累积延迟
+                self.late_frames += int(-delay // period) + 1
+                next_time = time.monotonic()
+                continue
+            self._stop.wait(delay)
+
+    def start(self) -> "FrameBuffer":
+        """启动后台截图线程，返回自身"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self.consecutive_errors = 0
+            self._started_at = time.monotonic()
+            self._thread = threading.Thread(target=self._run, name="frame-buffer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """停止后台截图线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def healthy(self) -> bool:
+        """后台线程在运行且最近一次截图成功，此时最新帧是新鲜的"""
+        return self.running and self.consecutive_errors == 0
+
+    def _frame(self, slot: int) -> Frame:
+        # 调用方持有锁；复制像素，避免返回后被后台线程覆盖
+        return Frame(int(self._ids[slot]), float(self._timestamps[slot]), self._frames[slot].copy())
+
+    def latest(self) -> Optional[Frame]:
+        """返回最新的一帧，缓冲区为空时返回None"""
+        with self._cond:
+            if self._next_id == self._first_id:
+                return None
+            return self._frame((self._next_id - 1) % self.capacity)
+
+    def pixels(self, xs: np.ndarray, ys: np.ndarray) -> Optional[Tuple[int, float, np.ndarray]]:
+        """
+        只取出最新帧中若干像素的颜色，不复制整帧
+
+        Args:
+            xs: 屏幕X坐标数组
+            ys: 屏幕Y坐标数组
+
+        Returns:
+            (帧编号, 时间戳, (n, 3)的颜色数组)，缓冲区为空时返回None
+
+        Raises:
+            ValueError: 有坐标不在截图区域内
+        """
+        offset = self.region[:2] if self.region else (0, 0)
+        with self._cond:
+            if self._next_id == self._first_id:
+                return None
+            slot = (self._next_id - 1) % self.capacity
+            xs, ys = local_points(xs, ys, offset, self._frames.shape[1:])
+            colors = self._frames[slot][ys, xs]
+            return int(self._ids[slot]), float(self._timestamps[slot]), colors
+
+    def at(self, timestamp: float) -> Optional[Frame]:
+        """
+        返回时间戳最接近的帧
+
+        Args:
+            timestamp: time.monotonic() 时间
+
+        Returns:
+            缓冲区中时间戳最接近的帧，缓冲区为空时返回None
+        """
+        with self._cond:
+            valid = np.nonzero(self._ids >= 0)[0]
+            if len(valid) == 0:
+                return None
+            slot = valid[np.argmin(np.abs(self._timestamps[valid] - timestamp))]
+            return self._frame(slot)
+
+    def since(self, frame_id: int) -> List[Frame]:
+        """
+        返回编号大于frame_id且仍在缓冲区中的帧
+
+        Args:
+            frame_id: 上次处理到的帧编号，-1表示从最早的帧开始
+
+        Returns:
+            从旧到新排列的帧；处理太慢时较早的帧已被覆盖，可以通过帧编号的间隔发现
+        """
+        with self._cond:
+            first = max(frame_id + 1, self._next_id - self.capacity, self._first_id)
+            return [self._frame(i % self.capacity) for i in range(first, self._next_id)]
+
+    def wait(self, after_id: int = -1, timeout: Optional[float] = None) -> Optional[Frame]:
+        """
+        等待编号大于after_id的新帧
+
+        Args:
+            after_id: 已经处理过的帧编号
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            最新的一帧，超时返回None
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._next_id - 1 > max(after_id, self._first_id - 1), timeout):
+                return None
+            return self._frame((self._next_id - 1) % self.capacity)
+
+    @property
+    def memory_bytes(self) -> int:
+        """缓冲区占用的内存（字节）"""
+        return 0 if self._frames is None else self._frames.nbytes
+
+    def stats(self) -> Dict[str, float]:
+        """返回缓冲区统计"""
+        with self._cond:
+            elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+            return {
+                "capacity": self.capacity,
+                "frames": self._next_id,
+                "buffered": min(self._next_id - self._first_id, self.capacity),
+                "late_frames": self.late_frames,
+                "errors": self.errors,
+                "reallocations": self.reallocations,
+                "memory_bytes": self.memory_bytes,
+                "max_bytes": self.max_bytes,
+                "fps": self._next_id / elapsed if elapsed else 0.0,
+            }
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -1,49 +1,192 @@
 import os
-from typing import List, Optional, Dict, Any
+import time
+from typing import List, Optional, Dict, Any, Tuple, Callable
 from groq import Groq
 from dotenv import load_dotenv
-import base64
 from PIL import Image
-from io import BytesIO
+from .image_encoder import ImageEncoder
+from .response_cache import ResponseCache
+from .completion_stream import CompletionStream
+from .groq_errors import GroqRateLimitError, translate_error
+from .rate_limiter import RateLimiter, backoff_delay
+from .request_coalescer import RequestCoalescer, request_key
+from .conversation import Conversation
+from .element_locator import ElementLocation, build_locate_prompt, parse_locations
+from .groq_replay import RecordingClient, ReplayClient
 
 class GroqController:
     """Groq API控制器，用于处理与Groq API的交互"""
     
-    def __init__(self):
-        """初始化Groq客户端"""
+    def __init__(self,
+                 encoder: Optional[ImageEncoder] = None,
+                 cache: Optional[ResponseCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 max_retries: int = 3,
+                 coalesce: bool = True,
+                 base_url: Optional[str] = None):
+        """初始化Groq客户端
+        
+        Args:
+            encoder: 图像编码器，默认使用JPEG并限制最长边为1280像素
+            cache: 可选的图像分析回复缓存，相同画面和参数的请求直接返回缓存结果
+            rate_limiter: 客户端速率限制器，默认根据响应头自动校准
+            max_retries: 遇到429/5xx/连接错误时的最大重试次数
+            coalesce: 是否合并相同的并发请求
+            base_url: 可选的API地址，默认读取GROQ_BASE_URL环境变量或使用官方地址
+        
+        设置GROQ_RECORD_FILE环境变量时录制所有请求和响应到该文件；
+        设置GROQ_REPLAY_FILE时从该文件回放响应，不访问网络，也不需要API密钥。
+        """
         # 加载环境变量
         load_dotenv()
+        replay_file = os.getenv("GROQ_REPLAY_FILE")
+        record_file = os.getenv("GROQ_RECORD_FILE")
         
         # 获取API密钥
         api_key = os.getenv("GROQ_API_KEY")
         if not api_key:
-            raise ValueError("未找到GROQ_API_KEY环境变量")
+            if not replay_file:
+                raise ValueError("未找到GROQ_API_KEY环境变量")
+            api_key = "replay"
+        self.api_key = api_key
+        self.base_url = base_url or os.getenv("GROQ_BASE_URL") or None
         
-        # 初始化客户端
-        self.client = Groq(api_key=api_key)
+        # 初始化客户端，重试由控制器自己处理
+        self.client = Groq(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            max_retries=0
+        )
+        if replay_file:
+            self.client = ReplayClient(replay_file)
+        elif record_file:
+            self.client = RecordingClient(self.client, record_file)
         
         # 默认模型
         self.model = "meta-llama/llama-4-scout-17b-16e-instruct"  # 使用Llama 4 Scout模型
+        
+        # 图像编码器
+        self.encoder = encoder or ImageEncoder()
+        
+        # 图像分析回复缓存
+        self.cache = cache
+        
+        # 速率限制、重试和请求合并
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.coalescer = RequestCoalescer() if coalesce else None
     
-    def _encode_image(self, image: Image.Image) -> str:
+    def _encode_image(self,
+                      image: Image.Image,
+                      region: Optional[Tuple[int, int, int, int]] = None) -> str:
         """将PIL图像转换为base64编码
         
         Args:
             image: PIL图像对象
+            region: 可选的裁剪区域 (left, top, width, height)
             
         Returns:
             str: base64编码的图像字符串
         """
-        buffered = BytesIO()
-        image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-        return img_str
+        return self.encoder.encode(image, region).base64
+    
+    def _image_url(self,
+                   image: Image.Image,
+                   region: Optional[Tuple[int, int, int, int]] = None) -> str:
+        """将PIL图像转换为data URL"""
+        return self.encoder.encode(image, region).data_url
+    
+    def _image_hash(self,
+                    image: Image.Image,
+                    region: Optional[Tuple[int, int, int, int]] = None) -> Optional[int]:
+        """计算用于回复缓存的图像哈希，未启用缓存时返回None"""
+        if self.cache is None:
+            return None
+        if region:
+            left, top, width, height = region
+            image = image.crop((left, top, left + width, top + height))
+        return self.cache.image_hash(image)
+    
+    def _build_image_messages(self,
+                              image: Image.Image,
+                              prompt: str,
+                              region: Optional[Tuple[int, int, int, int]] = None) -> List[Dict[str, Any]]:
+        """构建包含图像和提示词的消息列表"""
+        return [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": self._image_url(image, region)
+                        }
+                    }
+                ]
+            }
+        ]
+    
+    def _send(self, kwargs: Dict[str, Any]):
+        """发出一次请求，返回 (响应, 响应头)；流式请求不返回响应头"""
+        completions = self.client.chat.completions
+        if kwargs.get("stream"):
+            return completions.create(**kwargs), None
+        raw = completions.with_raw_response.create(**kwargs)
+        return raw.parse(), raw.headers
+    
+    def _handle_failure(self, error: Exception, attempt: int) -> float:
+        """把异常转换为GroqControllerError，不可重试时抛出，否则返回重试前的等待秒数"""
+        error = translate_error(error)
+        cause = error.__cause__
+        if getattr(cause, "response", None) is not None:
+            self.rate_limiter.update_from_headers(cause.response.headers)
+        if not error.retryable or attempt >= self.max_retries:
+            raise error
+        
+        retry_after = error.retry_after if isinstance(error, GroqRateLimitError) else None
+        delay = backoff_delay(attempt, retry_after=retry_after)
+        print(f"调用Groq API失败，{delay:.2f}秒后重试 ({attempt + 1}/{self.max_retries}): {error}")
+        if isinstance(error, GroqRateLimitError):
+            # 速率限制对所有调用方生效
+            self.rate_limiter.pause(delay)
+            return 0.0
+        return delay
+    
+    def _create_with_retry(self, kwargs: Dict[str, Any]):
+        """在速率限制内发出请求，遇到可重试的错误时按指数退避重试"""
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(kwargs.get("max_tokens", 0))
+            try:
+                response, headers = self._send(kwargs)
+            except Exception as e:
+                time.sleep(self._handle_failure(e, attempt))
+                continue
+            if headers is not None:
+                self.rate_limiter.update_from_headers(headers)
+            return response
+    
+    def _create(self, **kwargs):
+        """创建聊天完成请求，相同的并发非流式请求只发出一次
+        
+        Raises:
+            GroqControllerError: 请求失败且无法通过重试恢复
+        """
+        kwargs.setdefault("model", self.model)
+        if self.coalescer is None or kwargs.get("stream"):
+            return self._create_with_retry(kwargs)
+        return self.coalescer.run(request_key(**kwargs), lambda: self._create_with_retry(kwargs))
     
     def analyze_image(self, 
                      image: Image.Image,
                      prompt: str = "请详细描述这个图像中的内容。",
                      max_tokens: int = 1000,
-                     temperature: float = 0.7) -> str:
+                     temperature: float = 0.7,
+                     region: Optional[Tuple[int, int, int, int]] = None,
+                     response_format: Optional[Dict[str, str]] = None) -> str:
         """分析图像内容
         
         Args:
@@ -51,44 +194,71 @@ class GroqController:
             prompt: 提示词
             max_tokens: 最大生成token数
             temperature: 生成温度，控制随机性
+            region: 可选的裁剪区域 (left, top, width, height)，只发送该区域
+            response_format: 可选的输出格式，如 {"type": "json_object"}
             
         Returns:
             str: 分析结果
+            
+        Raises:
+            GroqControllerError: 请求失败且无法通过重试恢复
         """
-        # 将图像转换为base64
-        base64_image = self._encode_image(image)
+        # 查询回复缓存
+        image_hash = self._image_hash(image, region)
+        if image_hash is not None:
+            cached = self.cache.get(image_hash, prompt, self.model, temperature, max_tokens, response_format)
+            if cached is not None:
+                return cached
         
-        try:
-            # 创建聊天完成请求
-            response = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{base64_image}"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                model=self.model,
-                max_tokens=max_tokens,
-                temperature=temperature
-            )
+        # 创建聊天完成请求
+        extra = {"response_format": response_format} if response_format else {}
+        response = self._create(
+            messages=self._build_image_messages(image, prompt, region),
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **extra
+        )
+        
+        # 返回生成的文本
+        content = response.choices[0].message.content
+        if image_hash is not None:
+            self.cache.put(image_hash, prompt, self.model, temperature, max_tokens, content, response_format)
+        return content
+    
+    def locate_elements(self,
+                        image: Image.Image,
+                        labels: List[str],
+                        region: Optional[Tuple[int, int, int, int]] = None,
+                        max_tokens: int = 500,
+                        temperature: float = 0.0) -> Dict[str, Optional[ElementLocation]]:
+        """在一次请求中定位多个界面元素
+        
+        使用JSON模式要求模型返回结构化结果，格式问题在本地修复，不会再次请求。
+        
+        Args:
+            image: PIL图像对象
+            labels: 元素标签列表，如 ["再来一次", "退出关卡"]
+            region: 可选的裁剪区域 (left, top, width, height)，坐标相对该区域
+            max_tokens: 最大生成token数
+            temperature: 生成温度，默认0以获得稳定输出
             
-            # 返回生成的文本
-            return response.choices[0].message.content
+        Returns:
+            {标签: ElementLocation}，坐标为相对图像（或区域）的比例，找不到的元素为None
             
-        except Exception as e:
-            print(f"调用Groq API时发生错误: {str(e)}")
-            return f"错误: {str(e)}"
+        Raises:
+            GroqControllerError: 请求失败且无法通过重试恢复
+        """
+        result = self.analyze_image(
+            image,
+            build_locate_prompt(labels),
+            max_tokens=max_tokens,
+            temperature=temperature,
+            region=region,
+            response_format={"type": "json_object"}
+        )
+        # 模型看到的是编码后的图像，像素坐标按编码后的尺寸换算
+        size = self.encoder.output_size(image, region)
+        return parse_locations(result, labels, image_size=size)
     
     def chat(self, 
             messages: List[Dict[str, str]], 
@@ -103,17 +273,92 @@ class GroqController:
             
         Returns:
             str: 聊天回复
+            
+        Raises:
+            GroqControllerError: 请求失败且无法通过重试恢复
+        """
+        response = self._create(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        return response.choices[0].message.content
+    
+    def conversation(self, **kwargs) -> Conversation:
+        """创建绑定到本控制器的对话记忆
+        
+        Args:
+            **kwargs: 传递给Conversation的参数，如system_prompt、token_budget、strategy
+            
+        Returns:
+            Conversation: 对话对象，使用send()逐轮发送消息
         """
-        try:
-            response = self.client.chat.completions.create(
-                messages=messages,
-                model=self.model,
-                max_tokens=max_tokens,
-                temperature=temperature
-            )
+        return Conversation(controller=self, **kwargs)
+    
+    def chat_stream(self,
+                    messages: List[Dict[str, Any]],
+                    max_tokens: int = 1000,
+                    temperature: float = 0.7,
+                    on_delta: Optional[Callable[[str], None]] = None) -> CompletionStream:
+        """流式文本聊天
+        
+        请求立即发出，迭代返回的CompletionStream得到文本增量；读完后可从
+        text、time_to_first_token和total_latency获取完整结果和延迟。
+        建立连接前的错误会按chat的规则重试，读取过程中的错误直接抛出。
+        
+        Args:
+            messages: 消息列表，每个消息是包含role和content的字典
+            max_tokens: 最大生成token数
+            temperature: 生成温度，控制随机性
+            on_delta: 每收到一段文本时调用的回调
             
-            return response.choices[0].message.content
+        Returns:
+            CompletionStream: 流式回复
+        """
+        start_time = time.perf_counter()
+        chunks = self._create(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        )
+        return CompletionStream(chunks, on_delta=on_delta, start_time=start_time)
+    
+    def analyze_image_stream(self,
+                             image: Image.Image,
+                             prompt: str = "请详细描述这个图像中的内容。",
+                             max_tokens: int = 1000,
+                             temperature: float = 0.7,
+                             region: Optional[Tuple[int, int, int, int]] = None,
+                             on_delta: Optional[Callable[[str], None]] = None) -> CompletionStream:
+        """流式分析图像内容
+        
+        参数与analyze_image相同。命中回复缓存时整段缓存文本作为一个增量返回，
+        流读完后完整回复写入缓存。
+        
+        Args:
+            on_delta: 每收到一段文本时调用的回调
             
-        except Exception as e:
-            print(f"调用Groq API时发生错误: {str(e)}")
-            return f"错误: {str(e)}" 
\ No newline at end of file
+        Returns:
+            CompletionStream: 流式回复
+        """
+        start_time = time.perf_counter()
+        image_hash = self._image_hash(image, region)
+        if image_hash is not None:
+            cached = self.cache.get(image_hash, prompt, self.model, temperature, max_tokens)
+            if cached is not None:
+                return CompletionStream([cached], on_delta=on_delta, start_time=start_time)
+        
+        on_complete = None
+        if image_hash is not None:
+            def on_complete(text):
+                self.cache.put(image_hash, prompt, self.model, temperature, max_tokens, text)
+        
+        chunks = self._create(
+            messages=self._build_image_messages(image, prompt, region),
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        )
+        return CompletionStream(chunks, on_delta=on_delta, on_complete=on_complete,
+                                start_time=start_time)
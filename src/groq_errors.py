@@ -0,0 +1,128 @@
+from typing import Optional
+import groq
+
+
+class GroqControllerError(Exception):
+    """GroqController调用失败的基类"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        """
+        Args:
+            message: 错误信息
+            status_code: HTTP状态码，连接错误时为None
+        """
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def retryable(self) -> bool:
+        """是否值得重试"""
+        return False
+
+
+class GroqRateLimitError(GroqControllerError):
+    """触发速率限制 (HTTP 429)"""
+
+    def __init__(self, message: str, status_code: Optional[int] = 429, retry_after: Optional[float] = None):
+        """
+        Args:
+            retry_after: 服务端建议的等待秒数
+        """
+        super().__init__(message, status_code)
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return True
+
+
+class GroqServerError(GroqControllerError):
+    """服务端错误 (HTTP 5xx)"""
+
+    @property
+    def retryable(self) -> bool:
+        return True
+
+
+class GroqConnectionError(GroqControllerError):
+    """网络连接失败或超时"""
+
+    @property
+    def retryable(self) -> bool:
+        return True
+
+
+class GroqAuthenticationError(GroqControllerError):
+    """API密钥无效或无权限 (HTTP 401/403)"""
+
+
+class GroqRequestError(GroqControllerError):
+    """请求本身有误 (其他4xx)，重试不会成功"""
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """解析速率限制头中的时长，如 "2m59.56s"、"7.66s"、"120ms" 或纯秒数
+
+    Returns:
+        秒数，无法解析时返回None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    total = 0.0
+    number = ""
+    i = 0
+    units = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    while i < len(value):
+        char = value[i]
+        if char.isdigit() or char == ".":
+            number += char
+            i += 1
+            continue
+        unit = "ms" if value[i:i + 2] == "ms" else char
+        if unit not in units or not number:
+            return None
+        total += float(number) * units[unit]
+        number = ""
+        i += len(unit)
+    if number:
+        return None
+    return total
+
+
+def translate_error(error: Exception) -> GroqControllerError:
+    """将Groq SDK抛出的异常转换为GroqControllerError
+
+    Args:
+        error: 原始异常
+
+    Returns:
+        对应的GroqControllerError子类实例，原始异常保存在__cause__中
+    """
+    if isinstance(error, GroqControllerError):
+        return error
+
+    if isinstance(error, groq.APIStatusError):
+        status = error.status_code
+        message = f"Groq API返回错误 {status}: {error.message}"
+        if status == 429:
+            retry_after = parse_duration(error.response.headers.get("retry-after"))
+            translated = GroqRateLimitError(message, status, retry_after)
+        elif status >= 500:
+            translated = GroqServerError(message, status)
+        elif status in (401, 403):
+            translated = GroqAuthenticationError(message, status)
+        else:
+            translated = GroqRequestError(message, status)
+    elif isinstance(error, groq.APIConnectionError):
+        translated = GroqConnectionError(f"无法连接Groq API: {error}")
+    else:
+        translated = GroqControllerError(f"调用Groq API时发生错误: {error}")
+
+    translated.__cause__ = error
+    return translated
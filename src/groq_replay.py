@@ -0,0 +1,351 @@
+"""
+Groq请求的录制与回放
+
+RecordingClient包装真实的Groq客户端，把每次请求和响应追加写入JSONL夹具文件；
+ReplayClient从夹具文件读取响应，在本地模拟延迟和错误，不访问网络。
+两者都实现GroqController用到的 chat.completions.create 和
+chat.completions.with_raw_response.create 接口；AsyncRecordingClient和AsyncReplayClient
+是对应的AsyncGroq版本，供AsyncGroqController使用。
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import groq
+
+from .request_coalescer import request_key
+
+
+def _strip_images(messages) -> List[Dict[str, Any]]:
+    """去掉消息中的图像数据，只保留文本，用于宽松匹配"""
+    stripped = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            content = [
+                part if part.get("type") == "text" else {"type": part.get("type")}
+                for part in content
+            ]
+        stripped.append({"role": message.get("role"), "content": content})
+    return stripped
+
+
+def text_key(kwargs: Dict[str, Any]) -> str:
+    """忽略图像内容的请求键，截图不同但提示词相同的请求会匹配到同一条记录"""
+    relaxed = dict(kwargs)
+    relaxed["messages"] = _strip_images(kwargs.get("messages", []))
+    return request_key(**relaxed)
+
+
+def _to_dict(obj) -> Any:
+    """把SDK返回的pydantic对象转换为可JSON序列化的字典"""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json")
+    if hasattr(obj, "dict"):
+        return obj.dict()
+    return obj
+
+
+def _to_namespace(value) -> Any:
+    """把字典递归转换为支持属性访问的对象，模拟SDK的响应类型"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _to_namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(v) for v in value]
+    return value
+
+
+class _RawResponse:
+    """模拟SDK的原始响应，提供headers和parse()"""
+
+    def __init__(self, parsed, headers: Dict[str, str]):
+        self._parsed = parsed
+        self.headers = httpx.Headers(headers)
+
+    def parse(self):
+        return self._parsed
+
+
+class _Completions:
+    """chat.completions接口，create和with_raw_response.create共用_handle"""
+
+    def __init__(self, handle):
+        self._handle = handle
+        self.with_raw_response = SimpleNamespace(create=lambda **kwargs: handle(kwargs, raw=True))
+
+    def create(self, **kwargs):
+        return self._handle(kwargs, raw=False)
+
+
+class RecordingClient:
+    """包装真实客户端并录制请求/响应"""
+
+    def __init__(self, client, path: str):
+        """
+        Args:
+            client: 真实的Groq客户端
+            path: 夹具文件路径（JSONL），记录会追加到文件末尾
+        """
+        self._client = client
+        self.path = path
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=_Completions(self._handle))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def _write(self, kwargs, record: Dict[str, Any]):
+        record.update({
+            "key": request_key(**kwargs),
+            "text_key": text_key(kwargs),
+            "request": {k: v for k, v in kwargs.items() if k != "messages"},
+            "messages": _strip_images(kwargs.get("messages", [])),
+        })
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _record_stream(self, kwargs, chunks, start):
+        recorded = []
+        first_token = None
+        for chunk in chunks:
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            recorded.append(_to_dict(chunk))
+            yield chunk
+        self._write(kwargs, {
+            "status": 200,
+            "stream": recorded,
+            "latency": time.perf_counter() - start,
+            "time_to_first_token": first_token,
+        })
+
+    def _write_error(self, kwargs, error: "groq.APIStatusError", start: float):
+        self._write(kwargs, {
+            "status": error.status_code,
+            "error": error.message,
+            "headers": dict(error.response.headers),
+            "latency": time.perf_counter() - start,
+        })
+
+    def _write_response(self, kwargs, parsed, headers: Dict[str, str], start: float):
+        self._write(kwargs, {
+            "status": 200,
+            "response": _to_dict(parsed),
+            "headers": headers,
+            "latency": time.perf_counter() - start,
+        })
+
+    def _handle(self, kwargs, raw: bool):
+        completions = self._client.chat.completions
+        start = time.perf_counter()
+        try:
+            if kwargs.get("stream"):
+                return self._record_stream(kwargs, completions.create(**kwargs), start)
+            if raw:
+                response = completions.with_raw_response.create(**kwargs)
+                parsed, headers = response.parse(), dict(response.headers)
+            else:
+                parsed, headers = completions.create(**kwargs), {}
+        except groq.APIStatusError as e:
+            self._write_error(kwargs, e, start)
+            raise
+        self._write_response(kwargs, parsed, headers, start)
+        return response if raw else parsed
+
+
+class AsyncRecordingClient(RecordingClient):
+    """包装真实的AsyncGroq客户端并录制请求/响应，夹具格式与RecordingClient相同"""
+
+    async def _record_stream_async(self, kwargs, chunks, start):
+        recorded = []
+        first_token = None
+        async for chunk in chunks:
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            recorded.append(_to_dict(chunk))
+            yield chunk
+        self._write(kwargs, {
+            "status": 200,
+            "stream": recorded,
+            "latency": time.perf_counter() - start,
+            "time_to_first_token": first_token,
+        })
+
+    async def _handle(self, kwargs, raw: bool):
+        completions = self._client.chat.completions
+        start = time.perf_counter()
+        try:
+            if kwargs.get("stream"):
+                return self._record_stream_async(kwargs, await completions.create(**kwargs), start)
+            if raw:
+                response = await completions.with_raw_response.create(**kwargs)
+                parsed = response.parse()
+                if asyncio.iscoroutine(parsed):
+                    parsed = await parsed
+                headers = dict(response.headers)
+            else:
+                parsed, headers = await completions.create(**kwargs), {}
+        except groq.APIStatusError as e:
+            self._write_error(kwargs, e, start)
+            raise
+        self._write_response(kwargs, parsed, headers, start)
+        return _RawResponse(parsed, headers) if raw else parsed
+
+    async def close(self):
+        await self._client.close()
+
+
+class ReplayClient:
+    """从夹具文件回放响应的本地客户端
+
+    先按完整请求匹配，找不到时忽略图像内容按提示词匹配；同一请求录制了多次时按顺序循环回放。
+    """
+
+    def __init__(self,
+                 path: Optional[str] = None,
+                 records: Optional[List[Dict[str, Any]]] = None,
+                 latency: Optional[float] = None,
+                 jitter: float = 0.0,
+                 latency_scale: float = 1.0,
+                 error_rate: float = 0.0,
+                 error_status: int = 503,
+                 seed: Optional[int] = None,
+                 strict: bool = False):
+        """
+        Args:
+            path: 夹具文件路径（JSONL）
+            records: 直接传入的记录列表，与path二选一或合并使用
+            latency: 固定的注入延迟（秒），None表示使用录制时的延迟
+            jitter: 延迟的随机抖动幅度（秒）
+            latency_scale: 录制延迟的缩放系数，0表示不等待
+            error_rate: 随机注入错误的概率 (0-1)
+            error_status: 注入错误的HTTP状态码，如429或503
+            seed: 随机数种子，便于复现
+            strict: 为True时只按完整请求匹配
+        """
+        self.records = list(records or [])
+        if path:
+            with open(path, "r", encoding="utf-8") as f:
+                self.records.extend(json.loads(line) for line in f if line.strip())
+
+        self.latency = latency
+        self.jitter = jitter
+        self.latency_scale = latency_scale
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.strict = strict
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self._by_key: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_text: Dict[str, List[Dict[str, Any]]] = {}
+        for record in self.records:
+            self._by_key.setdefault(record["key"], []).append(record)
+            self._by_text.setdefault(record["text_key"], []).append(record)
+        self._cursors: Dict[Tuple[str, str], int] = {}
+
+        self.calls = 0
+        self.injected_errors = 0
+        self.chat = SimpleNamespace(completions=_Completions(self._handle))
+
+    def _match(self, kwargs) -> Dict[str, Any]:
+        candidates = [("key", request_key(**kwargs), self._by_key)]
+        if not self.strict:
+            candidates.append(("text", text_key(kwargs), self._by_text))
+        for kind, key, index in candidates:
+            records = index.get(key)
+            if records:
+                with self._lock:
+                    cursor = self._cursors.get((kind, key), 0)
+                    self._cursors[(kind, key)] = cursor + 1
+                return records[cursor % len(records)]
+        raise LookupError("回放夹具中没有匹配的请求")
+
+    def _delay(self, record: Dict[str, Any]) -> float:
+        if self.latency is not None:
+            delay = self.latency
+        else:
+            delay = record.get("latency", 0.0) * self.latency_scale
+        if self.jitter:
+            delay += self._random.uniform(-self.jitter, self.jitter)
+        return max(delay, 0.0)
+
+    def _status_error(self, status: int, message: str, headers: Dict[str, str]) -> groq.APIStatusError:
+        """构造与SDK一致的状态错误，交给GroqController的重试逻辑处理"""
+        request = httpx.Request("POST", "http://replay.local/openai/v1/chat/completions")
+        response = httpx.Response(status, headers=headers, request=request)
+        error_classes = {
+            400: groq.BadRequestError, 401: groq.AuthenticationError, 403: groq.PermissionDeniedError,
+            404: groq.NotFoundError, 429: groq.RateLimitError,
+        }
+        error_class = error_classes.get(status, groq.InternalServerError if status >= 500 else groq.APIStatusError)
+        return error_class(message, response=response, body=None)
+
+    def _begin(self, kwargs) -> Tuple[Dict[str, Any], float, bool]:
+        """匹配记录并决定延迟和是否注入错误"""
+        with self._lock:
+            self.calls += 1
+            inject = self.error_rate > 0 and self._random.random() < self.error_rate
+        record = self._match(kwargs)
+        return record, self._delay(record), inject
+
+    def _finish(self, kwargs, record: Dict[str, Any], inject: bool, raw: bool):
+        """按记录构造响应或抛出错误，流式请求返回解析后的块列表"""
+        if inject:
+            with self._lock:
+                self.injected_errors += 1
+            raise self._status_error(self.error_status, "回放注入的错误", {"retry-after": "0"})
+        if record.get("status", 200) != 200:
+            raise self._status_error(record["status"], record.get("error", ""), record.get("headers", {}))
+
+        if kwargs.get("stream"):
+            return _to_namespace(record.get("stream") or [])
+        parsed = _to_namespace(record["response"])
+        return _RawResponse(parsed, record.get("headers", {})) if raw else parsed
+
+    def _handle(self, kwargs, raw: bool):
+        record, delay, inject = self._begin(kwargs)
+        time.sleep(delay)
+        result = self._finish(kwargs, record, inject, raw)
+        return iter(result) if kwargs.get("stream") else result
+
+
+async def _iterate(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+class AsyncReplayClient(ReplayClient):
+    """ReplayClient的异步版本，延迟通过asyncio.sleep注入，不阻塞事件循环"""
+
+    async def _handle(self, kwargs, raw: bool):
+        record, delay, inject = self._begin(kwargs)
+        await asyncio.sleep(delay)
+        result = self._finish(kwargs, record, inject, raw)
+        return _iterate(result) if kwargs.get("stream") else result
+
+    async def close(self):
+        """与AsyncGroq.close接口一致，回放客户端没有需要释放的连接"""
+
+
+def make_record(kwargs: Dict[str, Any], text: str, latency: float = 0.0) -> Dict[str, Any]:
+    """手工构造一条回放记录，便于在没有录制文件时编写离线测试或基准"""
+    return {
+        "key": request_key(**kwargs),
+        "text_key": text_key(kwargs),
+        "request": {k: v for k, v in kwargs.items() if k != "messages"},
+        "messages": _strip_images(kwargs.get("messages", [])),
+        "status": 200,
+        "response": {"choices": [{"index": 0, "message": {"role": "assistant", "content": text}}]},
+        "headers": {},
+        "latency": latency,
+    }
@@ -0,0 +1,186 @@
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Optional, Tuple
+
+from PIL import Image
+
+# 支持的输出格式及其MIME类型
+_MIME_TYPES = {
+    "PNG": "image/png",
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+}
+
+
+class EncodedImage:
+    """编码后的图像数据"""
+
+    def __init__(self, data: bytes, mime_type: str, size: Tuple[int, int]):
+        """
+        Args:
+            data: 编码后的图像字节
+            mime_type: 图像的MIME类型
+            size: 编码后图像的尺寸 (width, height)
+        """
+        self.data = data
+        self.mime_type = mime_type
+        self.size = size
+        self._base64 = None
+
+    @property
+    def base64(self) -> str:
+        """base64编码的图像字符串（懒计算）"""
+        if self._base64 is None:
+            self._base64 = base64.b64encode(self.data).decode()
+        return self._base64
+
+    @property
+    def data_url(self) -> str:
+        """可直接放入image_url字段的data URL"""
+        return f"data:{self.mime_type};base64,{self.base64}"
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+class ImageEncoder:
+    """按带宽预算编码图像，并按内容哈希缓存编码结果"""
+
+    def __init__(self,
+                 format: str = "JPEG",
+                 quality: int = 85,
+                 max_dimension: Optional[int] = 1280,
+                 max_pixels: Optional[int] = None,
+                 grayscale: bool = False,
+                 crop: Optional[Tuple[int, int, int, int]] = None,
+                 cache_size: int = 32):
+        """
+        Args:
+            format: 输出格式，可选 "JPEG", "WEBP", "PNG"
+            quality: 有损格式的压缩质量 (1-100)
+            max_dimension: 最长边的最大像素数，None表示不限制
+            max_pixels: 总像素数上限，None表示不限制
+            grayscale: 是否转换为灰度图
+            crop: 默认裁剪区域 (left, top, width, height)
+            cache_size: 缓存的编码结果数量，0表示不缓存
+        """
+        format = format.upper()
+        if format == "JPG":
+            format = "JPEG"
+        if format not in _MIME_TYPES:
+            raise ValueError(f"不支持的图像格式: {format}")
+        if not 1 <= quality <= 100:
+            raise ValueError("quality必须在1到100之间")
+
+        self.format = format
+        self.quality = quality
+        self.max_dimension = max_dimension
+        self.max_pixels = max_pixels
+        self.grayscale = grayscale
+        self.crop = crop
+        self.cache_size = cache_size
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def mime_type(self) -> str:
+        """当前输出格式的MIME类型"""
+        return _MIME_TYPES[self.format]
+
+    def _target_size(self, width: int, height: int) -> Tuple[int, int]:
+        """根据max_dimension和max_pixels计算缩放后的尺寸"""
+        scale = 1.0
+        if self.max_dimension and max(width, height) > self.max_dimension:
+            scale = min(scale, self.max_dimension / max(width, height))
+        if self.max_pixels and width * height > self.max_pixels:
+            scale = min(scale, (self.max_pixels / (width * height)) ** 0.5)
+        if scale >= 1.0:
+            return width, height
+        return max(1, int(width * scale)), max(1, int(height * scale))
+
+    def output_size(self,
+                    image: Image.Image,
+                    region: Optional[Tuple[int, int, int, int]] = None) -> Tuple[int, int]:
+        """不编码，直接计算encode输出图像的尺寸"""
+        region = region if region is not None else self.crop
+        size = (region[2], region[3]) if region else image.size
+        return self._target_size(*size)
+
+    def _cache_key(self, image: Image.Image, region) -> str:
+        """按图像内容和编码参数生成缓存键"""
+        digest = hashlib.blake2b(image.tobytes(), digest_size=16)
+        digest.update(repr((
+            image.mode, image.size, region, self.format, self.quality,
+            self.max_dimension, self.max_pixels, self.grayscale,
+        )).encode())
+        return digest.hexdigest()
+
+    def _prepare(self, image: Image.Image, region) -> Image.Image:
+        """裁剪、缩放并转换颜色模式"""
+        if region:
+            left, top, width, height = region
+            image = image.crop((left, top, left + width, top + height))
+
+        target = self._target_size(*image.size)
+        if target != image.size:
+            image = image.resize(target, Image.Resampling.LANCZOS)
+
+        if self.grayscale:
+            image = image.convert("L")
+        elif self.format == "JPEG" and image.mode not in ("RGB", "L"):
+            # JPEG不支持透明通道
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA", "L", "LA"):
+            image = image.convert("RGB")
+        return image
+
+    def encode(self,
+               image: Image.Image,
+               region: Optional[Tuple[int, int, int, int]] = None) -> EncodedImage:
+        """编码图像
+
+        Args:
+            image: PIL图像对象
+            region: 可选的裁剪区域 (left, top, width, height)，默认使用构造时的crop
+
+        Returns:
+            EncodedImage: 编码结果
+        """
+        region = region if region is not None else self.crop
+
+        key = None
+        if self.cache_size > 0:
+            key = self._cache_key(image, region)
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return cached
+
+        prepared = self._prepare(image, region)
+        buffered = BytesIO()
+        if self.format == "PNG":
+            prepared.save(buffered, format="PNG")
+        else:
+            prepared.save(buffered, format=self.format, quality=self.quality)
+        encoded = EncodedImage(buffered.getvalue(), self.mime_type, prepared.size)
+
+        if key is not None:
+            with self._lock:
+                self.misses += 1
+                self._cache[key] = encoded
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return encoded
+
+    def clear_cache(self):
+        """清空编码缓存"""
+        with self._lock:
+            self._cache.clear()
@@ -1,26 +1,68 @@
 import time
 import pyautogui
 import numpy as np
-from typing import List, Tuple, Optional
-from .ocr_controller import OCRController
+from PIL import Image
+from typing import Dict, List, Tuple, Optional
+from .ocr_controller import OCRController, adjust_result
+from .action_scheduler import Action, ActionBatch, ActionResult, ActionScheduler
+from .frame_buffer import FrameBuffer
+from .pixel_probe import ProbeSet
+from .screen_capture import get_backend
+from .template_matcher import Match, TemplateMatcher
 
 # 设置pyautogui的安全特性
 pyautogui.FAILSAFE = True  # 启用故障安全
 pyautogui.PAUSE = 0.1  # 操作之间的默认延迟
 
 class InputController:
-    def __init__(self, download_enabled: bool = True):
+    def __init__(self, download_enabled: bool = True, ocr_pool=None, ocr_cache_size: int = 256,
+                 capture_backend: str = "auto"):
         """
         初始化输入控制器
         
         Args:
             download_enabled: 是否允许下载模型文件，如果为False则使用本地模型
+            ocr_pool: 可选的OCRWorkerPool，指定后OCR在工作进程中执行
+            ocr_cache_size: 按区域像素缓存的OCR结果条数，0表示不缓存
+            capture_backend: 截图后端，"auto"、"mss"或"pyautogui"
         """
         # 获取屏幕尺寸
         self.screen_width, self.screen_height = pyautogui.size()
+        # 截图后端，只截取需要的区域
+        self.capture = get_backend(capture_backend)
+        # 可选的后台截图缓冲区，启动后截图都从中取帧
+        self.frames: Optional[FrameBuffer] = None
+        # 预加载的模板，locate_on_screen按路径自动加入
+        self.templates = TemplateMatcher()
+        # 动作调度线程，第一次提交动作时启动
+        self._actions: Optional[ActionScheduler] = None
         # 初始化OCR控制器
-        self._ocr_controller = OCRController(download_enabled=download_enabled)
+        self._ocr_controller = OCRController(download_enabled=download_enabled, pool=ocr_pool, cache_size=ocr_cache_size)
     
+    # 动作队列
+    @property
+    def actions(self) -> ActionScheduler:
+        """动作调度器，不受pyautogui.PAUSE的全局停顿影响"""
+        if self._actions is None:
+            self._actions = ActionScheduler(pyautogui)
+        return self._actions
+
+    def schedule(self, actions: List[Action]) -> ActionBatch:
+        """
+        在调度线程上按顺序执行一组动作，立即返回
+
+        Args:
+            actions: 由src.action_scheduler中的move/click/key/wait等函数构造的动作
+
+        Returns:
+            ActionBatch，可以wait等待结果或cancel取消
+        """
+        return self.actions.submit(actions)
+
+    def run_actions(self, actions: List[Action], timeout: Optional[float] = None) -> List[ActionResult]:
+        """执行一组动作并等待完成，返回每个动作的计划时间和实际执行时间"""
+        return self.actions.run(actions, timeout)
+
     # 鼠标操作
     def move_mouse(self, x: int, y: int, duration: float = 0.2):
         """移动鼠标到指定位置"""
@@ -74,23 +116,118 @@ class InputController:
         pyautogui.hotkey(*args)
     
     # 实用方法
-    def screenshot(self, filename: str = None):
-        """截取屏幕截图"""
-        img = pyautogui.screenshot()
+    def start_capture(self, fps: float = 10.0, capacity: int = 32, max_memory_mb: float = 256) -> FrameBuffer:
+        """
+        启动后台截图线程，之后的截图和OCR共享缓冲区中的最新帧
+
+        Args:
+            fps: 目标帧率
+            capacity: 缓冲的帧数
+            max_memory_mb: 缓冲区占用内存的上限（MB）
+
+        Returns:
+            FrameBuffer，可以用latest/at/since按时间取帧
+        """
+        if self.frames is None:
+            self.frames = FrameBuffer(self.capture, fps=fps, capacity=capacity, max_memory_mb=max_memory_mb)
+        return self.frames.start()
+
+    def stop_capture(self):
+        """停止后台截图线程，之后重新按需截图"""
+        if self.frames is not None:
+            self.frames.stop()
+            self.frames = None
+
+    def _shared_frame(self, region: Optional[Tuple[int, int, int, int]]) -> Optional[np.ndarray]:
+        """从后台截图缓冲区取最新帧并裁剪，没有启动缓冲区或后台截图正在出错时返回None"""
+        if self.frames is None or not self.frames.healthy:
+            return None
+        frame = self.frames.latest() or self.frames.wait(timeout=1.0)
+        if frame is None:
+            return None
+        if region is None:
+            return frame.image
+        left, top, width, height = region
+        return frame.image[top:top + height, left:left + width]
+
+    def screenshot(self, filename: str = None, region: Optional[Tuple[int, int, int, int]] = None):
+        """截取屏幕截图，指定region (left, top, width, height) 时只截取该区域"""
+        array = self._shared_frame(region)
+        img = self.capture.grab_image(region) if array is None else Image.fromarray(array, "RGB")
         if filename:
             img.save(filename)
         return img
+
+    def capture_array(self, region: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
+        """截取屏幕为RGB NumPy数组，mss后端返回截图缓冲区上的只读视图"""
+        array = self._shared_frame(region)
+        return self.capture.grab(region) if array is None else array
     
     def get_pixel_color(self, x: int, y: int) -> tuple:
         """获取指定位置的像素颜色"""
         return pyautogui.pixel(x, y)
     
-    def locate_on_screen(self, image_path: str, confidence: float = 0.9):
-        """在屏幕上查找图像"""
-        try:
-            return pyautogui.locateOnScreen(image_path, confidence=confidence)
-        except pyautogui.ImageNotFoundException:
-            return None
+    def check_probes(self, probes: ProbeSet) -> Dict[str, bool]:
+        """
+        一次检查一组像素探针
+
+        启动了后台截图时直接读取最新帧中的像素，否则只截取覆盖所有探针的最小区域。
+
+        Args:
+            probes: 像素探针集
+
+        Returns:
+            探针名称到是否匹配的映射
+        """
+        if not len(probes):
+            return {}
+        if self.frames is not None and self.frames.healthy:
+            sampled = self.frames.pixels(*probes.points)
+            if sampled is not None:
+                return probes.compare(sampled[2])
+        region = probes.bounds
+        return probes.check(self.capture.grab(region), offset=region[:2])
+
+    def load_probes(self, path: str) -> Optional[ProbeSet]:
+        """加载当前屏幕分辨率的像素探针集，没有时返回None"""
+        return ProbeSet.load(path, (self.screen_width, self.screen_height))
+
+    def locate_on_screen(self, image_path: str, confidence: float = 0.9,
+                         region: Optional[Tuple[int, int, int, int]] = None) -> Optional[Match]:
+        """
+        在屏幕上查找图像，图像在第一次查找时读取并缓存
+
+        Args:
+            image_path: 模板图像路径，或已加入self.templates的模板名称
+            confidence: 最低NCC得分
+            region: 可选的搜索区域 (left, top, width, height)
+
+        Returns:
+            Match (left, top, width, height, score, scale, name)，找不到时返回None
+        """
+        return self.locate_all_on_screen([image_path], {image_path: region} if region else None, confidence)[image_path]
+
+    def locate_all_on_screen(self, names: List[str], regions: Optional[Dict[str, Tuple[int, int, int, int]]] = None,
+                             confidence: Optional[float] = None) -> Dict[str, Optional[Match]]:
+        """
+        截一次屏并查找多个模板
+
+        所有模板都有搜索区域时只截取覆盖这些区域的最小范围，否则截取整个屏幕。
+
+        Args:
+            names: 模板图像路径或模板名称列表
+            regions: 模板名称到搜索区域的映射
+            confidence: 最低NCC得分，默认使用self.templates的设置
+
+        Returns:
+            模板名称到匹配结果的映射，找不到的模板值为None
+        """
+        for name in names:
+            if name not in self.templates:
+                self.templates.add(name)
+        bounds = self.templates.bounds(names, regions, (self.screen_width, self.screen_height))
+        frame = self.capture_array(bounds)
+        return self.templates.locate_all(frame, names, regions, confidence, bounds[:2] if bounds else (0, 0))
 
     def ocr_screen(self, region: Optional[Tuple[int, int, int, int]] = None) -> List[Tuple[List[Tuple[int, int]], str, float]]:
         """
@@ -105,8 +242,11 @@ class InputController:
             - Detected text string
             - Confidence score
         """
-        screenshot = self.screenshot()
-        return self._ocr_controller.recognize_image(screenshot, region)
+        if region is None:
+            return self._ocr_controller.recognize_image(self.screenshot())
+        # 只截取需要识别的区域，结果换算回屏幕坐标
+        results = self._ocr_controller.recognize_image(self.screenshot(region=region))
+        return adjust_result(results, *region[:2])
 
     def ocr_region(self, x: int, y: int, width: int, height: int) -> List[Tuple[List[Tuple[int, int]], str, float]]:
         """
@@ -124,4 +264,48 @@ class InputController:
             - Detected text string
             - Confidence score
         """
-        return self.ocr_screen((x, y, width, height)) 
\ No newline at end of file
+        return self.ocr_screen((x, y, width, height))
+
+    def find_text(self, query: str, region: Optional[Tuple[int, int, int, int]] = None, **kwargs) -> Optional[Tuple[List[Tuple[int, int]], str, float]]:
+        """
+        在屏幕上查找一个文字标签
+
+        Args:
+            query: 要查找的文字
+            region: 可选的搜索区域 (left, top, width, height)
+            **kwargs: 传给OCRController.find_text的参数，如scale、min_similarity
+
+        Returns:
+            (文字框坐标, 识别出的文字, 置信度)，没有找到时返回None
+        """
+        match = self._ocr_controller.find_text(self.screenshot(region=region), query, **kwargs)
+        if match is None or region is None:
+            return match
+        return adjust_result([match], *region[:2])[0]
+
+    def ocr_cache_stats(self) -> Optional[dict]:
+        """返回OCR结果缓存的命中统计，未启用缓存时返回None"""
+        cache = self._ocr_controller.cache
+        return cache.stats() if cache is not None else None
+
+    def ocr_regions(self, regions: Dict[str, Tuple[int, int, int, int]]) -> Dict[str, List[Tuple[List[Tuple[int, int]], str, float]]]:
+        """
+        截一次屏并批量识别多个命名区域
+
+        Args:
+            regions: 区域名称到 (left, top, width, height) 的映射
+
+        Returns:
+            区域名称到识别结果的映射，坐标为屏幕坐标
+        """
+        if not regions:
+            return {}
+        # 只截取覆盖所有区域的最小矩形
+        left = min(region[0] for region in regions.values())
+        top = min(region[1] for region in regions.values())
+        right = max(region[0] + region[2] for region in regions.values())
+        bottom = max(region[1] + region[3] for region in regions.values())
+        screenshot = self.screenshot(region=(left, top, right - left, bottom - top))
+        local = {name: (x - left, y - top, width, height) for name, (x, y, width, height) in regions.items()}
+        results = self._ocr_controller.recognize_regions(screenshot, local)
+        return {name: adjust_result(result, left, top) for name, result in results.items()} 
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""
+OCR结果缓存
+
+按裁剪区域的像素内容和识别参数缓存识别结果。挂机循环中HUD文字大多数时候不变，
+像素完全相同时直接返回上次的结果，跳过检测和识别。
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+def region_digest(array: np.ndarray, *extra: Any) -> str:
+    """按像素内容和附加参数（如语言、allowlist）生成缓存键"""
+    digest = hashlib.blake2b(np.ascontiguousarray(array).data, digest_size=16)
+    digest.update(repr((array.shape, array.dtype.str) + extra).encode())
+    return digest.hexdigest()
+
+
+class OCRResultCache:
+    """缓存区域坐标系下的识别结果，条目数超过上限时按LRU淘汰"""
+
+    def __init__(self, max_entries: int = 256):
+        """
+        Args:
+            max_entries: 最大缓存条目数
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[List]:
+        """查找缓存的结果，未命中返回None"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: str, result: List):
+        """写入缓存"""
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
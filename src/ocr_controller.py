@@ -2,68 +2,321 @@ import easyocr
 import numpy as np
 import ssl
 import os
-from typing import List, Tuple, Optional
+import threading
+from typing import Dict, List, Tuple, Optional, Sequence
 from PIL import Image
 
+from .ocr_cache import OCRResultCache, region_digest
+from .text_index import text_similarity
+
+# 默认识别的语言
+DEFAULT_LANGUAGES = ('en', 'ch_sim')
+
+# 进程内共享的读取器，按(语言, 设置)区分；每个读取器配一把锁，EasyOCR不保证线程安全
+_readers: Dict[tuple, Tuple[easyocr.Reader, threading.Lock]] = {}
+_readers_lock = threading.Lock()
+
+
+def default_model_dir() -> str:
+    """EasyOCR模型的默认存储路径"""
+    return os.path.join(os.path.expanduser("~"), ".EasyOCR")
+
+
+def _shared_reader(languages: Sequence[str] = DEFAULT_LANGUAGES,
+                   model_dir: Optional[str] = None,
+                   download_enabled: bool = True,
+                   **reader_kwargs) -> Tuple[easyocr.Reader, threading.Lock]:
+    """返回共享的读取器及其锁，同一组设置在进程内只加载一次模型"""
+    model_dir = model_dir or default_model_dir()
+    key = (tuple(languages), model_dir, download_enabled, tuple(sorted(reader_kwargs.items())))
+    with _readers_lock:
+        if key not in _readers:
+            if not download_enabled:
+                # 禁用SSL证书验证（仅用于测试）
+                ssl._create_default_https_context = ssl._create_unverified_context
+            os.makedirs(model_dir, exist_ok=True)
+            reader = easyocr.Reader(list(languages), model_storage_directory=model_dir, **reader_kwargs)
+            _readers[key] = (reader, threading.Lock())
+        return _readers[key]
+
+
+def get_reader(languages: Sequence[str] = DEFAULT_LANGUAGES,
+               model_dir: Optional[str] = None,
+               download_enabled: bool = True,
+               **reader_kwargs) -> easyocr.Reader:
+    """
+    获取进程内共享的EasyOCR读取器
+
+    Args:
+        languages: 识别的语言列表
+        model_dir: 模型存储路径，默认为 ~/.EasyOCR
+        download_enabled: 是否允许下载模型文件
+        **reader_kwargs: 传给easyocr.Reader的其他参数，如gpu
+
+    Returns:
+        easyocr.Reader: 相同参数返回同一个实例
+    """
+    return _shared_reader(languages, model_dir, download_enabled, **reader_kwargs)[0]
+
+
+def adjust_result(result, left: int = 0, top: int = 0) -> List[Tuple[List[Tuple[int, int]], str, float]]:
+    """把readtext的结果转换为整数坐标，并平移到原图坐标系"""
+    return [
+        ([(int(x + left), int(y + top)) for x, y in bbox], text, conf)
+        for bbox, text, conf in result
+    ]
+
+
+def _expected_aspect(query: str) -> float:
+    """按字符数估计文字框的宽高比，中日韩字符近似为正方形"""
+    return sum(1.0 if ord(char) >= 0x2E80 else 0.55 for char in query.strip()) or 1.0
+
+
+def _pad_to(array: np.ndarray, height: int, width: int) -> np.ndarray:
+    """把裁剪区域放在左上角并填充到统一尺寸，填充色取边框像素的中位数，避免产生假边缘"""
+    if array.shape[:2] == (height, width):
+        return array
+    border = np.concatenate([array[0], array[-1], array[:, 0], array[:, -1]])
+    canvas = np.empty((height, width) + array.shape[2:], dtype=array.dtype)
+    canvas[:] = np.median(border, axis=0).astype(array.dtype)
+    canvas[:array.shape[0], :array.shape[1]] = array
+    return canvas
+
+
 class OCRController:
-    def __init__(self, download_enabled: bool = True):
+    def __init__(self,
+                 download_enabled: bool = True,
+                 languages: Sequence[str] = DEFAULT_LANGUAGES,
+                 pool=None,
+                 cache_size: int = 256,
+                 **reader_kwargs):
         """
         初始化OCR控制器
-        
+
         Args:
             download_enabled: 是否允许下载模型文件，如果为False则使用本地模型
+            languages: 识别的语言列表
+            pool: 可选的OCRWorkerPool，指定后识别任务交给工作进程执行
+            cache_size: 按区域像素缓存的识别结果条数，0表示不缓存
+            **reader_kwargs: 传给easyocr.Reader的其他参数，如gpu
         """
-        self._reader = None
         self._download_enabled = download_enabled
-        
+        self.languages = tuple(languages)
+        self.pool = pool
+        self._reader_kwargs = reader_kwargs
+        self.cache = OCRResultCache(cache_size) if cache_size else None
+
         # 设置模型存储路径
-        self.model_dir = os.path.join(os.path.expanduser("~"), ".EasyOCR")
+        self.model_dir = default_model_dir()
         if not os.path.exists(self.model_dir):
             os.makedirs(self.model_dir)
-    
+
+    def _shared(self) -> Tuple[easyocr.Reader, threading.Lock]:
+        return _shared_reader(self.languages, self.model_dir, self._download_enabled, **self._reader_kwargs)
+
+    def _cache_key(self, array: np.ndarray, readtext_kwargs: dict) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return region_digest(array, self.languages, sorted(self._reader_kwargs.items()),
+                             sorted(readtext_kwargs.items()))
+
+    def _cached(self, key: Optional[str]):
+        return self.cache.get(key) if key is not None else None
+
+    def _store(self, key: Optional[str], result):
+        if key is not None:
+            self.cache.put(key, result)
+
     @property
     def reader(self):
-        """懒加载OCR读取器"""
-        if self._reader is None:
-            if not self._download_enabled:
-                # 禁用SSL证书验证（仅用于测试）
-                ssl._create_default_https_context = ssl._create_unverified_context
-            self._reader = easyocr.Reader(['en', 'ch_sim'], model_storage_directory=self.model_dir)
-        return self._reader
+        """懒加载OCR读取器，相同设置的控制器共享同一个读取器"""
+        return self._shared()[0]
 
-    def recognize_image(self, image: Image.Image, region: Optional[Tuple[int, int, int, int]] = None) -> List[Tuple[List[Tuple[int, int]], str, float]]:
+    def recognize_image(self,
+                        image: Image.Image,
+                        region: Optional[Tuple[int, int, int, int]] = None,
+                        **readtext_kwargs) -> List[Tuple[List[Tuple[int, int]], str, float]]:
         """
         对图像进行OCR识别
-        
+
+        像素和参数与之前某次识别完全相同时直接返回缓存的结果。
+
         Args:
             image: PIL Image对象
             region: 可选的区域参数 (left, top, width, height)，如果不指定则对整个图像进行识别
-        
+            **readtext_kwargs: 传给readtext的其他参数，如allowlist
+
         Returns:
             List of tuples, each containing:
             - List of coordinates [(x1,y1), (x2,y2), (x3,y3), (x4,y4)] for text bounding box
             - Detected text string
             - Confidence score
         """
+        left, top = region[:2] if region else (0, 0)
         if region:
-            left, top, width, height = region
+            _, _, width, height = region
             image = image.crop((left, top, left + width, top + height))
-        
+
         # 转换为numpy数组
         img_array = np.array(image)
-        
-        # 执行OCR
-        result = self.reader.readtext(img_array)
-        
+
+        # 缓存中的结果使用区域坐标，相同内容出现在别处也能命中
+        key = self._cache_key(img_array, readtext_kwargs)
+        result = self._cached(key)
+        if result is None:
+            if self.pool is not None:
+                result = self.pool.recognize_image(image, **readtext_kwargs)
+            else:
+                reader, lock = self._shared()
+                with lock:
+                    result = adjust_result(reader.readtext(img_array, **readtext_kwargs))
+            self._store(key, result)
+
         # 如果指定了区域，需要调整坐标
+        return adjust_result(result, left, top)
+
+    def find_text(self,
+                  image: Image.Image,
+                  query: str,
+                  region: Optional[Tuple[int, int, int, int]] = None,
+                  scale: float = 0.5,
+                  min_similarity: float = 0.7,
+                  min_confidence: float = 0.3,
+                  restrict_charset: bool = True,
+                  **detect_kwargs) -> Optional[Tuple[List[Tuple[int, int]], str, float]]:
+        """
+        在图像中查找一个文字标签，找到第一个可信的匹配就返回
+
+        检测在缩小的灰度图上进行，识别只用查询文字中的字符，并按宽高比与查询文字接近的程度
+        依次识别各个文字框。纯ASCII的查询只加载英文模型。
+
+        Args:
+            image: PIL Image对象
+            query: 要查找的文字，如"再来一次"
+            region: 可选的搜索区域 (left, top, width, height)
+            scale: 检测时的缩放比例，文字较小时应调大
+            min_similarity: 判定为匹配的最低相似度
+            min_confidence: 判定为匹配的最低识别置信度
+            restrict_charset: 是否只允许识别查询文字中的字符
+            **detect_kwargs: 传给reader.detect的其他参数，如text_threshold
+
+        Returns:
+            (文字框坐标, 识别出的文字, 置信度)，没有找到时返回None
+        """
+        left, top = region[:2] if region else (0, 0)
         if region:
-            left, top = region[:2]
-            adjusted_result = []
-            for bbox, text, conf in result:
-                adjusted_bbox = [
-                    (int(x + left), int(y + top)) for x, y in bbox
-                ]
-                adjusted_result.append((adjusted_bbox, text, conf))
-            return adjusted_result
-        
-        return [([(int(x), int(y)) for x, y in bbox], text, conf) for bbox, text, conf in result] 
\ No newline at end of file
+            _, _, width, height = region
+            image = image.crop((left, top, left + width, top + height))
+
+        gray = image.convert("L")
+        gray_array = np.asarray(gray)
+        key = self._cache_key(gray_array, dict(
+            find_text=query, scale=scale, min_similarity=min_similarity, min_confidence=min_confidence,
+            restrict_charset=restrict_charset, **detect_kwargs,
+        ))
+        found = self._cached(key)
+        if found is None:
+            found = self._find_text(gray, gray_array, query, scale, min_similarity, min_confidence,
+                                    restrict_charset, detect_kwargs)
+            self._store(key, found)
+        return adjust_result(found, left, top)[0] if found else None
+
+    def _find_text(self, gray, gray_array, query, scale, min_similarity, min_confidence,
+                   restrict_charset, detect_kwargs) -> list:
+        """find_text的实际搜索，返回空列表或只含一个匹配的列表"""
+        scale = min(scale, 1.0)
+        small = gray.resize((max(1, round(gray.width * scale)), max(1, round(gray.height * scale))),
+                            Image.Resampling.BILINEAR) if scale < 1 else gray
+        languages = ("en",) if query.isascii() else self.languages
+        reader, lock = _shared_reader(languages, self.model_dir, self._download_enabled, **self._reader_kwargs)
+        allowlist = "".join(sorted(set(query) - set(" \t"))) if restrict_charset else None
+
+        with lock:
+            horizontal, free = reader.detect(np.asarray(small), **detect_kwargs)
+            # 把缩小图上的文字框换算回原图
+            candidates = [([[int(v / scale) for v in box]], []) for box in horizontal[0]]
+            candidates += [([], [[[int(x / scale), int(y / scale)] for x, y in box]]) for box in free[0]]
+
+            def aspect_gap(candidate):
+                h_list, f_list = candidate
+                if h_list:
+                    x_min, x_max, y_min, y_max = h_list[0]
+                else:
+                    xs, ys = [x for x, _ in f_list[0]], [y for _, y in f_list[0]]
+                    x_min, x_max, y_min, y_max = min(xs), max(xs), min(ys), max(ys)
+                return abs((x_max - x_min) / max(1, y_max - y_min) - _expected_aspect(query))
+
+            for h_list, f_list in sorted(candidates, key=aspect_gap):
+                for bbox, text, conf in reader.recognize(gray_array, h_list, f_list, allowlist=allowlist,
+                                                         reformat=False):
+                    if conf >= min_confidence and text_similarity(text, query) >= min_similarity:
+                        return adjust_result([(bbox, text, conf)])
+        return []
+
+    def recognize_regions(self,
+                          image: Image.Image,
+                          regions: Dict[str, Tuple[int, int, int, int]],
+                          batch_size: int = 8,
+                          **readtext_kwargs) -> Dict[str, List[Tuple[List[Tuple[int, int]], str, float]]]:
+        """
+        在同一张截图上一次识别多个区域
+
+        内容未变的区域直接使用缓存，其余区域裁剪后填充为相同尺寸，通过readtext_batched成批执行检测和识别。
+
+        Args:
+            image: PIL Image对象
+            regions: 区域名称到 (left, top, width, height) 的映射
+            batch_size: 识别模型每批处理的文字框数量
+            **readtext_kwargs: 传给readtext_batched的其他参数，如allowlist
+
+        Returns:
+            区域名称到识别结果的映射，坐标为整张截图中的坐标
+        """
+        if not regions:
+            return {}
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+
+        results, pending = {}, {}
+        for name, (left, top, width, height) in regions.items():
+            crop = np.asarray(image.crop((left, top, left + width, top + height)))
+            key = self._cache_key(crop, readtext_kwargs)
+            cached = self._cached(key)
+            if cached is not None:
+                results[name] = cached
+            else:
+                pending[name] = (crop, key)
+
+        # 只有内容变化的区域需要重新识别
+        if pending:
+            crops = [crop for crop, _ in pending.values()]
+            for (name, (_, key)), result in zip(pending.items(), self._recognize_crops(crops, batch_size, readtext_kwargs)):
+                self._store(key, result)
+                results[name] = result
+
+        return {name: adjust_result(results[name], left, top) for name, (left, top, _, _) in regions.items()}
+
+    def _recognize_crops(self, crops: List[np.ndarray], batch_size: int, readtext_kwargs: dict) -> List[list]:
+        """识别一组裁剪区域，返回各自区域坐标系下的结果"""
+        if self.pool is not None:
+            futures = [self.pool.submit(Image.fromarray(crop), **readtext_kwargs) for crop in crops]
+            return [future.result() for future in futures]
+
+        max_height = max(crop.shape[0] for crop in crops)
+        max_width = max(crop.shape[1] for crop in crops)
+        batch = [_pad_to(crop, max_height, max_width) for crop in crops]
+
+        reader, lock = self._shared()
+        with lock:
+            batched = reader.readtext_batched(batch, batch_size=batch_size, **readtext_kwargs)
+
+        results = []
+        for crop, result in zip(crops, batched):
+            height, width = crop.shape[:2]
+            # 丢弃中心落在填充区域内的文字框
+            kept = [
+                (bbox, text, conf) for bbox, text, conf in result
+                if sum(x for x, _ in bbox) / len(bbox) < width and sum(y for _, y in bbox) / len(bbox) < height
+            ]
+            results.append(adjust_result(kept))
+        return results
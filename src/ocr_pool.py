@@ -0,0 +1,172 @@
+"""
+OCR工作进程池
+
+每个工作进程在启动时加载一次EasyOCR读取器，之后只接收图像任务。
+提交的任务数超过max_pending时submit会阻塞，避免截图堆积占满内存。
+全屏截图可以切成带重叠的水平条带分给多个进程，再按条带核心区域去重合并。
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .ocr_controller import DEFAULT_LANGUAGES, adjust_result, get_reader
+
+# 工作进程内的读取器，由_init_worker创建
+_worker_reader = None
+
+
+def _init_worker(reader_factory, languages, model_dir, download_enabled, threads, reader_kwargs):
+    global _worker_reader
+    import torch
+    # 多个进程同时推理时，每个进程只用分到的核心，避免线程过度订阅
+    torch.set_num_threads(threads)
+    _worker_reader = reader_factory(languages, model_dir, download_enabled, **reader_kwargs)
+
+
+def _readtext(array: np.ndarray, left: int, top: int, kwargs):
+    return adjust_result(_worker_reader.readtext(array, **kwargs), left, top)
+
+
+def split_bands(height: int, bands: int, overlap: int) -> List[Tuple[int, int, int, int]]:
+    """
+    把图像高度切成带重叠的水平条带
+
+    Args:
+        height: 图像高度
+        bands: 条带数量
+        overlap: 相邻条带各自向外延伸的像素数，应大于一行文字的高度
+
+    Returns:
+        (start, end, core_start, core_end) 列表；文字框中心落在核心区域内的结果归该条带
+    """
+    bands = max(1, min(bands, height // max(1, 2 * overlap)))
+    step = height // bands
+    result = []
+    for i in range(bands):
+        core_start = i * step
+        core_end = height if i == bands - 1 else core_start + step
+        result.append((max(0, core_start - overlap), min(height, core_end + overlap), core_start, core_end))
+    return result
+
+
+class OCRWorkerPool:
+    """在多个进程中并行执行OCR"""
+
+    def __init__(self,
+                 processes: Optional[int] = None,
+                 max_pending: Optional[int] = None,
+                 languages: Sequence[str] = DEFAULT_LANGUAGES,
+                 model_dir: Optional[str] = None,
+                 download_enabled: bool = True,
+                 reader_factory: Callable = get_reader,
+                 **reader_kwargs):
+        """
+        Args:
+            processes: 工作进程数，默认为CPU核心数的一半
+            max_pending: 同时未完成的任务数上限，默认为进程数的2倍
+            languages: 识别的语言列表
+            model_dir: 模型存储路径，默认为 ~/.EasyOCR
+            download_enabled: 是否允许下载模型文件
+            reader_factory: 在工作进程中创建读取器的函数，默认为get_reader，必须可以pickle
+            **reader_kwargs: 传给easyocr.Reader的其他参数
+        """
+        cpu_count = os.cpu_count() or 1
+        self.processes = processes or max(1, cpu_count // 2)
+        self.max_pending = max_pending or self.processes * 2
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            # torch不支持在fork出的子进程中继续使用，统一用spawn
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(reader_factory, tuple(languages), model_dir, download_enabled,
+                      max(1, cpu_count // self.processes), reader_kwargs),
+        )
+
+    def submit(self,
+               image: Image.Image,
+               region: Optional[Tuple[int, int, int, int]] = None,
+               **readtext_kwargs) -> Future:
+        """
+        提交一个识别任务，未完成的任务达到上限时阻塞
+
+        Args:
+            image: PIL Image对象
+            region: 可选的区域参数 (left, top, width, height)
+            **readtext_kwargs: 传给readtext的参数
+
+        Returns:
+            Future，结果格式与OCRController.recognize_image相同
+        """
+        left, top = 0, 0
+        if region:
+            left, top, width, height = region
+            image = image.crop((left, top, left + width, top + height))
+        array = np.asarray(image)
+
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(_readtext, array, left, top, readtext_kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def map(self, images: Sequence[Image.Image], **readtext_kwargs) -> List[list]:
+        """并行识别多张图像，结果与输入顺序一致"""
+        futures = [self.submit(image, **readtext_kwargs) for image in images]
+        return [future.result() for future in futures]
+
+    def recognize_image(self,
+                        image: Image.Image,
+                        region: Optional[Tuple[int, int, int, int]] = None,
+                        bands: Optional[int] = None,
+                        overlap: int = 64,
+                        **readtext_kwargs) -> List[Tuple[List[Tuple[int, int]], str, float]]:
+        """
+        把一张图像切成水平条带并行识别
+
+        Args:
+            image: PIL Image对象
+            region: 可选的区域参数 (left, top, width, height)
+            bands: 条带数量，默认为进程数
+            overlap: 条带之间的重叠像素
+            **readtext_kwargs: 传给readtext的参数
+
+        Returns:
+            与OCRController.recognize_image相同格式的结果，按条带从上到下排列
+        """
+        left, top = 0, 0
+        if region:
+            left, top, width, height = region
+            image = image.crop((left, top, left + width, top + height))
+
+        jobs = []
+        for start, end, core_start, core_end in split_bands(image.height, bands or self.processes, overlap):
+            band = image.crop((0, start, image.width, end))
+            jobs.append((self.submit(band, **readtext_kwargs), start, core_start, core_end))
+
+        results = []
+        for future, start, core_start, core_end in jobs:
+            for bbox, text, conf in future.result():
+                # 重叠区域中的文字会被两个条带识别到，只保留中心在本条带核心区域内的
+                center_y = sum(y for _, y in bbox) / len(bbox) + start
+                if core_start <= center_y < core_end:
+                    results.append(([(x + left, y + start + top) for x, y in bbox], text, conf))
+        return results
+
+    def close(self):
+        """关闭工作进程"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
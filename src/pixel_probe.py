@@ -0,0 +1,200 @@
+"""
+多点像素探针
+
+一组命名的像素坐标及其期望颜色和容差，用一次截图（或环形缓冲区中的最新帧）
+一次性取出所有像素并向量化比较，用来代替OCR或模型调用判断界面状态。
+探针集按屏幕分辨率保存在同一个JSON文件中。
+"""
+import json
+import os
+from typing import Dict, Iterator, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+Color = Tuple[int, int, int]
+
+
+def local_points(xs: np.ndarray, ys: np.ndarray, offset: Tuple[int, int],
+                 shape: Tuple[int, ...]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    把屏幕坐标换算为帧内坐标，并检查都在帧内
+
+    Args:
+        xs: 屏幕X坐标数组
+        ys: 屏幕Y坐标数组
+        offset: 帧左上角在屏幕上的坐标
+        shape: 帧数组的形状 (height, width, ...)
+
+    Returns:
+        帧内的 (xs, ys)；负数下标会从另一侧取像素，所以有坐标落在帧外时抛出ValueError
+    """
+    xs = np.asarray(xs) - offset[0]
+    ys = np.asarray(ys) - offset[1]
+    outside = (xs < 0) | (xs >= shape[1]) | (ys < 0) | (ys >= shape[0])
+    if outside.any():
+        index = int(np.argmax(outside))
+        raise ValueError(f"探针 ({xs[index] + offset[0]}, {ys[index] + offset[1]}) 不在截图范围内："
+                         f"左上角 {tuple(offset)}，尺寸 {shape[1]}x{shape[0]}")
+    return xs, ys
+
+
+class Probe(NamedTuple):
+    """一个像素探针，颜色的每个通道与期望值相差不超过tolerance即为匹配"""
+    name: str
+    x: int
+    y: int
+    color: Color
+    tolerance: int = 10
+
+
+class ProbeSet:
+    """一组像素探针"""
+
+    def __init__(self, probes: Sequence[Probe] = (), resolution: Optional[Tuple[int, int]] = None):
+        """
+        Args:
+            probes: 探针列表
+            resolution: 探针坐标对应的屏幕分辨率 (width, height)
+        """
+        self.resolution = tuple(resolution) if resolution else None
+        self._probes: Dict[str, Probe] = {}
+        self._arrays = None
+        for probe in probes:
+            self._probes[probe.name] = probe
+
+    def add(self, name: str, x: int, y: int, color: Color, tolerance: int = 10):
+        """加入或替换一个探针"""
+        self._probes[name] = Probe(name, int(x), int(y), tuple(int(c) for c in color[:3]), int(tolerance))
+        self._arrays = None
+
+    def remove(self, name: str):
+        """删除探针"""
+        self._probes.pop(name, None)
+        self._arrays = None
+
+    def _vectors(self):
+        # 坐标、颜色和容差整理为数组，探针变化后重新生成
+        if self._arrays is None:
+            probes = list(self._probes.values())
+            self._arrays = (
+                [probe.name for probe in probes],
+                np.array([probe.x for probe in probes], dtype=np.intp),
+                np.array([probe.y for probe in probes], dtype=np.intp),
+                np.array([probe.color for probe in probes], dtype=np.int16).reshape(-1, 3),
+                np.array([probe.tolerance for probe in probes], dtype=np.int16),
+            )
+        return self._arrays
+
+    @property
+    def bounds(self) -> Tuple[int, int, int, int]:
+        """覆盖所有探针的最小区域 (left, top, width, height)，只截取这个区域即可检查"""
+        _, xs, ys, _, _ = self._vectors()
+        left, top = int(xs.min()), int(ys.min())
+        return left, top, int(xs.max()) - left + 1, int(ys.max()) - top + 1
+
+    @property
+    def points(self) -> Tuple[np.ndarray, np.ndarray]:
+        """所有探针的 (xs, ys) 坐标数组"""
+        _, xs, ys, _, _ = self._vectors()
+        return xs, ys
+
+    def sample(self, frame: Union[np.ndarray, Image.Image], offset: Tuple[int, int] = (0, 0)) -> np.ndarray:
+        """
+        取出所有探针位置的颜色
+
+        Args:
+            frame: RGB数组或PIL Image
+            offset: frame左上角在屏幕上的坐标，frame只是屏幕的一部分时使用
+
+        Returns:
+            (探针数, 3) 的颜色数组，顺序与names一致
+
+        Raises:
+            ValueError: 有探针不在frame范围内
+        """
+        _, xs, ys, _, _ = self._vectors()
+        array = np.asarray(frame)
+        xs, ys = local_points(xs, ys, offset, array.shape)
+        return array[ys, xs, :3]
+
+    def compare(self, colors: np.ndarray) -> Dict[str, bool]:
+        """把sample取出的颜色与期望颜色比较，返回每个探针是否匹配"""
+        names, _, _, expected, tolerances = self._vectors()
+        difference = np.abs(colors.astype(np.int16) - expected).max(axis=1)
+        return dict(zip(names, (difference <= tolerances).tolist()))
+
+    def check(self, frame: Union[np.ndarray, Image.Image], offset: Tuple[int, int] = (0, 0)) -> Dict[str, bool]:
+        """
+        检查所有探针
+
+        Args:
+            frame: RGB数组或PIL Image
+            offset: frame左上角在屏幕上的坐标
+
+        Returns:
+            探针名称到是否匹配的映射
+        """
+        return self.compare(self.sample(frame, offset))
+
+    def matches(self, frame: Union[np.ndarray, Image.Image], offset: Tuple[int, int] = (0, 0)) -> bool:
+        """所有探针都匹配时返回True"""
+        return all(self.check(frame, offset).values())
+
+    def calibrate(self, frame: Union[np.ndarray, Image.Image], offset: Tuple[int, int] = (0, 0)):
+        """把当前画面中各探针位置的颜色记录为期望颜色"""
+        for probe, color in zip(list(self._probes.values()), self.sample(frame, offset)):
+            self._probes[probe.name] = probe._replace(color=tuple(int(c) for c in color))
+        self._arrays = None
+
+    def save(self, path: str):
+        """
+        保存到JSON文件，文件中其他分辨率的探针集保持不变
+
+        Args:
+            path: 文件路径
+        """
+        if self.resolution is None:
+            raise ValueError("保存探针集需要指定分辨率")
+        data = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        data[f"{self.resolution[0]}x{self.resolution[1]}"] = [
+            {"name": p.name, "x": p.x, "y": p.y, "color": list(p.color), "tolerance": p.tolerance}
+            for p in self._probes.values()
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str, resolution: Tuple[int, int]) -> Optional["ProbeSet"]:
+        """
+        从JSON文件加载某个分辨率的探针集
+
+        Args:
+            path: 文件路径
+            resolution: 屏幕分辨率 (width, height)
+
+        Returns:
+            ProbeSet，文件或该分辨率的探针集不存在时返回None
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        entries = data.get(f"{resolution[0]}x{resolution[1]}")
+        if entries is None:
+            return None
+        probes = [Probe(e["name"], e["x"], e["y"], tuple(e["color"]), e.get("tolerance", 10)) for e in entries]
+        return cls(probes, resolution)
+
+    @property
+    def names(self):
+        return list(self._probes)
+
+    def __len__(self) -> int:
+        return len(self._probes)
+
+    def __iter__(self) -> Iterator[Probe]:
+        return iter(list(self._probes.values()))
@@ -0,0 +1,172 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Optional, Mapping
+
+from .groq_errors import parse_duration
+
+
+def backoff_delay(attempt: int,
+                  base: float = 0.5,
+                  cap: float = 20.0,
+                  retry_after: Optional[float] = None) -> float:
+    """计算第attempt次重试前的等待时间（带抖动的指数退避）
+
+    Args:
+        attempt: 重试次数，从0开始
+        base: 初始退避时间（秒）
+        cap: 退避时间上限（秒）
+        retry_after: 服务端建议的等待时间，指定时至少等待这么久
+
+    Returns:
+        等待秒数
+    """
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+class TokenBucket:
+    """令牌桶，容量或速率为None时不做限制"""
+
+    def __init__(self, capacity: Optional[float] = None, refill_rate: Optional[float] = None):
+        """
+        Args:
+            capacity: 桶容量
+            refill_rate: 每秒补充的令牌数
+        """
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if self.capacity is not None and self.refill_rate:
+            elapsed = now - self._updated
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+        self._updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """预定amount个令牌，返回需要等待的秒数
+
+        允许余额为负，后来的请求会排在前面的预定之后。
+        """
+        if self.capacity is None:
+            return 0.0
+        self._refill(now)
+        self.tokens -= amount
+        if self.tokens >= 0 or not self.refill_rate:
+            return 0.0
+        return -self.tokens / self.refill_rate
+
+    def update(self, limit: Optional[float], remaining: Optional[float], reset: Optional[float], now: float):
+        """用服务端返回的限额信息校准桶状态
+
+        Args:
+            limit: 窗口内的总限额
+            remaining: 剩余额度
+            reset: 额度完全恢复所需的秒数
+        """
+        if limit is None or remaining is None:
+            return
+        self._refill(now)
+        self.capacity = limit
+        # 本地已预定但服务端尚未计入的请求保留为负数
+        self.tokens = min(remaining, self.tokens) if self.tokens is not None else remaining
+        if reset and reset > 0 and limit > remaining:
+            self.refill_rate = (limit - remaining) / reset
+        elif self.refill_rate is None:
+            self.refill_rate = limit / 60.0
+
+
+def _header_float(headers: Mapping[str, str], name: str) -> Optional[float]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """客户端速率限制器，根据Groq返回的x-ratelimit-*响应头自动校准
+
+    分别维护请求数和token数两个令牌桶；收到429时按retry-after暂停所有请求。
+    """
+
+    def __init__(self,
+                 requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None):
+        """
+        Args:
+            requests_per_minute: 初始的每分钟请求数上限，None表示等待响应头校准
+            tokens_per_minute: 初始的每分钟token数上限，None表示等待响应头校准
+        """
+        self.requests = TokenBucket(
+            requests_per_minute,
+            requests_per_minute / 60.0 if requests_per_minute else None,
+        )
+        self.tokens = TokenBucket(
+            tokens_per_minute,
+            tokens_per_minute / 60.0 if tokens_per_minute else None,
+        )
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.total_wait = 0.0
+
+    def reserve(self, tokens: int = 0) -> float:
+        """预定一次请求和tokens个token，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(
+                self._blocked_until - now,
+                self.requests.reserve(1, now),
+                self.tokens.reserve(tokens, now),
+                0.0,
+            )
+            self.total_wait += wait
+            return wait
+
+    def acquire(self, tokens: int = 0):
+        """阻塞直到可以发出请求"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0):
+        """异步等待直到可以发出请求"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float):
+        """在seconds秒内暂停所有请求（例如收到429时）"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """根据响应头校准令牌桶
+
+        Args:
+            headers: HTTP响应头，需支持大小写不敏感的get（如httpx.Headers）
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.requests.update(
+                _header_float(headers, "x-ratelimit-limit-requests"),
+                _header_float(headers, "x-ratelimit-remaining-requests"),
+                parse_duration(headers.get("x-ratelimit-reset-requests")),
+                now,
+            )
+            self.tokens.update(
+                _header_float(headers, "x-ratelimit-limit-tokens"),
+                _header_float(headers, "x-ratelimit-remaining-tokens"),
+                parse_duration(headers.get("x-ratelimit-reset-tokens")),
+                now,
+            )
+        retry_after = parse_duration(headers.get("retry-after"))
+        if retry_after:
+            self.pause(retry_after)
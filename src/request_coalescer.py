@@ -0,0 +1,95 @@
+import asyncio
+import hashlib
+import json
+import threading
+import weakref
+from typing import Any, Callable, Awaitable, Dict
+
+
+def request_key(**kwargs) -> str:
+    """根据请求参数生成合并用的键"""
+    payload = json.dumps(kwargs, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class _InFlight:
+    """一次正在进行中的同步调用"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class RequestCoalescer:
+    """合并相同的并发请求：同一时刻相同键只发出一次调用，其他调用方共享结果"""
+
+    def __init__(self):
+        self._in_flight: Dict[str, _InFlight] = {}
+        self._lock = threading.Lock()
+        # 每个事件循环各自的进行中任务
+        self._async_in_flight = weakref.WeakKeyDictionary()
+        self.coalesced = 0
+
+    def run(self, key: str, func: Callable[[], Any]) -> Any:
+        """执行func，若已有相同key的调用在进行则等待其结果
+
+        Args:
+            key: 请求键，通常由request_key生成
+            func: 实际发出请求的函数
+
+        Returns:
+            func的返回值；func抛出的异常会传递给所有等待方
+        """
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _InFlight()
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = func()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._in_flight[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    async def run_async(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """run的异步版本，在同一事件循环内合并相同请求"""
+        loop = asyncio.get_running_loop()
+        in_flight = self._async_in_flight.setdefault(loop, {})
+        future = in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        future = loop.create_future()
+        in_flight[key] = future
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有等待方时避免"exception was never retrieved"警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del in_flight[key]
@@ -0,0 +1,230 @@
+import atexit
+import json
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+from PIL import Image
+
+
+def perceptual_hash(image: Image.Image, hash_size: int = 8) -> int:
+    """计算图像的差值哈希(dHash)
+
+    将图像缩放为 (hash_size+1) x hash_size 的灰度图，比较相邻像素的亮度，
+    得到 hash_size*hash_size 位的整数。内容相近的图像哈希的汉明距离也很小。
+
+    Args:
+        image: PIL图像对象
+        hash_size: 哈希边长，结果位数为hash_size的平方
+
+    Returns:
+        int: 感知哈希值
+    """
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """计算两个哈希值的汉明距离"""
+    return bin(a ^ b).count("1")
+
+
+class ResponseCache:
+    """按图像感知哈希和请求参数缓存模型回复"""
+
+    def __init__(self,
+                 max_entries: int = 256,
+                 ttl: Optional[float] = 600.0,
+                 tolerance: int = 4,
+                 hash_size: int = 8,
+                 path: Optional[str] = None,
+                 save_every: int = 16,
+                 save_interval: Optional[float] = 30.0):
+        """
+        Args:
+            max_entries: 最大缓存条目数，超出时淘汰最久未使用的条目
+            ttl: 条目有效期（秒），None表示永不过期
+            tolerance: 判定为同一画面的最大汉明距离
+            hash_size: 感知哈希边长
+            path: 可选的持久化文件路径，指定后启动时加载，写入后按批保存，关闭或退出时一定保存
+            save_every: 累计多少次写入后保存一次
+            save_interval: 距上次保存超过多少秒时，下一次写入会触发保存，None表示不按时间保存
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.tolerance = tolerance
+        self.hash_size = hash_size
+        self.path = path
+        self.save_every = max(1, save_every)
+        self.save_interval = save_interval
+
+        # (请求参数键, 图像哈希) -> (回复, 写入时间)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # 上次保存后的写入次数和保存时间
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+
+        if path and os.path.exists(path):
+            self.load()
+        if path:
+            # 只持有弱引用，缓存对象被回收后不再保存
+            atexit.register(_flush_at_exit, weakref.ref(self))
+
+    @staticmethod
+    def _params_key(prompt: str,
+                    model: str,
+                    temperature: float,
+                    max_tokens: int,
+                    response_format: Optional[Dict[str, str]] = None) -> str:
+        """把请求参数组合成字符串键，输出格式不同的回复不能互相替代"""
+        return json.dumps([prompt, model, temperature, max_tokens, response_format],
+                          ensure_ascii=False, sort_keys=True)
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl is not None and now - created > self.ttl
+
+    def image_hash(self, image: Image.Image) -> int:
+        """计算用于缓存的图像哈希"""
+        return perceptual_hash(image, self.hash_size)
+
+    def get(self,
+            image_hash: int,
+            prompt: str,
+            model: str,
+            temperature: float,
+            max_tokens: int,
+            response_format: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """查找缓存的回复
+
+        Args:
+            image_hash: 图像的感知哈希
+            prompt: 提示词
+            model: 模型名称
+            temperature: 生成温度
+            max_tokens: 最大生成token数
+            response_format: 请求的输出格式，如 {"type": "json_object"}
+
+        Returns:
+            缓存的回复，未命中时返回None
+        """
+        params = self._params_key(prompt, model, temperature, max_tokens, response_format)
+        now = time.time()
+        with self._lock:
+            best_key = None
+            best_distance = self.tolerance + 1
+            for key, (_, created) in list(self._entries.items()):
+                if self._expired(created, now):
+                    del self._entries[key]
+                    continue
+                if key[0] != params:
+                    continue
+                distance = hamming_distance(key[1], image_hash)
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+                    if distance == 0:
+                        break
+
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key][0]
+
+    def put(self,
+            image_hash: int,
+            prompt: str,
+            model: str,
+            temperature: float,
+            max_tokens: int,
+            response: str,
+            response_format: Optional[Dict[str, str]] = None):
+        """写入一条缓存，指定了path时按save_every和save_interval批量保存"""
+        key = (self._params_key(prompt, model, temperature, max_tokens, response_format), image_hash)
+        with self._lock:
+            self._entries[key] = (response, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._unsaved += 1
+            due = self._unsaved >= self.save_every or (
+                self.save_interval is not None and time.monotonic() - self._last_save >= self.save_interval)
+        if self.path and due:
+            self.save()
+
+    def flush(self):
+        """有未保存的写入时立即保存"""
+        if self.path and self._unsaved:
+            self.save()
+
+    def close(self):
+        """保存未保存的写入，程序结束前调用"""
+        self.flush()
+
+    def clear(self):
+        """清空缓存和计数"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中统计"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def save(self, path: Optional[str] = None):
+        """将缓存保存到JSON文件"""
+        path = path or self.path
+        if not path:
+            raise ValueError("未指定缓存文件路径")
+        with self._lock:
+            data = [
+                {"params": params, "hash": image_hash, "response": response, "created": created}
+                for (params, image_hash), (response, created) in self._entries.items()
+            ]
+            self._unsaved = 0
+            self._last_save = time.monotonic()
+        # 先写临时文件再原子替换，中途退出不会留下不完整的缓存文件
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load(self, path: Optional[str] = None):
+        """从JSON文件加载缓存，跳过已过期的条目"""
+        path = path or self.path
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        now = time.time()
+        with self._lock:
+            for item in data:
+                if self._expired(item["created"], now):
+                    continue
+                key = (item["params"], item["hash"])
+                self._entries[key] = (item["response"], item["created"])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def _flush_at_exit(ref: "weakref.ref[ResponseCache]"):
+    cache = ref()
+    if cache is not None:
+        cache.flush()
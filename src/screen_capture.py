@@ -0,0 +1,120 @@
+"""
+可替换的屏幕截图后端
+
+所有后端的grab都只截取请求的区域，返回 (height, width, 3) 的RGB NumPy数组。
+mss后端直接在截图缓冲区上构造数组视图，不额外复制像素；未安装mss时退回pyautogui。
+"""
+import importlib.util
+import threading
+from typing import Dict, Optional, Tuple, Type
+
+import numpy as np
+from PIL import Image
+
+_HAS_MSS = importlib.util.find_spec("mss") is not None
+
+Region = Tuple[int, int, int, int]
+
+
+class CaptureBackend:
+    """截图后端的基类"""
+
+    name = "base"
+
+    def grab(self, region: Optional[Region] = None) -> np.ndarray:
+        """
+        截取屏幕
+
+        Args:
+            region: 可选的区域 (left, top, width, height)，不指定时截取整个主屏幕
+
+        Returns:
+            (height, width, 3) 的RGB数组，可能是只读视图
+        """
+        raise NotImplementedError
+
+    def grab_image(self, region: Optional[Region] = None) -> Image.Image:
+        """截取屏幕并转换为PIL Image"""
+        return Image.fromarray(np.ascontiguousarray(self.grab(region)), "RGB")
+
+    def close(self):
+        """释放后端占用的资源"""
+
+
+class PyAutoGUIBackend(CaptureBackend):
+    """通过pyautogui截图，任何平台都可用"""
+
+    name = "pyautogui"
+
+    def grab(self, region: Optional[Region] = None) -> np.ndarray:
+        import pyautogui
+        return np.asarray(pyautogui.screenshot(region=region).convert("RGB"))
+
+    def grab_image(self, region: Optional[Region] = None) -> Image.Image:
+        import pyautogui
+        return pyautogui.screenshot(region=region)
+
+
+class MSSBackend(CaptureBackend):
+    """通过mss截图，X11上使用共享内存（XShm），只传输请求的区域"""
+
+    name = "mss"
+
+    def __init__(self, **mss_kwargs):
+        """
+        Args:
+            **mss_kwargs: 传给mss的参数，如display、backend
+        """
+        self._mss_kwargs = mss_kwargs
+        # mss实例持有显示连接，不能跨线程使用
+        self._local = threading.local()
+
+    def _sct(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            import mss
+            factory = getattr(mss, "MSS", None) or mss.mss
+            sct = self._local.sct = factory(**self._mss_kwargs)
+        return sct
+
+    def grab(self, region: Optional[Region] = None) -> np.ndarray:
+        sct = self._sct()
+        if region is None:
+            monitor = sct.monitors[1]
+        else:
+            left, top, width, height = region
+            monitor = {"left": left, "top": top, "width": width, "height": height}
+        shot = sct.grab(monitor)
+        # 截图缓冲区是BGRA，反向切片得到RGB视图
+        bgra = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+        return bgra[:, :, 2::-1]
+
+    def close(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is not None:
+            sct.close()
+            self._local.sct = None
+
+
+BACKENDS: Dict[str, Type[CaptureBackend]] = {
+    "mss": MSSBackend,
+    "pyautogui": PyAutoGUIBackend,
+}
+
+
+def get_backend(name: str = "auto", **kwargs) -> CaptureBackend:
+    """
+    创建截图后端
+
+    Args:
+        name: 后端名称，"auto" 表示安装了mss时使用mss，否则使用pyautogui
+        **kwargs: 传给后端的参数
+
+    Returns:
+        CaptureBackend实例
+    """
+    if name == "auto":
+        name = "mss" if _HAS_MSS else "pyautogui"
+    if name not in BACKENDS:
+        raise ValueError(f"未知的截图后端: {name}，可选: {', '.join(BACKENDS)}")
+    return BACKENDS[name](**kwargs)
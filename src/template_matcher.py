@@ -0,0 +1,379 @@
+"""
+基于NumPy的多尺度模板匹配
+
+模板在加入时读取一次并转换为灰度，各尺度的零均值模板及其频谱都会缓存。
+匹配使用归一化互相关（NCC）：分子通过FFT计算，窗口内的均值和方差通过积分图计算。
+默认先在2倍下采样的金字塔层上找到得分最高的几个候选位置（非极大值抑制），再在原分辨率的邻域内逐个精确计算得分。
+模板按几种起始相位分别下采样，元素在奇数坐标上时粗搜索得分也不会因为错位而偏低；
+画面上有相似的元素时，也不会只看下采样后得分最高的那个。
+同一帧的灰度图、积分图和频谱只计算一次，多个模板共用。
+只截取了部分屏幕时，用bounds算出覆盖所有搜索区域的最小截图区域，并把该区域的左上角作为origin传入，
+搜索区域和匹配结果仍然使用屏幕坐标。
+"""
+import os
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from PIL import Image
+
+Region = Tuple[int, int, int, int]
+ImageLike = Union[str, os.PathLike, Image.Image, np.ndarray]
+
+# ITU-R 601-2 亮度权重，与PIL的"L"模式一致
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+class Match(NamedTuple):
+    """匹配结果，前四项与pyautogui.locateOnScreen返回的Box一致"""
+    left: int
+    top: int
+    width: int
+    height: int
+    score: float
+    scale: float
+    name: str
+
+    @property
+    def center(self) -> Tuple[int, int]:
+        return self.left + self.width // 2, self.top + self.height // 2
+
+
+def to_gray(image: ImageLike) -> np.ndarray:
+    """把图像路径、PIL Image或RGB数组转换为float32灰度数组"""
+    if isinstance(image, (str, os.PathLike)):
+        image = Image.open(image)
+    if isinstance(image, Image.Image):
+        return np.asarray(image.convert("L"), dtype=np.float32)
+    array = np.asarray(image)
+    if array.ndim == 2:
+        return array.astype(np.float32)
+    return array[..., :3] @ _LUMA
+
+
+def _downsample(gray: np.ndarray, factor: int) -> np.ndarray:
+    """按factor×factor的块取平均"""
+    if factor == 1:
+        return gray
+    height, width = gray.shape[0] // factor, gray.shape[1] // factor
+    return gray[:height * factor, :width * factor].reshape(height, factor, width, factor).mean(axis=(1, 3))
+
+
+def _integral(gray: np.ndarray) -> np.ndarray:
+    """带一行一列零填充的积分图"""
+    result = np.zeros((gray.shape[0] + 1, gray.shape[1] + 1))
+    np.cumsum(np.cumsum(gray, axis=0), axis=1, out=result[1:, 1:])
+    return result
+
+
+def _window_sums(integral: np.ndarray, height: int, width: int) -> np.ndarray:
+    return integral[height:, width:] - integral[:-height, width:] - integral[height:, :-width] + integral[:-height, :-width]
+
+
+def _phases(factor: int) -> List[Tuple[int, int]]:
+    """下采样模板时使用的起始相位 (dy, dx)"""
+    offsets = sorted({0, factor // 2})
+    return [(dy, dx) for dy in offsets for dx in offsets]
+
+
+def _peaks(scores: np.ndarray, count: int, shape: Tuple[int, int]) -> List[Tuple[int, int]]:
+    """按得分从高到低返回最多count个峰值位置，已选峰值附近半个模板大小内的位置不再入选"""
+    scores = scores.copy()
+    half_height, half_width = max(1, shape[0] // 2), max(1, shape[1] // 2)
+    peaks = []
+    for _ in range(count):
+        row, col = (int(v) for v in np.unravel_index(np.argmax(scores), scores.shape))
+        if scores[row, col] == -np.inf:
+            break
+        peaks.append((row, col))
+        scores[max(0, row - half_height):row + half_height + 1, max(0, col - half_width):col + half_width + 1] = -np.inf
+    return peaks
+
+
+class _Variant:
+    """一个尺度和金字塔层上的模板"""
+
+    def __init__(self, gray: np.ndarray):
+        self.shape = gray.shape
+        self.zero_mean = gray.astype(np.float64) - gray.mean()
+        self.norm = float(np.sqrt((self.zero_mean ** 2).sum()))
+        self._spectra: Dict[Tuple[int, int], np.ndarray] = {}
+
+    def spectrum(self, shape: Tuple[int, int]) -> np.ndarray:
+        """补零到帧大小后的共轭频谱，按帧大小缓存"""
+        if shape not in self._spectra:
+            self._spectra[shape] = np.conj(np.fft.rfft2(self.zero_mean, s=shape))
+        return self._spectra[shape]
+
+
+class _Template:
+    """缓存的模板及其各尺度的预处理结果"""
+
+    def __init__(self, name: str, gray: np.ndarray, region: Optional[Region]):
+        if gray.std() < 1e-3:
+            raise ValueError(f"模板 {name} 是纯色图像，无法匹配")
+        self.name = name
+        self.gray = gray
+        self.region = region
+        self._variants: Dict[Tuple[float, int, Tuple[int, int]], _Variant] = {}
+
+    def variant(self, scale: float, factor: int, phase: Tuple[int, int] = (0, 0)) -> Optional[_Variant]:
+        key = (scale, factor, phase)
+        if key not in self._variants:
+            gray = self.gray
+            if scale != 1.0:
+                height, width = gray.shape
+                size = (max(1, round(width * scale)), max(1, round(height * scale)))
+                gray = np.asarray(Image.fromarray(gray, "F").resize(size, Image.Resampling.BILINEAR))
+            if factor > 1:
+                # 各相位裁剪为相同大小，下采样后形状一致，可以共用窗口均值和方差
+                height, width = ((size - factor // 2) // factor * factor for size in gray.shape)
+                gray = gray[phase[0]:phase[0] + height, phase[1]:phase[1] + width]
+            gray = _downsample(gray, factor)
+            self._variants[key] = _Variant(gray) if min(gray.shape) > 0 and gray.std() >= 1e-3 else None
+        return self._variants[key]
+
+
+class _Level:
+    """一帧在某个区域和金字塔层上的灰度图、积分图和频谱"""
+
+    def __init__(self, gray: np.ndarray):
+        self.gray = gray.astype(np.float64)
+        self._sums = None
+        self._squares = None
+        self._spectrum = None
+
+    @property
+    def sums(self) -> np.ndarray:
+        if self._sums is None:
+            self._sums = _integral(self.gray)
+        return self._sums
+
+    @property
+    def squares(self) -> np.ndarray:
+        if self._squares is None:
+            self._squares = _integral(self.gray ** 2)
+        return self._squares
+
+    @property
+    def spectrum(self) -> np.ndarray:
+        if self._spectrum is None:
+            self._spectrum = np.fft.rfft2(self.gray)
+        return self._spectrum
+
+    def ncc(self, variant: _Variant) -> np.ndarray:
+        """模板在所有完整落在图像内的位置上的NCC得分"""
+        return self.ncc_max([variant])
+
+    def ncc_max(self, variants: Sequence[_Variant]) -> np.ndarray:
+        """形状相同的几个模板在每个位置上的最高NCC得分，窗口均值和方差只计算一次"""
+        height, width = variants[0].shape
+        rows, cols = self.gray.shape[0] - height + 1, self.gray.shape[1] - width + 1
+        corr = None
+        for variant in variants:
+            product = np.fft.irfft2(self.spectrum * variant.spectrum(self.gray.shape), s=self.gray.shape)
+            product = product[:rows, :cols] / variant.norm
+            corr = product if corr is None else np.maximum(corr, product, out=corr)
+        return self._normalize(corr, _window_sums(self.sums, height, width),
+                               _window_sums(self.squares, height, width), height * width, 1.0)
+
+    def ncc_near(self, variant: _Variant, top: int, left: int, radius: int) -> Tuple[float, int, int]:
+        """在 (top, left) 附近直接计算NCC，返回最高得分及其位置"""
+        height, width = variant.shape
+        top0, left0 = max(0, top - radius), max(0, left - radius)
+        top1 = min(self.gray.shape[0] - height, top + radius)
+        left1 = min(self.gray.shape[1] - width, left + radius)
+        if top1 < top0 or left1 < left0:
+            return 0.0, top, left
+        patch = self.gray[top0:top1 + height, left0:left1 + width]
+        windows = sliding_window_view(patch, (height, width))
+        corr = np.einsum("ijkl,kl->ij", windows, variant.zero_mean)
+        sums = windows.sum(axis=(2, 3))
+        squares = np.einsum("ijkl,ijkl->ij", windows, windows)
+        scores = self._normalize(corr, sums, squares, height * width, variant.norm)
+        row, col = np.unravel_index(np.argmax(scores), scores.shape)
+        return float(scores[row, col]), top0 + int(row), left0 + int(col)
+
+    @staticmethod
+    def _normalize(corr, sums, squares, count: int, norm: float) -> np.ndarray:
+        variance = np.maximum(squares - sums ** 2 / count, 0.0)
+        denominator = np.sqrt(variance) * norm
+        # 纯色区域方差为0，得分记为0；浮点误差可能使得分略超出[-1, 1]
+        scores = np.divide(corr, denominator, out=np.zeros_like(corr), where=denominator > 1e-6 * count)
+        return np.clip(scores, -1.0, 1.0, out=scores)
+
+
+class _Frame:
+    """一帧截图的灰度图，按区域和金字塔层缓存预处理结果"""
+
+    def __init__(self, frame: ImageLike):
+        self.gray = to_gray(frame)
+        self._levels: Dict[Tuple[Optional[Region], int], _Level] = {}
+
+    def level(self, region: Optional[Region], factor: int) -> _Level:
+        key = (region, factor)
+        if key not in self._levels:
+            gray = self.gray
+            if region is not None:
+                left, top, width, height = region
+                gray = gray[max(0, top):top + height, max(0, left):left + width]
+            self._levels[key] = _Level(_downsample(gray, factor))
+        return self._levels[key]
+
+
+class TemplateMatcher:
+    """缓存模板并在截图中查找它们"""
+
+    def __init__(self,
+                 scales: Sequence[float] = (1.0,),
+                 threshold: float = 0.9,
+                 pyramid_factor: int = 2,
+                 min_coarse_size: int = 12,
+                 candidates: int = 5):
+        """
+        Args:
+            scales: 搜索的模板缩放比例，用于适配不同分辨率和DPI，如 (0.8, 1.0, 1.25)
+            threshold: 默认的最低NCC得分
+            pyramid_factor: 粗搜索层的下采样倍数，1表示直接在原分辨率上搜索
+            min_coarse_size: 模板在粗搜索层上的最小边长，小于时直接在原分辨率上搜索
+            candidates: 在粗搜索层上保留、并在原分辨率上逐个精确计算的候选位置数
+        """
+        self.scales = tuple(scales)
+        self.threshold = threshold
+        self.pyramid_factor = max(1, pyramid_factor)
+        self.min_coarse_size = min_coarse_size
+        self.candidates = max(1, candidates)
+        self._templates: Dict[str, _Template] = {}
+
+    def add(self, name: str, image: Optional[ImageLike] = None, region: Optional[Region] = None):
+        """
+        加入模板，图像只读取和预处理一次
+
+        Args:
+            name: 模板名称
+            image: 图像路径、PIL Image或数组，默认把name当作路径
+            region: 可选的默认搜索区域 (left, top, width, height)
+        """
+        self._templates[name] = _Template(name, to_gray(name if image is None else image), region)
+
+    def remove(self, name: str):
+        """删除模板"""
+        self._templates.pop(name, None)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._templates)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._templates
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def bounds(self, names: Iterable[str], regions: Optional[Dict[str, Region]] = None,
+               size: Optional[Tuple[int, int]] = None) -> Optional[Region]:
+        """
+        返回覆盖这些模板全部搜索区域的最小截图区域
+
+        Args:
+            names: 模板名称
+            regions: 模板名称到搜索区域的映射，覆盖模板的默认区域
+            size: 可选的屏幕尺寸 (width, height)，结果裁剪到屏幕内
+
+        Returns:
+            (left, top, width, height)；有模板需要搜索整个屏幕、或区域完全在屏幕外时返回None
+        """
+        regions = regions or {}
+        searched = [regions.get(name, self._templates[name].region) for name in names]
+        if not searched or any(region is None for region in searched):
+            return None
+        left = max(0, min(region[0] for region in searched))
+        top = max(0, min(region[1] for region in searched))
+        right = max(region[0] + region[2] for region in searched)
+        bottom = max(region[1] + region[3] for region in searched)
+        if size is not None:
+            right, bottom = min(right, size[0]), min(bottom, size[1])
+        if right <= left or bottom <= top:
+            return None
+        return left, top, right - left, bottom - top
+
+    def _search(self, frame: _Frame, template: _Template, region: Optional[Region],
+                origin: Tuple[int, int] = (0, 0)) -> Optional[Match]:
+        best = None
+        if region is not None:
+            # 屏幕坐标换算为截图内的坐标
+            region = (region[0] - origin[0], region[1] - origin[1], region[2], region[3])
+        offset_left, offset_top = (max(0, region[0]), max(0, region[1])) if region else (0, 0)
+        offset_left += origin[0]
+        offset_top += origin[1]
+        full = frame.level(region, 1)
+        for scale in self.scales:
+            variant = template.variant(scale, 1)
+            if variant is None or variant.shape[0] > full.gray.shape[0] or variant.shape[1] > full.gray.shape[1]:
+                continue
+            factor = self.pyramid_factor
+            coarse = [template.variant(scale, factor, phase) for phase in _phases(factor)] if factor > 1 else []
+            if coarse and all(c is not None and min(c.shape) >= self.min_coarse_size for c in coarse):
+                # 先在下采样层上找到几个候选位置，再在原分辨率的邻域内逐个精确计算；
+                # 相似的元素在下采样后得分可能更高，只看最高峰会定位到错误的元素
+                scores = frame.level(region, factor).ncc_max(coarse)
+                score, top, left = max(full.ncc_near(variant, row * factor, col * factor, factor + 1)
+                                       for row, col in _peaks(scores, self.candidates, coarse[0].shape))
+            else:
+                scores = full.ncc(variant)
+                top, left = (int(v) for v in np.unravel_index(np.argmax(scores), scores.shape))
+                score = float(scores[top, left])
+            if best is None or score > best.score:
+                best = Match(left + offset_left, top + offset_top, variant.shape[1], variant.shape[0],
+                             score, scale, template.name)
+        return best
+
+    def locate(self,
+               frame: ImageLike,
+               name: str,
+               region: Optional[Region] = None,
+               threshold: Optional[float] = None,
+               origin: Tuple[int, int] = (0, 0)) -> Optional[Match]:
+        """
+        在一帧截图中查找一个模板
+
+        Args:
+            frame: 截图，PIL Image或RGB数组
+            name: 模板名称
+            region: 可选的搜索区域，覆盖模板的默认区域
+            threshold: 最低NCC得分，默认使用构造时的设置
+            origin: frame左上角的屏幕坐标，frame只是屏幕的一部分时指定
+
+        Returns:
+            得分最高的匹配，低于阈值时返回None
+        """
+        return self.locate_all(frame, [name], {name: region} if region else None, threshold, origin)[name]
+
+    def locate_all(self,
+                   frame: ImageLike,
+                   names: Optional[Iterable[str]] = None,
+                   regions: Optional[Dict[str, Region]] = None,
+                   threshold: Optional[float] = None,
+                   origin: Tuple[int, int] = (0, 0)) -> Dict[str, Optional[Match]]:
+        """
+        在同一帧截图中查找多个模板，帧的预处理只做一次
+
+        Args:
+            frame: 截图，PIL Image或RGB数组
+            names: 要查找的模板名称，默认为全部模板
+            regions: 模板名称到搜索区域的映射，覆盖模板的默认区域
+            threshold: 最低NCC得分，默认使用构造时的设置
+            origin: frame左上角的屏幕坐标，frame只是屏幕的一部分时指定
+
+        Returns:
+            模板名称到匹配结果的映射（屏幕坐标），没有找到的模板值为None
+        """
+        threshold = self.threshold if threshold is None else threshold
+        regions = regions or {}
+        prepared = _Frame(frame)
+        results = {}
+        for name in (self.names if names is None else names):
+            template = self._templates[name]
+            match = self._search(prepared, template, regions.get(name, template.region), origin)
+            results[name] = match if match is not None and match.score >= threshold else None
+        return results
@@ -0,0 +1,308 @@
+"""
+OCR结果的文字与空间索引
+
+把识别结果按文字框中心放进固定大小的网格，支持按文字模糊查找、
+查找离某点最近的文字、区域内的文字以及某个标签右侧的文字。
+只重新识别了部分区域时，可以用update替换该区域内的旧结果。
+
+文字比较前统一全角/半角、大小写，并把繁体转换为简体。安装了opencc时使用其完整转换表，
+否则使用内置的游戏界面常用字对照表。
+"""
+import importlib.util
+import math
+import unicodedata
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from .element_locator import ElementLocation
+
+# 内置的繁体到简体对照表，覆盖游戏界面中的常用字
+_TRADITIONAL = (
+    "來来學学冊册開开關关閉闭設设確确認认戰战鬥斗進进離离們们個个這这選选擇择單单續续繼继點点擊击領领"
+    "獎奖勵励務务聲声畫画質质機机會会體体頁页級级經经驗验幣币寶宝裝装備备買买賣卖購购隊队組组邊边後后"
+    "復复線线連连結结東东錯错誤误對对話话說说幫帮試试請请輸输贏赢勝胜敗败計计時时間间記记錄录載载儲储"
+    "檔档難难稱称號号碼码帳帐戶户與与雙双為为歡欢動动長长門门問问題题專专業业區区傳传無无盡尽氣气電电"
+    "發发現现實实陣阵處处兌兑換换龍龙滿满應应標标準准術术總总覽览頭头創创據据數数獲获將将軍军團团隨随"
+    "週周鐘钟場场圖图從从網网絡络態态條条慶庆禮礼護护衛卫產产屬属強强礎础歷历練练習习愛爱視视聽听讀读"
+    "寫写鍵键盤盘顯显啟启餘余額额費费"
+)
+_T2S = {_TRADITIONAL[i]: _TRADITIONAL[i + 1] for i in range(0, len(_TRADITIONAL), 2)}
+_T2S_TABLE = str.maketrans(_T2S)
+
+_opencc = None
+if importlib.util.find_spec("opencc") is not None:
+    import opencc
+    _opencc = opencc.OpenCC("t2s")
+
+Box = Tuple[int, int, int, int]
+
+
+def to_simplified(text: str) -> str:
+    """把繁体字转换为简体"""
+    if _opencc is not None:
+        return _opencc.convert(text)
+    return text.translate(_T2S_TABLE)
+
+
+def normalize_text(text: str) -> str:
+    """统一全角/半角、大小写和繁简体并去掉空白，用于文字比较"""
+    return to_simplified("".join(unicodedata.normalize("NFKC", text).lower().split()))
+
+
+def text_similarity(text: str, query: str) -> float:
+    """
+    计算识别文字与查询文字的相似度
+
+    Args:
+        text: 识别出的文字
+        query: 要查找的文字
+
+    Returns:
+        0到1之间的相似度，识别文字包含查询文字时为1
+    """
+    return _key_similarity(normalize_text(text), normalize_text(query))
+
+
+def _key_similarity(text: str, query: str) -> float:
+    if not text or not query:
+        return 0.0
+    if query in text:
+        return 1.0
+    return SequenceMatcher(None, text, query).ratio()
+
+
+class TextEntry(NamedTuple):
+    """索引中的一条识别结果"""
+    bbox: List[Tuple[int, int]]
+    text: str
+    confidence: float
+    key: str
+    box: Box
+
+    @property
+    def center(self) -> Tuple[float, float]:
+        left, top, right, bottom = self.box
+        return (left + right) / 2, (top + bottom) / 2
+
+    def location(self, width: int, height: int) -> ElementLocation:
+        """转换为相对图像尺寸的ElementLocation，可以直接替代模型返回的定位结果"""
+        left, top, right, bottom = self.box
+        x, y = self.center
+        return ElementLocation(x / width, y / height, (right - left) / width, (bottom - top) / height,
+                               self.confidence)
+
+
+class TextIndex:
+    """按文字和位置查询OCR结果"""
+
+    def __init__(self, results: Sequence = (), cell_size: int = 128):
+        """
+        Args:
+            results: OCRController.recognize_image格式的识别结果
+            cell_size: 空间网格的边长（像素）
+        """
+        self.cell_size = cell_size
+        self._entries: Dict[int, TextEntry] = {}
+        self._grid: Dict[Tuple[int, int], set] = defaultdict(set)
+        self._by_key: Dict[str, set] = defaultdict(set)
+        self._next_id = 0
+        self.add(results)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def add(self, results: Sequence) -> List[TextEntry]:
+        """加入识别结果，返回新建的条目"""
+        added = []
+        for bbox, text, confidence in results:
+            xs, ys = [x for x, _ in bbox], [y for _, y in bbox]
+            entry = TextEntry([tuple(point) for point in bbox], text, confidence, normalize_text(text),
+                              (min(xs), min(ys), max(xs), max(ys)))
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            self._grid[self._cell(*entry.center)].add(entry_id)
+            self._by_key[entry.key].add(entry_id)
+            added.append(entry)
+        return added
+
+    def _remove_id(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        for index, key in ((self._grid, self._cell(*entry.center)), (self._by_key, entry.key)):
+            index[key].discard(entry_id)
+            if not index[key]:
+                del index[key]
+
+    def _ids_in(self, left: float, top: float, right: float, bottom: float) -> Iterator[int]:
+        """返回中心落在矩形内的条目"""
+        (x0, y0), (x1, y1) = self._cell(left, top), self._cell(right, bottom)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self._grid):
+            cells = [cell for cell in self._grid if x0 <= cell[0] <= x1 and y0 <= cell[1] <= y1]
+        else:
+            cells = [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1) if (x, y) in self._grid]
+        for cell in cells:
+            for entry_id in self._grid[cell]:
+                x, y = self._entries[entry_id].center
+                if left <= x <= right and top <= y <= bottom:
+                    yield entry_id
+
+    def remove_region(self, region: Box) -> int:
+        """
+        删除中心落在区域内的条目
+
+        Args:
+            region: (left, top, width, height)
+
+        Returns:
+            删除的条目数
+        """
+        left, top, width, height = region
+        ids = list(self._ids_in(left, top, left + width, top + height))
+        for entry_id in ids:
+            self._remove_id(entry_id)
+        return len(ids)
+
+    def update(self, results: Sequence, region: Optional[Box] = None) -> List[TextEntry]:
+        """
+        用新的识别结果替换旧结果
+
+        Args:
+            results: 新的识别结果，坐标为整张截图中的坐标
+            region: 重新识别的区域 (left, top, width, height)，不指定时替换全部结果
+
+        Returns:
+            新建的条目
+        """
+        if region is None:
+            self.clear()
+        else:
+            self.remove_region(region)
+        return self.add(results)
+
+    def clear(self):
+        """清空索引"""
+        self._entries.clear()
+        self._grid.clear()
+        self._by_key.clear()
+
+    def find(self, query: str, min_similarity: float = 0.7, region: Optional[Box] = None) -> List[TextEntry]:
+        """
+        模糊查找文字
+
+        Args:
+            query: 要查找的文字，比较时忽略全角/半角、大小写和繁简体差异
+            min_similarity: 最低相似度
+            region: 可选的查找范围 (left, top, width, height)
+
+        Returns:
+            按相似度和置信度从高到低排列的条目
+        """
+        if region is not None:
+            left, top, width, height = region
+            ids = self._ids_in(left, top, left + width, top + height)
+        else:
+            ids = self._entries
+        query = normalize_text(query)
+        scored = []
+        for entry_id in ids:
+            entry = self._entries[entry_id]
+            similarity = _key_similarity(entry.key, query)
+            if similarity >= min_similarity:
+                scored.append((similarity, entry.confidence, entry))
+        scored.sort(key=lambda item: item[:2], reverse=True)
+        return [entry for _, _, entry in scored]
+
+    def best(self, query: str, min_similarity: float = 0.7, region: Optional[Box] = None) -> Optional[TextEntry]:
+        """返回与查询最匹配的条目，文字完全相同时不做模糊比较"""
+        if region is None:
+            exact = self._by_key.get(normalize_text(query))
+            if exact:
+                return max((self._entries[entry_id] for entry_id in exact), key=lambda entry: entry.confidence)
+        matches = self.find(query, min_similarity, region)
+        return matches[0] if matches else None
+
+    def nearest(self, x: float, y: float, query: Optional[str] = None, min_similarity: float = 0.7,
+                max_distance: Optional[float] = None) -> Optional[TextEntry]:
+        """
+        查找文字框中心离某点最近的条目
+
+        Args:
+            x: 点的X坐标
+            y: 点的Y坐标
+            query: 可选的文字条件
+            min_similarity: 指定query时的最低相似度
+            max_distance: 最大距离，超过时返回None
+
+        Returns:
+            最近的条目，没有时返回None
+        """
+        def distance(entry: TextEntry) -> float:
+            cx, cy = entry.center
+            return math.hypot(cx - x, cy - y)
+
+        if query is not None:
+            candidates = self.find(query, min_similarity)
+        else:
+            # 从所在网格向外逐圈查找，已找到的距离不超过下一圈的最小距离时停止
+            candidates = []
+            cx, cy = self._cell(x, y)
+            max_ring = max((max(abs(gx - cx), abs(gy - cy)) for gx, gy in self._grid), default=-1)
+            for ring in range(max_ring + 1):
+                for gx in range(cx - ring, cx + ring + 1):
+                    for gy in range(cy - ring, cy + ring + 1):
+                        if max(abs(gx - cx), abs(gy - cy)) == ring and (gx, gy) in self._grid:
+                            candidates.extend(self._entries[entry_id] for entry_id in self._grid[gx, gy])
+                if candidates and min(map(distance, candidates)) <= ring * self.cell_size:
+                    break
+
+        best = min(candidates, key=distance, default=None)
+        if best is None or (max_distance is not None and distance(best) > max_distance):
+            return None
+        return best
+
+    def inside(self, region: Box) -> List[TextEntry]:
+        """
+        返回中心落在区域内的条目
+
+        Args:
+            region: (left, top, width, height)
+
+        Returns:
+            按从上到下、从左到右排列的条目
+        """
+        left, top, width, height = region
+        entries = [self._entries[entry_id] for entry_id in self._ids_in(left, top, left + width, top + height)]
+        return sorted(entries, key=lambda entry: (entry.box[1], entry.box[0]))
+
+    def right_of(self, label: Union[str, TextEntry], max_distance: Optional[float] = None,
+                 min_similarity: float = 0.7) -> List[TextEntry]:
+        """
+        查找与标签同一行、位于其右侧的文字，如"金币"右边的数值
+
+        Args:
+            label: 标签文字或已找到的条目
+            max_distance: 与标签右边缘的最大水平距离
+            min_similarity: label为文字时的最低相似度
+
+        Returns:
+            按离标签从近到远排列的条目，找不到标签时返回空列表
+        """
+        anchor = self.best(label, min_similarity) if isinstance(label, str) else label
+        if anchor is None:
+            return []
+        left, top, right, bottom = anchor.box
+        far = right + max_distance if max_distance is not None else math.inf
+        if far == math.inf:
+            far = max((cell[0] + 1) * self.cell_size for cell in self._grid)
+        entries = [
+            self._entries[entry_id] for entry_id in self._ids_in(right, top, far, bottom)
+            if self._entries[entry_id] != anchor and self._entries[entry_id].box[0] >= right - (bottom - top) / 2
+        ]
+        return sorted(entries, key=lambda entry: entry.box[0])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[TextEntry]:
+        return iter(list(self._entries.values()))
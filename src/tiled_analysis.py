@@ -0,0 +1,224 @@
+"""
+高分辨率截图的分块分析
+
+把截图按网格切成带重叠的小块，成批交给视觉语言模型分析，再把各块的定位结果换算回全屏坐标。
+连续帧中像素没有变化的小块直接复用上一帧的结果，只重新分析变化的区域。
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .element_locator import ElementLocation, build_locate_prompt, parse_locations
+
+Box = Tuple[int, int, int, int]
+
+
+def tile_boxes(size: Tuple[int, int], grid: int = 2, overlap: float = 0.0) -> List[Box]:
+    """
+    计算网格分块的像素范围
+
+    Args:
+        size: 图像尺寸 (width, height)
+        grid: 每边分成几块，总块数为grid^2
+        overlap: 相邻小块重叠的比例（相对小块边长），0表示不重叠
+
+    Returns:
+        按行排列的 (left, top, right, bottom) 列表
+    """
+    if grid < 1:
+        raise ValueError("grid必须大于0")
+    if not 0 <= overlap < 1:
+        raise ValueError("overlap必须在0到1之间")
+    width, height = size
+    block_width = width // grid
+    block_height = height // grid
+    pad_x = int(block_width * overlap / 2)
+    pad_y = int(block_height * overlap / 2)
+
+    boxes = []
+    for y in range(grid):
+        for x in range(grid):
+            left = x * block_width
+            top = y * block_height
+            # 最后一行/列延伸到图像边缘
+            right = width if x == grid - 1 else left + block_width
+            bottom = height if y == grid - 1 else top + block_height
+            boxes.append((
+                max(0, left - pad_x), max(0, top - pad_y),
+                min(width, right + pad_x), min(height, bottom + pad_y),
+            ))
+    return boxes
+
+
+class TileResult(NamedTuple):
+    """单个小块的分析结果"""
+    box: Box
+    text: str
+    reused: bool
+
+
+class TiledAnalyzer:
+    """分块分析截图，并跳过与上一帧相同的小块"""
+
+    def __init__(self,
+                 vlm,
+                 grid: int = 2,
+                 overlap: float = 0.1,
+                 tolerance: int = 0,
+                 workers: int = 1,
+                 micro_batch_size: int = 8,
+                 **generate_kwargs):
+        """
+        Args:
+            vlm: 提供batch_analyze_images的控制器，如VLMController
+            grid: 每边分成几块
+            overlap: 相邻小块重叠的比例，避免按钮被切断
+            tolerance: 像素最大差值不超过该值时视为未变化
+            workers: 并行分析的线程数，1表示所有小块作为一批
+            micro_batch_size: 每次generate处理的小块数量
+            generate_kwargs: 传给batch_analyze_images的生成参数，如max_length
+        """
+        self.vlm = vlm
+        self.grid = grid
+        self.overlap = overlap
+        self.tolerance = tolerance
+        self.workers = workers
+        self.micro_batch_size = micro_batch_size
+        self.generate_kwargs = generate_kwargs
+
+        self._lock = threading.Lock()
+        self._size = None
+        self._tiles: Dict[Box, np.ndarray] = {}
+        self._results: Dict[Tuple[Box, str], str] = {}
+        self.analyzed = 0
+        self.reused = 0
+
+    def reset(self):
+        """丢弃上一帧的像素和结果"""
+        with self._lock:
+            self._size = None
+            self._tiles.clear()
+            self._results.clear()
+
+    def _changed(self, box: Box, pixels: np.ndarray) -> bool:
+        previous = self._tiles.get(box)
+        if previous is None:
+            return True
+        diff = np.abs(previous.astype(np.int16) - pixels.astype(np.int16))
+        return int(diff.max()) > self.tolerance
+
+    def _run(self, tiles: List[Image.Image], prompts: List[str]) -> List[str]:
+        """成批或分给多个线程分析小块，结果与输入顺序一致"""
+        if self.workers <= 1 or len(tiles) <= 1:
+            return self.vlm.batch_analyze_images(
+                tiles, prompts, micro_batch_size=self.micro_batch_size, **self.generate_kwargs
+            )
+        chunk = -(-len(tiles) // self.workers)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [
+                pool.submit(
+                    self.vlm.batch_analyze_images, tiles[i:i + chunk], prompts[i:i + chunk],
+                    micro_batch_size=self.micro_batch_size, **self.generate_kwargs
+                )
+                for i in range(0, len(tiles), chunk)
+            ]
+            return [text for future in futures for text in future.result()]
+
+    def analyze(self, image: Image.Image, prompt: str) -> List[TileResult]:
+        """
+        分块分析一帧截图
+
+        Args:
+            image: 截图
+            prompt: 对每个小块提出的问题
+
+        Returns:
+            按行排列的各小块结果
+        """
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        boxes = tile_boxes(image.size, self.grid, self.overlap)
+        frame = np.asarray(image)
+
+        with self._lock:
+            if self._size != image.size:
+                self._size = image.size
+                self._tiles.clear()
+                self._results.clear()
+
+            texts: Dict[Box, str] = {}
+            dirty = []
+            for box in boxes:
+                left, top, right, bottom = box
+                pixels = frame[top:bottom, left:right]
+                if self._changed(box, pixels):
+                    self._tiles[box] = pixels.copy()
+                    # 像素变化后，该小块对所有提示词的旧结果都失效
+                    for key in [key for key in self._results if key[0] == box]:
+                        del self._results[key]
+                cached = self._results.get((box, prompt))
+                if cached is None:
+                    dirty.append(box)
+                else:
+                    texts[box] = cached
+
+        if dirty:
+            responses = self._run([image.crop(box) for box in dirty], [prompt] * len(dirty))
+            with self._lock:
+                for box, text in zip(dirty, responses):
+                    texts[box] = text
+                    self._results[(box, prompt)] = text
+
+        with self._lock:
+            self.analyzed += len(dirty)
+            self.reused += len(boxes) - len(dirty)
+        return [TileResult(box, texts[box], box not in dirty) for box in boxes]
+
+    def locate_elements(self,
+                        image: Image.Image,
+                        labels: Sequence[str]) -> Dict[str, Optional[ElementLocation]]:
+        """
+        分块定位界面元素，坐标换算为全屏比例
+
+        同一元素出现在多个重叠小块中时，取置信度最高的结果。
+
+        Args:
+            image: 截图
+            labels: 要定位的元素名称
+
+        Returns:
+            元素名称到全屏ElementLocation的映射，未找到为None
+        """
+        width, height = image.size
+        merged: Dict[str, Optional[ElementLocation]] = {label: None for label in labels}
+        for result in self.analyze(image, build_locate_prompt(labels)):
+            left, top, right, bottom = result.box
+            tile_width, tile_height = right - left, bottom - top
+            locations = parse_locations(result.text, labels, image_size=(tile_width, tile_height))
+            for label, location in locations.items():
+                if location is None:
+                    continue
+                location = ElementLocation(
+                    (left + location.x * tile_width) / width,
+                    (top + location.y * tile_height) / height,
+                    location.width * tile_width / width,
+                    location.height * tile_height / height,
+                    location.confidence,
+                )
+                best = merged.get(label)
+                if best is None or location.confidence > best.confidence:
+                    merged[label] = location
+        return merged
+
+    def stats(self) -> Dict[str, float]:
+        """返回分析和复用的小块数量"""
+        with self._lock:
+            total = self.analyzed + self.reused
+            return {
+                "analyzed": self.analyzed,
+                "reused": self.reused,
+                "reuse_rate": self.reused / total if total else 0.0,
+            }
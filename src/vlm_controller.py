@@ -1,31 +1,164 @@
-from typing import Optional, Union, List, Tuple
+from typing import Optional, Union, List, Tuple, NamedTuple, Dict
+import gc
+import hashlib
+import importlib.util
+import json
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing import AuthenticationError
 import torch
+import transformers
 from PIL import Image
 from transformers import InstructBlipProcessor, InstructBlipForConditionalGeneration
 import os
 import base64
 from io import BytesIO
 
+from .embedding_cache import EmbeddingCache, image_digest
+from .tiled_analysis import TiledAnalyzer, tile_boxes
+from .vlm_server import VLMClient
+
+# 支持的精度模式，int8为线性层的动态量化，只能在CPU上运行
+PRECISIONS = {
+    "float16": torch.float16,
+    "bfloat16": torch.bfloat16,
+    "float32": torch.float32,
+    "int8": torch.float32,
+}
+
+# low_cpu_mem_usage需要accelerate，未安装时退回普通加载
+_HAS_ACCELERATE = importlib.util.find_spec("accelerate") is not None
+
+# 快照中记录来源信息的文件
+_SNAPSHOT_INFO = "snapshot_info.json"
+
+# 加载前按参数量估算内存时，每个参数占用的字节数
+_BYTES_PER_PARAM = {"float16": 2, "bfloat16": 2, "float32": 4, "int8": 1.2}
+
+
+class ModelSpec(NamedTuple):
+    """注册表中的模型"""
+    repo: str
+    params: float  # 参数量（十亿），用于加载前估算内存
+
+
+# 可选的模型，小模型速度快，大模型更准确
+MODEL_REGISTRY = {
+    "flan-t5-xl": ModelSpec("Salesforce/instructblip-flan-t5-xl", 4.0),
+    "flan-t5-xxl": ModelSpec("Salesforce/instructblip-flan-t5-xxl", 12.3),
+    "vicuna-7b": ModelSpec("Salesforce/instructblip-vicuna-7b", 7.9),
+    "vicuna-13b": ModelSpec("Salesforce/instructblip-vicuna-13b", 14.2),
+}
+
+# 模型别名，"6b"/"17b"是示例脚本中沿用的旧名称
+MODEL_ALIASES = {
+    "small": "flan-t5-xl",
+    "large": "flan-t5-xxl",
+    "6b": "flan-t5-xl",
+    "17b": "flan-t5-xxl",
+}
+
+
+def resolve_model(model_size: str) -> str:
+    """
+    把注册表名称或别名解析为模型仓库名
+    
+    不在注册表中但包含"/"的名称视为Hugging Face仓库名或本地路径，原样返回。
+    """
+    name = MODEL_ALIASES.get(model_size, model_size)
+    if name in MODEL_REGISTRY:
+        return MODEL_REGISTRY[name].repo
+    if "/" in model_size:
+        return model_size
+    raise ValueError(f"未知的模型: {model_size}，可选 {sorted(MODEL_REGISTRY) + sorted(MODEL_ALIASES)}")
+
+
+class _LoadedModel(NamedTuple):
+    """已加载到内存中的模型"""
+    name: str
+    model: InstructBlipForConditionalGeneration
+    processor: InstructBlipProcessor
+    bytes: int
+
 class VLMController:
     """视觉语言模型控制器"""
     
-    def __init__(self, device: str = None):
+    def __init__(
+        self,
+        device: str = None,
+        model_size: str = "small",
+        precision: Optional[str] = None,
+        num_threads: Optional[int] = None,
+        num_interop_threads: Optional[int] = None,
+        embedding_cache_mb: float = 256,
+        use_server: bool = False,
+        server_socket: Optional[str] = None,
+        memory_budget_gb: Optional[float] = None,
+        snapshot_dir: Optional[str] = None,
+        warmup: bool = False,
+    ):
         """
         初始化视觉语言模型控制器
         
         Args:
             device: 运行设备，可选 "cuda", "mps", "cpu"，默认自动选择
+            model_size: 默认使用的模型，MODEL_REGISTRY中的名称或别名（"small", "large"），
+                也可以是Hugging Face仓库名或本地路径
+            precision: 模型精度，可选 "float16", "bfloat16", "float32", "int8"，
+                默认GPU上使用float16，CPU上使用float32
+            num_threads: 算子内部并行的线程数，默认由PyTorch决定
+            num_interop_threads: 算子之间并行的线程数，默认由PyTorch决定
+            embedding_cache_mb: 视觉编码器输出缓存的内存上限（MB），0表示不缓存
+            use_server: 本地推理服务正在运行且模型一致时，是否把请求转发给服务。
+                服务状态在第一次需要时检查并缓存，连接出错后重新检查
+            server_socket: 推理服务的套接字路径，默认见vlm_server.default_socket_path
+            memory_budget_gb: 同时驻留的模型占用的内存上限（GB），超出时卸载最久未使用的模型；
+                None表示只保留一个模型
+            snapshot_dir: 本地快照目录。首次加载后把权重按当前精度另存为safetensors，
+                之后直接从快照内存映射加载，跳过精度转换和Hub检查；None表示不使用快照
+            warmup: 是否在后台线程中预先加载默认模型并执行一次生成
         """
         self.device = self._get_device() if device is None else device
-        self.model = None
-        self.processor = None
+        if precision is None:
+            precision = "float32" if self.device == "cpu" else "float16"
+        if precision not in PRECISIONS:
+            raise ValueError(f"不支持的精度: {precision}")
+        if precision == "int8" and self.device != "cpu":
+            raise ValueError("int8动态量化只支持CPU")
+        self.precision = precision
+        self.memory_budget_gb = memory_budget_gb
+        self._models: Dict[str, _LoadedModel] = OrderedDict()
+        self._models_lock = threading.RLock()
+        
+        self._set_threads(num_threads, num_interop_threads)
+        
+        # 同一张截图的视觉编码器输出在多个提示词之间复用
+        self.embedding_cache = EmbeddingCache(int(embedding_cache_mb * 1024 * 1024))
+        
+        self.use_server = use_server
+        self._server = VLMClient(server_socket) if use_server else None
+        # 缓存的probe结果，_server_probed为False时下次需要重新检查
+        self._server_info: Optional[Dict] = None
+        self._server_probed = False
         
         # 模型配置
-        self.model_name = "Salesforce/instructblip-flan-t5-xl"
+        self.model_size = model_size
+        self.model_name = resolve_model(model_size)
         
         # 确保模型缓存目录存在
         self.cache_dir = os.path.join(os.path.expanduser("~"), ".cache/huggingface/hub")
         os.makedirs(self.cache_dir, exist_ok=True)
+        self.snapshot_dir = os.path.expanduser(snapshot_dir) if snapshot_dir else None
+        
+        # 每个模型各加载阶段的耗时（秒），用于发现启动变慢
+        self.load_timings: Dict[str, Dict[str, float]] = {}
+        
+        self._warmup_thread = None
+        if warmup:
+            self._warmup_thread = threading.Thread(target=self._warmup, daemon=True)
+            self._warmup_thread.start()
     
     def _get_device(self) -> str:
         """自动选择可用的设备"""
@@ -35,6 +168,18 @@ class VLMController:
             return "mps"
         return "cpu"
     
+    @staticmethod
+    def _set_threads(num_threads: Optional[int], num_interop_threads: Optional[int]):
+        """设置PyTorch的线程数"""
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        if num_interop_threads and torch.get_num_interop_threads() != num_interop_threads:
+            try:
+                torch.set_num_interop_threads(num_interop_threads)
+            except RuntimeError:
+                # 进程中已经执行过并行计算后不能再修改
+                print(f"无法修改inter-op线程数，当前为 {torch.get_num_interop_threads()}")
+    
     def _convert_image_to_base64(self, image):
         """Convert PIL image to base64 string with size optimization."""
         # Resize image if it's too large (max dimension 192)
@@ -60,60 +205,475 @@ class VLMController:
         image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
         return image_base64
     
-    def _load_model(self):
-        """懒加载模型"""
-        if self.model is None:
-            print(f"正在加载模型 {self.model_name}...")
+    @property
+    def model(self) -> Optional[InstructBlipForConditionalGeneration]:
+        """默认模型，未加载时为None"""
+        loaded = self._models.get(self.model_name)
+        return loaded.model if loaded else None
+    
+    @property
+    def processor(self) -> Optional[InstructBlipProcessor]:
+        """默认模型的处理器，未加载时为None"""
+        loaded = self._models.get(self.model_name)
+        return loaded.processor if loaded else None
+    
+    @property
+    def loaded_models(self) -> List[str]:
+        """当前驻留的模型，按最近使用排序"""
+        return list(self._models)
+    
+    def change_model_size(self, model_size: str):
+        """
+        切换默认模型，已加载的模型在内存预算内继续保留
+        
+        Args:
+            model_size: MODEL_REGISTRY中的名称、别名、仓库名或本地路径
+        """
+        self.model_size = model_size
+        self.model_name = resolve_model(model_size)
+    
+    def _estimate_bytes(self, model_name: str) -> int:
+        """加载前按注册表中的参数量估算模型内存"""
+        for spec in MODEL_REGISTRY.values():
+            if spec.repo == model_name:
+                return int(spec.params * 1e9 * _BYTES_PER_PARAM[self.precision])
+        return 0
+    
+    def unload_model(self, model_size: Optional[str] = None):
+        """
+        卸载模型并释放内存
+        
+        Args:
+            model_size: 要卸载的模型，默认为当前默认模型
+        """
+        name = self.model_name if model_size is None else resolve_model(model_size)
+        with self._models_lock:
+            if self._models.pop(name, None) is None:
+                return
+        print(f"已卸载模型 {name}")
+        gc.collect()
+        if self.device == "cuda":
+            torch.cuda.empty_cache()
+    
+    def _make_room(self, model_name: str):
+        """按内存预算卸载最久未使用的模型，为即将加载的模型腾出空间"""
+        if self.memory_budget_gb is None:
+            for name in [name for name in self._models if name != model_name]:
+                self.unload_model(name)
+            return
+        budget = self.memory_budget_gb * 1024 ** 3
+        needed = self._estimate_bytes(model_name)
+        while self._models and sum(m.bytes for m in self._models.values()) + needed > budget:
+            self.unload_model(next(iter(self._models)))
+    
+    def _snapshot_path(self, model_name: str) -> Optional[str]:
+        """模型在快照目录中的路径，int8在float32权重上量化，因此共用float32快照"""
+        if self.snapshot_dir is None:
+            return None
+        dtype = str(PRECISIONS[self.precision]).replace("torch.", "")
+        name = model_name.strip("/").replace("/", "--")
+        return os.path.join(self.snapshot_dir, f"{name}-{dtype}")
+    
+    def _source_fingerprint(self, model_name: str) -> Optional[str]:
+        """
+        模型来源的指纹，来源更新后快照视为过期
+        
+        本地目录按文件名、大小和修改时间计算；Hub仓库读取本地缓存中记录的提交哈希，不访问网络。
+        """
+        if os.path.isdir(model_name):
+            entries = []
+            for root, _, files in os.walk(model_name):
+                for file in sorted(files):
+                    path = os.path.join(root, file)
+                    st = os.stat(path)
+                    entries.append(f"{os.path.relpath(path, model_name)}:{st.st_size}:{st.st_mtime_ns}")
+            return hashlib.blake2b("\n".join(sorted(entries)).encode(), digest_size=16).hexdigest()
+        ref = os.path.join(self.cache_dir, "models--" + model_name.replace("/", "--"), "refs", "main")
+        if os.path.exists(ref):
+            with open(ref, "r", encoding="utf-8") as f:
+                return f.read().strip()
+        return None
+    
+    def _snapshot_info(self, model_name: str) -> Dict[str, Optional[str]]:
+        """写入快照的来源信息，与当前不一致时快照视为过期"""
+        return {
+            "source": model_name,
+            "fingerprint": self._source_fingerprint(model_name),
+            "transformers": transformers.__version__,
+        }
+    
+    def _snapshot_is_current(self, path: str, model_name: str) -> bool:
+        try:
+            with open(os.path.join(path, _SNAPSHOT_INFO), "r", encoding="utf-8") as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return info == self._snapshot_info(model_name)
+    
+    def _save_snapshot(self, path: str, model_name: str, model, processor):
+        """先写入临时目录再重命名，避免中断后留下不完整的快照；已有的过期快照被替换"""
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        model.save_pretrained(tmp_path, safe_serialization=True)
+        processor.save_pretrained(tmp_path)
+        with open(os.path.join(tmp_path, _SNAPSHOT_INFO), "w", encoding="utf-8") as f:
+            json.dump(self._snapshot_info(model_name), f)
+        shutil.rmtree(path, ignore_errors=True)
+        try:
+            os.replace(tmp_path, path)
+        except OSError:
+            # 其他进程同时写入了快照
+            shutil.rmtree(tmp_path, ignore_errors=True)
+    
+    def _load_pretrained(self, source: str, mark):
+        """从仓库、本地路径或快照加载处理器和模型"""
+        # 加载处理器
+        processor = InstructBlipProcessor.from_pretrained(
+            source,
+            cache_dir=self.cache_dir
+        )
+        mark("processor")
+        
+        # 加载模型，safetensors权重通过内存映射读取，不先初始化随机权重
+        model = InstructBlipForConditionalGeneration.from_pretrained(
+            source,
+            cache_dir=self.cache_dir,
+            torch_dtype=PRECISIONS[self.precision],
+            device_map="auto" if self.device == "cuda" else None,
+            low_cpu_mem_usage=_HAS_ACCELERATE,
+        )
+        mark("weights")
+        return model, processor
+    
+    def _load_model(self, model_name: Optional[str] = None) -> _LoadedModel:
+        """
+        懒加载模型，已加载时只更新最近使用顺序
+        
+        快照过期（来源或transformers版本变化）或无法加载时，从原始来源加载并重新生成快照。
+        
+        Args:
+            model_name: 模型仓库名或本地路径，默认为当前默认模型
+        """
+        model_name = model_name or self.model_name
+        with self._models_lock:
+            loaded = self._models.get(model_name)
+            if loaded is not None:
+                self._models.move_to_end(model_name)
+                return loaded
             
-            # 加载处理器
-            self.processor = InstructBlipProcessor.from_pretrained(
-                self.model_name,
-                cache_dir=self.cache_dir
-            )
+            self._make_room(model_name)
+            snapshot = self._snapshot_path(model_name)
+            timings = {}
+            start = phase = time.perf_counter()
+            
+            def mark(name):
+                nonlocal phase
+                now = time.perf_counter()
+                timings[name] = now - phase
+                phase = now
             
-            # 加载模型
-            self.model = InstructBlipForConditionalGeneration.from_pretrained(
-                self.model_name,
-                cache_dir=self.cache_dir,
-                torch_dtype=torch.float16,
-                device_map="auto" if self.device == "cuda" else None,
-            ).to(self.device)
+            model = None
+            if snapshot is not None and os.path.isdir(snapshot):
+                if self._snapshot_is_current(snapshot, model_name):
+                    print(f"正在加载模型 {snapshot}（{self.precision}）...")
+                    try:
+                        model, processor = self._load_pretrained(snapshot, mark)
+                    except Exception as e:
+                        print(f"快照无法加载，改为从 {model_name} 加载: {e}")
+                else:
+                    print(f"快照已过期，改为从 {model_name} 加载")
             
-            print("模型加载完成！")
+            if model is None:
+                print(f"正在加载模型 {model_name}（{self.precision}）...")
+                model, processor = self._load_pretrained(model_name, mark)
+                if snapshot is not None:
+                    os.makedirs(self.snapshot_dir, exist_ok=True)
+                    self._save_snapshot(snapshot, model_name, model, processor)
+                    mark("snapshot")
+            
+            model = model.to(self.device)
+            model.eval()
+            mark("to_device")
+            
+            if self.precision == "int8":
+                model = torch.ao.quantization.quantize_dynamic(
+                    model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+                mark("quantize")
+            
+            # 仅解码器的语言模型批量生成时需要左侧填充
+            if not model.config.text_config.is_encoder_decoder:
+                processor.tokenizer.padding_side = "left"
+            
+            timings["total"] = time.perf_counter() - start
+            self.load_timings[model_name] = timings
+            loaded = _LoadedModel(model_name, model, processor, self._model_bytes(model))
+            self._models[model_name] = loaded
+            print("模型加载完成！（" + "，".join(f"{k} {v:.2f}s" for k, v in timings.items()) + "）")
+            return loaded
+    
+    def _warmup(self):
+        """在后台加载默认模型并执行一次生成，让首次调用不再承担加载和初始化开销"""
+        try:
+            if self._server_client(self.model_name) is not None:
+                # 推理服务已经加载了同一模型，本进程不需要预热
+                return
+            loaded = self._load_model()
+            start = time.perf_counter()
+            self._generate(loaded, [Image.new("RGB", (224, 224))], ["warm up"], 8, 1, 0)
+            self.load_timings[loaded.name]["warmup"] = time.perf_counter() - start
+        except Exception as e:
+            print(f"模型预热失败: {e}")
     
-    def _split_image(self, image: Image.Image, num_blocks: int = 2) -> List[Tuple[Image.Image, Tuple[int, int]]]:
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待后台预热完成
+        
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+            
+        Returns:
+            bool: 预热是否已经结束
+        """
+        if self._warmup_thread is None:
+            return True
+        self._warmup_thread.join(timeout)
+        return not self._warmup_thread.is_alive()
+    
+    @staticmethod
+    def _model_bytes(model: torch.nn.Module) -> int:
+        """模型参数和缓冲区（包括量化后的打包权重）占用的内存"""
+        tensors = list(model.parameters()) + list(model.buffers())
+        size = sum(t.element_size() * t.nelement() for t in tensors)
+        for module in model.modules():
+            if isinstance(module, torch.ao.nn.quantized.dynamic.Linear):
+                for tensor in (module.weight(), module.bias()):
+                    if tensor is not None:
+                        size += tensor.element_size() * tensor.nelement()
+        return size
+    
+    def _server_client(self, model_name: str) -> Optional[VLMClient]:
+        """本地还没有加载该模型且推理服务可用时返回客户端"""
+        if self._server is None or model_name in self._models:
+            return None
+        if not self._server_probed:
+            self._server_info = self._server.probe()
+            self._server_probed = True
+        info = self._server_info
+        if info is None or info["model_name"] != model_name:
+            return None
+        return self._server
+    
+    def _call_server(self, model_name: str, method: str, **kwargs):
+        """把请求转发给推理服务，服务不可用时返回None"""
+        client = self._server_client(model_name)
+        if client is None:
+            return None
+        try:
+            return client.call(method, **kwargs)
+        except (OSError, EOFError, AuthenticationError):
+            # 服务在两次调用之间退出或重启，改为本地推理，下次调用前重新检查
+            self._server_probed = False
+            return None
+    
+    def _split_image(
+        self, image: Image.Image, num_blocks: int = 2, overlap: float = 0.0
+    ) -> List[Tuple[Image.Image, Tuple[int, int]]]:
         """
         将图像分割成多个小块
         
         Args:
             image: 输入图像
             num_blocks: 分割成几块（每边），总块数为num_blocks^2
+            overlap: 相邻小块重叠的比例，0表示不重叠
             
         Returns:
             List of tuples (image_block, (x, y)) where x, y are block coordinates
         """
-        width, height = image.size
-        block_width = width // num_blocks
-        block_height = height // num_blocks
-        blocks = []
-        
-        for y in range(num_blocks):
-            for x in range(num_blocks):
-                left = x * block_width
-                top = y * block_height
-                right = left + block_width
-                bottom = top + block_height
-                
-                # 处理最后一行/列可能的边界问题
-                if x == num_blocks - 1:
-                    right = width
-                if y == num_blocks - 1:
-                    bottom = height
-                
-                block = image.crop((left, top, right, bottom))
-                blocks.append((block, (x, y)))
-        
-        return blocks
+        boxes = tile_boxes(image.size, num_blocks, overlap)
+        return [
+            (image.crop(box), (index % num_blocks, index // num_blocks))
+            for index, box in enumerate(boxes)
+        ]
+    
+    def tiled_analyzer(self, **kwargs) -> TiledAnalyzer:
+        """
+        创建分块分析器，连续分析多帧截图时跳过未变化的小块
+        
+        Args:
+            **kwargs: 传给TiledAnalyzer的参数，如grid、overlap、workers、max_length
+        """
+        return TiledAnalyzer(self, **kwargs)
+    
+    def _image_embeds(self, loaded: _LoadedModel, images: List[Image.Image]) -> torch.Tensor:
+        """
+        计算一批图像的视觉编码器输出
+        
+        视觉编码器的输出与提示词无关，按图像哈希缓存；同一批中重复的图像只编码一次。
+        
+        Args:
+            loaded: 使用的模型
+            images: 图像列表
+            
+        Returns:
+            形状为 (batch, patches, hidden) 的张量
+        """
+        digests = {}
+        keys = []
+        for image in images:
+            if id(image) not in digests:
+                digests[id(image)] = image_digest(image, loaded.name, self.precision)
+            keys.append(digests[id(image)])
+        
+        embeds = {}
+        missing = {}
+        for key, image in zip(keys, images):
+            if key in embeds or key in missing:
+                continue
+            cached = self.embedding_cache.get(key)
+            if cached is None:
+                missing[key] = image
+            else:
+                embeds[key] = cached
+        
+        if missing:
+            pixel_values = loaded.processor.image_processor(
+                list(missing.values()), return_tensors="pt"
+            )["pixel_values"].to(self.device, loaded.model.dtype)
+            with torch.inference_mode():
+                outputs = loaded.model.vision_model(pixel_values, return_dict=True).last_hidden_state
+            for key, output in zip(missing, outputs):
+                # clone后缓存，避免切片引用整批张量的存储
+                embeds[key] = output.clone()
+                self.embedding_cache.put(key, embeds[key])
+        
+        return torch.stack([embeds[key] for key in keys])
+    
+    def _tokenize_prompts(self, processor: InstructBlipProcessor, prompts: List[str]):
+        """
+        按处理器的规则编码提示词，并在语言模型输入前插入图像占位符
+        
+        Returns:
+            (语言模型输入, Q-Former输入)
+        """
+        tokenizer = processor.tokenizer
+        text_inputs = tokenizer(prompts, padding=True, return_tensors="pt")
+        num_query_tokens = getattr(processor, "num_query_tokens", None)
+        if num_query_tokens is not None:
+            # 与处理器一致：填充后把图像占位符放在最前面
+            image_ids = torch.tensor(
+                tokenizer.convert_tokens_to_ids([processor.image_token.content] * num_query_tokens)
+            ).expand(len(prompts), -1)
+            for name, prefix in (("input_ids", image_ids), ("attention_mask", torch.ones_like(image_ids))):
+                text_inputs[name] = torch.cat([prefix, text_inputs[name]], dim=1)
+        text_inputs = text_inputs.to(self.device)
+        qformer_inputs = processor.qformer_tokenizer(
+            prompts, padding=True, return_tensors="pt"
+        ).to(self.device)
+        return text_inputs, qformer_inputs
+    
+    def _generate_from_embeds(
+        self, loaded: _LoadedModel, image_embeds: torch.Tensor, prompts: List[str], **options
+    ) -> torch.Tensor:
+        """
+        从视觉编码器输出开始生成，与InstructBlipForConditionalGeneration.generate的后半段一致
+        
+        按requirements.txt中固定的transformers版本范围编写，升级transformers前需要运行
+        tests/test_vlm_controller.py确认与model.generate的输出一致。
+        Q-Former以提示词为条件，因此每个提示词都要重新运行Q-Former和语言模型。
+        """
+        model = loaded.model
+        if hasattr(model, "hf_device_map") and hasattr(model, "_preprocess_accelerate"):
+            # 多设备加载时generate先调用这个私有方法调整语言模型的设备映射；
+            # 新版本transformers中可能不存在，此时跳过
+            model._preprocess_accelerate()
+        
+        text_inputs, qformer_inputs = self._tokenize_prompts(loaded.processor, prompts)
+        
+        image_attention_mask = torch.ones(image_embeds.size()[:-1], dtype=torch.long, device=image_embeds.device)
+        query_tokens = model.query_tokens.expand(image_embeds.shape[0], -1, -1)
+        query_attention_mask = torch.ones(query_tokens.size()[:-1], dtype=torch.long, device=image_embeds.device)
+        query_outputs = model.qformer(
+            input_ids=qformer_inputs["input_ids"],
+            attention_mask=torch.cat([query_attention_mask, qformer_inputs["attention_mask"]], dim=1),
+            query_embeds=query_tokens,
+            encoder_hidden_states=image_embeds,
+            encoder_attention_mask=image_attention_mask,
+            return_dict=True,
+        )
+        language_model_inputs = model.language_projection(
+            query_outputs.last_hidden_state[:, : query_tokens.size(1), :]
+        )
+        
+        input_ids = text_inputs["input_ids"]
+        attention_mask = text_inputs["attention_mask"]
+        inputs_embeds = model.get_input_embeddings()(input_ids)
+        image_token_index = getattr(model.config, "image_token_index", None)
+        if image_token_index is not None:
+            special_image_mask = (input_ids == image_token_index).unsqueeze(-1).expand_as(inputs_embeds)
+            inputs_embeds[special_image_mask] = language_model_inputs.flatten().to(inputs_embeds.device)
+        else:
+            # 旧版配置没有图像占位符，把查询输出拼接在文本前面
+            inputs_embeds = torch.cat([language_model_inputs, inputs_embeds.to(language_model_inputs.device)], dim=1)
+            attention_mask = torch.cat([
+                torch.ones(language_model_inputs.size()[:-1], dtype=torch.long, device=language_model_inputs.device),
+                attention_mask.to(language_model_inputs.device),
+            ], dim=1)
+            if not model.language_model.config.is_encoder_decoder:
+                options["max_length"] = options.get("max_length", 20) + language_model_inputs.shape[1] - 1
+                options["min_length"] = options.get("min_length", 0) + language_model_inputs.shape[1]
+        
+        inputs = {"inputs_embeds": inputs_embeds, "attention_mask": attention_mask}
+        if model.language_model.config.is_encoder_decoder:
+            return model.language_model.generate(**inputs, **options)
+        inputs["input_ids"] = input_ids
+        if image_token_index is None or "max_length" not in options:
+            return model.language_model.generate(**inputs, **options)
+        
+        # 仅解码器的模型max_length包含左侧填充，较短的提示词在批次中会少生成token。
+        # 按最短的提示词计算生成长度，再把每行截断到单独生成时的长度
+        max_length = options.pop("max_length")
+        lengths = attention_mask.sum(dim=1)
+        padded = attention_mask.shape[1]
+        options["max_new_tokens"] = max(1, max_length - int(lengths.min()))
+        outputs = model.language_model.generate(**inputs, **options)
+        limits = padded + (max_length - lengths).clamp(min=1).to(outputs.device)
+        columns = torch.arange(outputs.shape[1], device=outputs.device)
+        pad_token_id = model.language_model.generation_config.pad_token_id
+        if pad_token_id is None:
+            pad_token_id = loaded.processor.tokenizer.pad_token_id
+        return outputs.masked_fill(columns[None, :] >= limits[:, None], pad_token_id)
+    
+    def _generate(
+        self,
+        loaded: _LoadedModel,
+        images: List[Image.Image],
+        prompts: List[str],
+        max_length: int,
+        num_beams: int,
+        temperature: float,
+    ) -> List[str]:
+        """对一批图像和提示词执行一次generate"""
+        options = dict(max_length=max_length, num_beams=num_beams, do_sample=temperature > 0)
+        if temperature > 0:
+            options["temperature"] = temperature
+        
+        with torch.inference_mode():
+            image_embeds = self._image_embeds(loaded, images)
+            outputs = self._generate_from_embeds(loaded, image_embeds, prompts, **options)
+        
+        return [
+            text.strip()
+            for text in loaded.processor.batch_decode(outputs, skip_special_tokens=True)
+        ]
+    
+    @staticmethod
+    def _load_image(image: Union[Image.Image, str]) -> Image.Image:
+        """如果输入是路径，加载图像"""
+        if isinstance(image, str):
+            image = Image.open(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return image
     
     def analyze_image(
         self,
@@ -122,6 +682,7 @@ class VLMController:
         max_length=512,
         num_beams=5,
         temperature=0.7,
+        model_size=None,
     ):
         """分析图像内容。
         
@@ -131,59 +692,119 @@ class VLMController:
             max_length: 生成文本的最大长度
             num_beams: beam search的beam数量
             temperature: 生成文本的随机性，越大越随机
+            model_size: 本次调用使用的模型，默认为当前默认模型
             
         Returns:
             str: 分析结果
         """
-        self._load_model()
-        
-        # 如果输入是路径，加载图像
-        if isinstance(image, str):
-            image = Image.open(image)
-        
-        # 处理图像
-        inputs = self.processor(
-            images=image,
-            text=prompt,
-            return_tensors="pt"
-        ).to(self.device)
-        
-        # 生成回答
-        outputs = self.model.generate(
-            **inputs,
-            max_length=max_length,
-            num_beams=num_beams,
-            temperature=temperature,
-            do_sample=temperature > 0,
+        model_name = self.model_name if model_size is None else resolve_model(model_size)
+        image = self._load_image(image)
+        response = self._call_server(
+            model_name, "analyze_image", image=image, prompt=prompt,
+            max_length=max_length, num_beams=num_beams, temperature=temperature,
         )
+        if response is not None:
+            return response
         
-        # 解码回答
-        response = self.processor.batch_decode(
-            outputs,
-            skip_special_tokens=True
-        )[0].strip()
-        
-        return response
+        loaded = self._load_model(model_name)
+        return self._generate(loaded, [image], [prompt], max_length, num_beams, temperature)[0]
     
     def batch_analyze_images(
         self,
         images: List[Union[Image.Image, str]],
         prompts: List[str],
-        **kwargs
+        micro_batch_size: int = 8,
+        max_length: int = 512,
+        num_beams: int = 5,
+        temperature: float = 0.7,
+        sort_by_length: bool = True,
+        model_size: Optional[str] = None,
     ) -> List[str]:
         """
         批量分析多张图像
         
+        图像和提示词按micro_batch_size分组，每组填充为一个张量批次后执行一次generate。
+        
         Args:
             images: 图像列表，每个元素可以是PIL Image对象或图像文件路径
             prompts: 对应的提示词列表
-            **kwargs: 传递给analyze_image的其他参数
+            micro_batch_size: 每次generate处理的条目数，受内存限制
+            max_length: 生成文本的最大长度
+            num_beams: beam search的beam数量
+            temperature: 生成文本的随机性
+            sort_by_length: 是否按提示词长度分组以减少填充，结果顺序不受影响
+            model_size: 本次调用使用的模型，默认为当前默认模型
             
         Returns:
-            回答列表
+            回答列表，与输入顺序一致
         """
         assert len(images) == len(prompts), "图像数量必须与提示词数量相同"
-        return [
-            self.analyze_image(image, prompt, **kwargs)
-            for image, prompt in zip(images, prompts)
-        ] 
\ No newline at end of file
+        if micro_batch_size < 1:
+            raise ValueError("micro_batch_size必须大于0")
+        model_name = self.model_name if model_size is None else resolve_model(model_size)
+        images = [self._load_image(image) for image in images]
+        responses = self._call_server(
+            model_name, "batch_analyze_images", images=images, prompts=prompts,
+            micro_batch_size=micro_batch_size, max_length=max_length, num_beams=num_beams,
+            temperature=temperature, sort_by_length=sort_by_length,
+        )
+        if responses is not None:
+            return responses
+        loaded = self._load_model(model_name)
+        
+        order = list(range(len(images)))
+        if sort_by_length:
+            order.sort(key=lambda i: len(prompts[i]))
+        
+        results = [None] * len(images)
+        for start in range(0, len(order), micro_batch_size):
+            indices = order[start:start + micro_batch_size]
+            responses = self._generate(
+                loaded,
+                [images[i] for i in indices],
+                [prompts[i] for i in indices],
+                max_length,
+                num_beams,
+                temperature,
+            )
+            for index, response in zip(indices, responses):
+                results[index] = response
+        return results
+    
+    def analyze_image_prompts(
+        self,
+        image: Union[Image.Image, str],
+        prompts: List[str],
+        micro_batch_size: int = 8,
+        max_length: int = 512,
+        num_beams: int = 5,
+        temperature: float = 0.7,
+        model_size: Optional[str] = None,
+    ) -> List[str]:
+        """
+        对同一张图像提出多个问题
+        
+        图像只经过一次视觉编码器，之后每个提示词只运行Q-Former和语言模型。
+        
+        Args:
+            image: PIL Image对象或图像文件路径
+            prompts: 提示词列表
+            micro_batch_size: 每次generate处理的提示词数量
+            max_length: 生成文本的最大长度
+            num_beams: beam search的beam数量
+            temperature: 生成文本的随机性
+            model_size: 本次调用使用的模型，默认为当前默认模型
+            
+        Returns:
+            回答列表，与提示词顺序一致
+        """
+        image = self._load_image(image)
+        return self.batch_analyze_images(
+            [image] * len(prompts),
+            prompts,
+            micro_batch_size=micro_batch_size,
+            max_length=max_length,
+            num_beams=num_beams,
+            temperature=temperature,
+            model_size=model_size,
+        )
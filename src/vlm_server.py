@@ -0,0 +1,359 @@
+"""
+常驻的本地视觉模型推理服务
+
+服务进程只加载一次模型，通过Unix套接字接收analyze_image / batch_analyze_images请求。
+请求进入队列后由单个推理线程依次处理，队列中参数相同的analyze_image请求会合并为一批。
+VLMController设置use_server=True后，检测到服务正在运行且模型一致时会把请求转发给服务。
+
+连接上传输的是pickle数据，因此套接字放在只有当前用户可访问的0700目录中，
+客户端连接前检查套接字属于当前用户，并且双方总是通过共享密钥互相认证。
+"""
+import os
+import secrets
+import socket
+import stat
+import tempfile
+import threading
+import time
+from collections import deque
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+METHODS = ("analyze_image", "batch_analyze_images")
+
+
+def runtime_dir() -> str:
+    """当前用户私有的运行时目录，优先使用XDG_RUNTIME_DIR"""
+    base = os.environ.get("XDG_RUNTIME_DIR")
+    if base:
+        return os.path.join(base, "honkai-copilot")
+    return os.path.join(tempfile.gettempdir(), f"honkai-copilot-{os.getuid()}")
+
+
+def default_socket_path() -> str:
+    """默认的套接字路径，可以通过VLM_SERVER_SOCKET环境变量覆盖"""
+    return os.environ.get("VLM_SERVER_SOCKET") or os.path.join(runtime_dir(), "vlm.sock")
+
+
+def authkey_path(socket_path: str) -> str:
+    """未设置VLM_SERVER_AUTHKEY时，服务生成的密钥保存在套接字旁边"""
+    return f"{socket_path}.key"
+
+
+def _check_owner(path: str, st: os.stat_result, private: bool):
+    """确认文件属于当前用户；private为True时还要求其他用户没有任何权限"""
+    if st.st_uid != os.getuid():
+        raise PermissionError(f"{path} 不属于当前用户")
+    if private and st.st_mode & 0o077:
+        raise PermissionError(f"{path} 的权限过宽（{stat.filemode(st.st_mode)}）")
+
+
+def _ensure_private_dir(path: str):
+    """创建0700目录；目录已存在时确认属于当前用户且其他用户不能写入"""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode):
+        raise PermissionError(f"{path} 不是目录")
+    if st.st_uid != os.getuid() or st.st_mode & 0o022:
+        raise PermissionError(f"{path} 不是当前用户的私有目录")
+
+
+def _read_authkey(path: str) -> bytes:
+    """读取密钥文件，文件必须属于当前用户且权限为0600"""
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+    with os.fdopen(fd, "rb") as f:
+        _check_owner(path, os.fstat(f.fileno()), private=True)
+        key = f.read().strip()
+    if not key:
+        raise PermissionError(f"{path} 中没有密钥")
+    return key
+
+
+def _create_authkey(path: str) -> bytes:
+    """生成随机密钥并以0600权限写入文件，文件已存在时读取"""
+    key = secrets.token_hex(32).encode()
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_NOFOLLOW", 0), 0o600)
+    except FileExistsError:
+        return _read_authkey(path)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+
+def _env_authkey() -> Optional[bytes]:
+    key = os.environ.get("VLM_SERVER_AUTHKEY")
+    return key.encode() if key else None
+
+
+class VLMServerError(RuntimeError):
+    """推理服务返回的错误"""
+
+
+class _Job:
+    """队列中的一个请求"""
+
+    def __init__(self, method: str, kwargs: Dict[str, Any]):
+        self.method = method
+        self.kwargs = kwargs
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def options(self):
+        """除图像和提示词之外的生成参数，相同的analyze_image请求可以合并"""
+        return tuple(sorted((k, v) for k, v in self.kwargs.items() if k not in ("image", "prompt")))
+
+
+class VLMServer:
+    """通过Unix套接字提供推理的常驻服务"""
+
+    def __init__(self,
+                 controller,
+                 socket_path: Optional[str] = None,
+                 max_queue: int = 32,
+                 max_batch: int = 8,
+                 authkey: Optional[bytes] = None):
+        """
+        Args:
+            controller: 执行推理的VLMController
+            socket_path: 套接字路径，默认见default_socket_path
+            max_queue: 排队请求数上限，超过时直接返回繁忙
+            max_batch: 合并analyze_image请求的最大批次
+            authkey: 连接认证密钥，默认读取VLM_SERVER_AUTHKEY环境变量；
+                都未设置时在启动时生成，以0600权限保存到authkey_path(socket_path)
+        """
+        if not hasattr(socket, "AF_UNIX"):
+            raise OSError("当前系统不支持Unix套接字")
+        self.controller = controller
+        self.socket_path = socket_path or default_socket_path()
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self.authkey = authkey if authkey is not None else _env_authkey()
+
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._listener = None
+        self._running = False
+        self._started_at = None
+        self._latencies = deque(maxlen=256)
+        self._waits = deque(maxlen=256)
+        self.processed = 0
+        self.rejected = 0
+        self.batches = 0
+
+    def start(self):
+        """加载模型并在后台线程中开始服务"""
+        self.controller._load_model()
+        _ensure_private_dir(os.path.dirname(os.path.abspath(self.socket_path)))
+        if self.authkey is None:
+            self.authkey = _create_authkey(authkey_path(self.socket_path))
+        if os.path.lexists(self.socket_path):
+            # 上次异常退出留下的套接字文件，只删除自己的
+            _check_owner(self.socket_path, os.lstat(self.socket_path), private=False)
+            os.unlink(self.socket_path)
+        # 通过umask让套接字创建时就是0600，不留下其他用户可以连接的时间窗口
+        old_umask = os.umask(0o177)
+        try:
+            self._listener = Listener(self.socket_path, family="AF_UNIX", authkey=self.authkey)
+        finally:
+            os.umask(old_umask)
+        self._running = True
+        self._started_at = time.time()
+        threading.Thread(target=self._worker, daemon=True).start()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def serve_forever(self):
+        """启动服务并阻塞，直到收到KeyboardInterrupt"""
+        self.start()
+        print(f"推理服务已启动: {self.socket_path}")
+        try:
+            while self._running:
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        """停止服务并删除套接字文件，密钥文件保留给之后启动的服务复用"""
+        self._running = False
+        with self._condition:
+            self._condition.notify_all()
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def _accept(self):
+        listener = self._listener
+        while self._running:
+            try:
+                connection = listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                # 关闭监听后accept会抛出异常；认证失败的连接直接忽略
+                continue
+            threading.Thread(target=self._serve_connection, args=(connection,), daemon=True).start()
+
+    def _serve_connection(self, connection):
+        with connection:
+            while self._running:
+                try:
+                    method, kwargs = connection.recv()
+                except (EOFError, OSError):
+                    return
+                connection.send(self._dispatch(method, kwargs))
+
+    def _dispatch(self, method: str, kwargs: Dict[str, Any]):
+        if method == "stats":
+            return "ok", self.stats()
+        if method not in METHODS:
+            return "error", f"不支持的方法: {method}"
+
+        job = _Job(method, kwargs)
+        with self._condition:
+            if len(self._pending) >= self.max_queue:
+                self.rejected += 1
+                return "error", "推理服务繁忙，队列已满"
+            self._pending.append(job)
+            self._condition.notify()
+        job.done.wait()
+        if job.error is not None:
+            return "error", job.error
+        return "ok", job.result
+
+    def _next_jobs(self) -> List[_Job]:
+        """取出下一个请求，并合并队列中参数相同的analyze_image请求"""
+        with self._condition:
+            while self._running and not self._pending:
+                self._condition.wait()
+            if not self._pending:
+                return []
+            job = self._pending.popleft()
+            jobs = [job]
+            if job.method == "analyze_image":
+                options = job.options()
+                for other in list(self._pending):
+                    if len(jobs) >= self.max_batch:
+                        break
+                    if other.method == "analyze_image" and other.options() == options:
+                        self._pending.remove(other)
+                        jobs.append(other)
+            return jobs
+
+    def _run(self, jobs: List[_Job]):
+        if len(jobs) == 1 and jobs[0].method == "batch_analyze_images":
+            return [self.controller.batch_analyze_images(**jobs[0].kwargs)]
+        if len(jobs) == 1:
+            return [self.controller.analyze_image(**jobs[0].kwargs)]
+        options = dict(jobs[0].options())
+        return self.controller.batch_analyze_images(
+            [job.kwargs["image"] for job in jobs],
+            [job.kwargs["prompt"] for job in jobs],
+            micro_batch_size=len(jobs),
+            **options,
+        )
+
+    def _worker(self):
+        while self._running:
+            jobs = self._next_jobs()
+            if not jobs:
+                continue
+            started = time.perf_counter()
+            for job in jobs:
+                job.started = started
+            try:
+                results = self._run(jobs)
+                for job, result in zip(jobs, results):
+                    job.result = result
+            except Exception as e:
+                for job in jobs:
+                    job.error = f"{type(e).__name__}: {e}"
+
+            finished = time.perf_counter()
+            with self._condition:
+                self.batches += 1
+                self.processed += len(jobs)
+                for job in jobs:
+                    self._waits.append(job.started - job.submitted)
+                    self._latencies.append(finished - job.submitted)
+            for job in jobs:
+                job.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回队列深度和最近请求的延迟统计"""
+        with self._condition:
+            latencies = np.array(self._latencies) if self._latencies else np.zeros(1)
+            waits = np.array(self._waits) if self._waits else np.zeros(1)
+            return {
+                "model_name": self.controller.model_name,
+                "precision": getattr(self.controller, "precision", None),
+                "device": self.controller.device,
+                "load_timings": getattr(self.controller, "load_timings", {}),
+                "uptime": time.time() - self._started_at if self._started_at else 0.0,
+                "queue_depth": len(self._pending),
+                "processed": self.processed,
+                "rejected": self.rejected,
+                "batches": self.batches,
+                "latency_p50": float(np.percentile(latencies, 50)),
+                "latency_p95": float(np.percentile(latencies, 95)),
+                "queue_wait_mean": float(waits.mean()),
+            }
+
+
+class VLMClient:
+    """推理服务的客户端，每次调用建立一个短连接"""
+
+    def __init__(self, socket_path: Optional[str] = None, authkey: Optional[bytes] = None):
+        """
+        Args:
+            socket_path: 套接字路径，默认见default_socket_path
+            authkey: 连接认证密钥，默认读取VLM_SERVER_AUTHKEY环境变量，
+                未设置时读取服务生成的密钥文件
+        """
+        self.socket_path = socket_path or default_socket_path()
+        self.authkey = authkey if authkey is not None else _env_authkey()
+
+    def _connect(self):
+        """检查套接字和密钥后建立连接，任何一项不满足都不会连接"""
+        st = os.stat(self.socket_path)
+        if not stat.S_ISSOCK(st.st_mode):
+            raise PermissionError(f"{self.socket_path} 不是套接字")
+        _check_owner(self.socket_path, st, private=False)
+        authkey = self.authkey or _read_authkey(authkey_path(self.socket_path))
+        return Client(self.socket_path, family="AF_UNIX", authkey=authkey)
+
+    def call(self, method: str, **kwargs):
+        """
+        调用服务端方法
+
+        Raises:
+            OSError/EOFError: 无法连接服务，或套接字、密钥文件不属于当前用户
+            AuthenticationError: 服务端没有通过密钥认证
+            VLMServerError: 服务端处理失败
+        """
+        with self._connect() as connection:
+            connection.send((method, kwargs))
+            status, value = connection.recv()
+        if status != "ok":
+            raise VLMServerError(value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """服务的健康状态和统计"""
+        return self.call("stats")
+
+    def probe(self) -> Optional[Dict[str, Any]]:
+        """服务可用时返回统计信息，否则返回None"""
+        if not hasattr(socket, "AF_UNIX") or not os.path.exists(self.socket_path):
+            return None
+        try:
+            return self.stats()
+        except (OSError, EOFError, AuthenticationError, VLMServerError):
+            return None
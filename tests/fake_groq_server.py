@@ -0,0 +1,148 @@
+"""
+本地模拟的Groq HTTP服务，用于离线测试GroqController
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+
+def completion_payload(text: str, model: str = "fake-model") -> Dict:
+    """构造一个ChatCompletion响应体"""
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    }
+
+
+class FakeResponse:
+    """一条预设的响应"""
+
+    def __init__(self,
+                 status: int = 200,
+                 text: str = "ok",
+                 headers: Optional[Dict[str, str]] = None,
+                 delay: float = 0.0,
+                 body: Optional[Dict] = None):
+        """
+        Args:
+            status: HTTP状态码
+            text: 成功时的回复文本
+            headers: 额外的响应头
+            delay: 返回前的延迟（秒）
+            body: 自定义响应体，默认根据status和text生成
+        """
+        self.status = status
+        self.text = text
+        self.headers = headers or {}
+        self.delay = delay
+        self.body = body
+
+
+class FakeGroqServer:
+    """在后台线程运行的模拟Groq服务
+
+    先按顺序返回queue中的预设响应，用完后调用responder（默认返回"ok"）。
+    收到的请求体记录在requests中。
+    """
+
+    def __init__(self, responder: Optional[Callable[[Dict], FakeResponse]] = None):
+        self.queue: List[FakeResponse] = []
+        self.responder = responder or (lambda body: FakeResponse())
+        self.requests: List[Dict] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _next_response(self, body: Dict) -> FakeResponse:
+        with self._lock:
+            self.requests.append(body)
+            if self.queue:
+                return self.queue.pop(0)
+        return self.responder(body)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                response = server._next_response(body)
+                if response.delay:
+                    time.sleep(response.delay)
+
+                if body.get("stream") and response.status == 200:
+                    self._send_stream(body, response)
+                    return
+
+                if response.body is not None:
+                    payload = response.body
+                elif response.status == 200:
+                    payload = completion_payload(response.text, body.get("model", "fake-model"))
+                else:
+                    payload = {"error": {"message": response.text, "type": "fake_error"}}
+                data = json.dumps(payload, ensure_ascii=False).encode()
+                self.send_response(response.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in response.headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, body, response):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                for key, value in response.headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                for char in response.text:
+                    chunk = {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "fake-model"),
+                        "choices": [{"index": 0, "delta": {"content": char}, "finish_reason": None}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+        return Handler
+
+    def start(self) -> "FakeGroqServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
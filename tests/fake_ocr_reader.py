@@ -0,0 +1,64 @@
+"""
+测试用的EasyOCR读取器替身，不需要下载模型
+
+把每段连续的非黑色行当作一行文字，文字内容为该行的起始y坐标，
+也可以通过labels指定某一行的文字。
+"""
+import numpy as np
+
+
+class FakeReader:
+    """实现readtext、readtext_batched、detect和recognize的假读取器"""
+
+    def __init__(self, *args, labels=None, **kwargs):
+        """
+        Args:
+            labels: 行起始y坐标到文字的映射，recognize时文字框包含该坐标即返回该文字
+        """
+        self.calls = []
+        self.labels = labels or {}
+
+    def readtext(self, array, **kwargs):
+        self.calls.append(("readtext", kwargs))
+        return self._detect(np.asarray(array))
+
+    def readtext_batched(self, arrays, **kwargs):
+        self.calls.append(("readtext_batched", kwargs))
+        return [self._detect(np.asarray(array)) for array in arrays]
+
+    def detect(self, array, **kwargs):
+        self.calls.append(("detect", kwargs))
+        boxes = [[box[0][0], box[1][0], box[0][1], box[2][1]] for box, _, _ in self._detect(np.asarray(array))]
+        return [boxes], [[]]
+
+    def recognize(self, grey, horizontal_list, free_list, allowlist=None, **kwargs):
+        self.calls.append(("recognize", kwargs))
+        results = []
+        for x_min, x_max, y_min, y_max in horizontal_list:
+            text = next((text for y, text in self.labels.items() if y_min <= y <= y_max), f"line{y_min}")
+            if allowlist is not None:
+                text = "".join(char for char in text if char in allowlist)
+            box = [[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]]
+            results.append((box, text, 0.9))
+        return results
+
+    @staticmethod
+    def _detect(array):
+        grey = array.reshape(array.shape[0], array.shape[1], -1).max(axis=2)
+        rows = grey.max(axis=1) > 0
+        results, start = [], None
+        for y, on in enumerate(list(rows) + [False]):
+            if on and start is None:
+                start = y
+            elif not on and start is not None:
+                columns = np.nonzero(grey[start:y].max(axis=0))[0]
+                left, right = int(columns[0]), int(columns[-1]) + 1
+                box = [[left, start], [right, start], [right, y], [left, y]]
+                results.append((box, f"line{start}", 0.9))
+                start = None
+        return results
+
+
+def fake_reader_factory(languages, model_dir, download_enabled, **kwargs):
+    """可以pickle的读取器工厂，供OCRWorkerPool的工作进程使用"""
+    return FakeReader()
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from src.action_scheduler import ActionScheduler, Action, click, hotkey, key, move, type_text, wait
+
+
+class RecordingBackend:
+    """记录调用的假pyautogui"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        def record(*args, **kwargs):
+            self.calls.append((name, args, kwargs, time.monotonic()))
+            if args == ("boom",):
+                raise RuntimeError("boom")
+        return record
+
+@pytest.fixture
+def scheduler():
+    backend = RecordingBackend()
+    scheduler = ActionScheduler(backend)
+    yield scheduler
+    scheduler.close()
+
+def test_actions_run_in_order_without_global_pause(scheduler):
+    """测试动作按顺序执行，瞬间移动，并关闭全局停顿"""
+    results = scheduler.run([move(10, 20), click(), key("enter"), hotkey("ctrl", "c"), type_text("hi")], timeout=5)
+    calls = scheduler.backend.calls
+    assert [name for name, *_ in calls] == ["moveTo", "click", "press", "hotkey", "write"]
+    assert calls[0][1:3] == ((10, 20), {"duration": 0.0, "_pause": False})
+    assert all(kwargs["_pause"] is False for _, _, kwargs, _ in calls)
+    assert [result.error for result in results] == [None] * 5
+
+def test_per_action_delays_follow_monotonic_schedule(scheduler):
+    """测试每个动作的计划时间由各自的delay累加，实际时间接近计划时间"""
+    results = scheduler.run([click(), wait(0.05), click(delay=0.03), key("a", delay=0.02)], timeout=5)
+    start = results[0].scheduled
+    assert [round(result.scheduled - start, 3) for result in results] == [0.0, 0.05, 0.08, 0.1]
+    assert all(0 <= result.lag < 0.05 for result in results)
+    clicks = [at for name, _, _, at in scheduler.backend.calls]
+    assert clicks[2] - clicks[0] == pytest.approx(0.1, abs=0.02)
+
+def test_error_stops_batch_and_cancel(scheduler):
+    """测试出错后停止后续动作，以及取消尚未执行的动作"""
+    results = scheduler.run([key("boom"), key("a")], timeout=5)
+    assert len(results) == 1 and isinstance(results[0].error, RuntimeError)
+
+    batch = scheduler.submit([key("a"), wait(10), key("b")])
+    time.sleep(0.05)
+    batch.cancel()
+    assert [result.action.kind for result in batch.wait(timeout=1)] == ["key"]
+    with pytest.raises(ValueError):
+        scheduler.submit([Action("scroll", {})])
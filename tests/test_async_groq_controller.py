@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from PIL import Image
+from src.async_groq_controller import AsyncGroqController
+from src.groq_errors import GroqControllerError
+
+
+class FakeCompletions:
+    """模拟AsyncGroq的chat.completions接口"""
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.with_raw_response = SimpleNamespace(create=self._raw_create)
+
+    async def _raw_create(self, **kwargs):
+        response = await self.create(**kwargs)
+        return SimpleNamespace(headers={}, parse=lambda: response)
+
+    async def create(self, messages, **kwargs):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            content = messages[-1]["content"]
+            text = content if isinstance(content, str) else content[0]["text"]
+            # 让后发的请求先完成，检查结果顺序
+            await asyncio.sleep(0.01 * (5 - len(text) % 5))
+            if "失败" in text:
+                raise RuntimeError("模拟失败")
+            message = SimpleNamespace(content=f"回复:{text}")
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    """创建使用模拟客户端的异步控制器"""
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    controller = AsyncGroqController(max_concurrency=2)
+    completions = FakeCompletions()
+    controller.async_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    yield controller
+    controller.close()
+
+def test_analyze_images_order_and_errors(controller):
+    """测试批量分析保持顺序，单个失败不影响其他条目"""
+    image = Image.new("RGB", (64, 64))
+    prompts = ["按钮在哪", "失败", "标题是什么", "a", "bb"]
+    results = controller.analyze_images_sync(image, prompts)
+
+    assert [r.index for r in results] == list(range(len(prompts)))
+    assert results[0].value == "回复:按钮在哪"
+    assert not results[1].ok
+    assert isinstance(results[1].error, GroqControllerError)
+    assert results[4].value == "回复:bb"
+
+def test_concurrency_limit(controller):
+    """测试并发数不超过上限"""
+    conversations = [[{"role": "user", "content": str(i)}] for i in range(8)]
+    results = controller.chat_many_sync(conversations)
+    assert all(r.ok for r in results)
+    assert controller.async_client.chat.completions.max_active <= 2
+
+def test_mismatched_lengths(controller):
+    """测试图像和提示词数量不一致"""
+    image = Image.new("RGB", (8, 8))
+    with pytest.raises(ValueError):
+        asyncio.run(controller.analyze_images([image, image], ["a", "b", "c"]))
@@ -0,0 +1,68 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from PIL import Image
+from src.completion_stream import CompletionStream, AsyncCompletionStream
+from src.groq_controller import GroqController
+from src.response_cache import ResponseCache
+
+
+def make_chunk(text):
+    """构造一个模拟的ChatCompletionChunk"""
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+def slow_chunks(parts, delay=0.01):
+    for part in parts:
+        time.sleep(delay)
+        yield make_chunk(part)
+
+def test_stream_aggregates_and_times():
+    """测试增量、回调、完整文本和延迟统计"""
+    received = []
+    stream = CompletionStream(slow_chunks(["x: 0.", "512", None, "\ny: 0.8"]), on_delta=received.append)
+
+    first = next(iter(stream))
+    assert first == "x: 0."
+    assert stream.time_to_first_token is not None
+    assert not stream.finished
+
+    assert stream.result() == "x: 0.512\ny: 0.8"
+    assert received == ["x: 0.", "512", "\ny: 0.8"]
+    assert stream.finished
+    assert stream.total_latency >= stream.time_to_first_token
+
+def test_async_stream():
+    """测试异步流"""
+    async def chunks():
+        for part in ["再来", "一次"]:
+            await asyncio.sleep(0.01)
+            yield make_chunk(part)
+
+    async def run():
+        stream = AsyncCompletionStream(chunks())
+        deltas = [delta async for delta in stream]
+        return deltas, stream
+
+    deltas, stream = asyncio.run(run())
+    assert deltas == ["再来", "一次"]
+    assert stream.text == "再来一次"
+    assert stream.metrics()["total_latency"] is not None
+
+def test_analyze_image_stream_uses_cache(monkeypatch):
+    """测试流式图像分析读完后写入缓存，再次请求直接命中"""
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    controller = GroqController(cache=ResponseCache())
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        assert kwargs["stream"] is True
+        return iter([make_chunk("未找到"), make_chunk("按钮")])
+
+    controller.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    image = Image.new("RGB", (64, 64))
+
+    assert controller.analyze_image_stream(image, "找按钮").result() == "未找到按钮"
+    assert controller.analyze_image_stream(image, "找按钮").result() == "未找到按钮"
+    assert len(calls) == 1
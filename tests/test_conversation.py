@@ -0,0 +1,133 @@
+import pytest
+from src.conversation import Conversation, estimate_tokens
+
+
+class FakeController:
+    """记录请求的模拟控制器"""
+
+    def __init__(self):
+        self.requests = []
+
+    def chat(self, messages, **kwargs):
+        self.requests.append(messages)
+        return f"回复{len(self.requests)}"
+
+    def analyze_image(self, image, prompt, **kwargs):
+        return "界面分析：" + "战斗结算界面，底部有再来一次按钮。" * 50
+
+def test_estimate_tokens():
+    """测试token估算"""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("再来一次") == 4
+    assert estimate_tokens("hello world!") == 3
+
+def test_history_is_kept():
+    """测试历史自动带入后续请求"""
+    controller = FakeController()
+    conversation = Conversation(controller, system_prompt="你是游戏助手")
+    conversation.send("你好")
+    conversation.send("现在在哪个界面？")
+
+    last = controller.requests[-1]
+    assert last[0]["role"] == "system"
+    assert [m["content"] for m in last[1:]] == ["你好", "回复1", "现在在哪个界面？"]
+
+def test_drop_oldest_turns():
+    """测试超出预算时丢弃最早的轮次"""
+    controller = FakeController()
+    conversation = Conversation(controller, token_budget=60, keep_last_turns=1)
+    for i in range(10):
+        conversation.send(f"第{i}个问题" * 3)
+
+    assert conversation.dropped_turns > 0
+    assert conversation.token_count() <= 60
+    assert controller.requests[-1][-1]["content"] == "第9个问题" * 3
+
+def test_summarize_strategy():
+    """测试超出预算时把旧轮次合并进摘要"""
+    summaries = []
+
+    def summarizer(summary, removed):
+        summaries.append(len(removed))
+        return "已讨论过刷本流程"
+
+    controller = FakeController()
+    conversation = Conversation(controller, token_budget=50, strategy="summarize",
+                                keep_last_turns=1, summarizer=summarizer)
+    for i in range(5):
+        conversation.send(f"第{i}个问题" * 3)
+
+    assert summaries
+    assert "已讨论过刷本流程" in controller.requests[-1][0]["content"]
+
+def test_attachments_stored_once():
+    """测试大段分析结果只在参考资料中出现一次"""
+    controller = FakeController()
+    conversation = Conversation(controller, token_budget=100000)
+    attachment = conversation.analyze_image(None, "描述界面", label="当前界面")
+    again = conversation.attach(attachment.text)
+    assert again is attachment
+
+    conversation.send("按钮在哪？", attachments=[attachment])
+    conversation.send("还有别的按钮吗？", attachments=[attachment])
+
+    request = controller.requests[-1]
+    full_text_count = sum(m["content"].count(attachment.text) for m in request)
+    assert full_text_count == 1
+    assert "[附件#1: 当前界面]" in request[-1]["content"]
+
+def test_failed_send_rolls_back():
+    """测试请求失败时撤回用户消息"""
+    class FailingController(FakeController):
+        def chat(self, messages, **kwargs):
+            raise RuntimeError("网络错误")
+
+    conversation = Conversation(FailingController())
+    with pytest.raises(RuntimeError):
+        conversation.send("你好")
+    assert conversation.turns == []
+
+def test_failed_summary_keeps_turns():
+    """测试摘要请求失败时不丢失历史，之后仍能正常摘要"""
+    calls = []
+
+    def summarizer(summary, removed):
+        calls.append(len(removed))
+        if len(calls) == 1:
+            raise RuntimeError("请求过于频繁")
+        return "已讨论过刷本流程"
+
+    conversation = Conversation(FakeController(), token_budget=40, strategy="summarize",
+                                keep_last_turns=1, summarizer=summarizer)
+    for i in range(3):
+        conversation.add_user(f"第{i}个问题" * 3)
+        conversation.add_assistant(f"第{i}个回答" * 3)
+
+    with pytest.raises(RuntimeError):
+        conversation.messages()
+    assert len(conversation.turns) == 3
+    assert conversation.summary == ""
+    assert conversation.dropped_turns == 0
+
+    conversation.messages()
+    assert conversation.summary == "已讨论过刷本流程"
+    assert len(conversation.turns) == 1
+    assert calls[1] == calls[0]
+
+def test_attachments_trimmed_to_budget():
+    """测试附件累积超出预算时移除或截短旧附件"""
+    controller = FakeController()
+    conversation = Conversation(controller, token_budget=300, keep_last_turns=1)
+    old = conversation.attach("旧界面分析。" * 100, "旧界面")
+    for i in range(3):
+        conversation.send(f"第{i}个问题", attachments=[old])
+    current = conversation.attach("当前界面分析。" * 100, "当前界面")
+    conversation.send("按钮在哪？", attachments=[current])
+
+    assert conversation.token_count() <= 300
+    assert old.id not in conversation.attachments
+    assert conversation.evicted_attachments == 1
+    assert "当前界面分析" in controller.requests[-1][0]["content"]
+
+    # 移除附件后新附件的编号不与已有编号重复
+    assert conversation.attach("新的分析结果").id == "#3"
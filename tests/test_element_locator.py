@@ -0,0 +1,65 @@
+import pytest
+from PIL import Image
+from src.element_locator import ElementLocation, parse_locations
+from src.groq_controller import GroqController
+from tests.fake_groq_server import FakeGroqServer, FakeResponse
+
+LABELS = ["再来一次", "退出关卡"]
+
+def test_parse_valid_json():
+    """测试标准JSON回复"""
+    text = '{"再来一次": {"x": 0.62, "y": 0.91, "w": 0.1, "h": 0.05, "confidence": 0.95}, "退出关卡": null}'
+    results = parse_locations(text, LABELS)
+    assert results["再来一次"] == ElementLocation(0.62, 0.91, 0.1, 0.05, 0.95)
+    assert results["退出关卡"] is None
+
+@pytest.mark.parametrize("text", [
+    '```json\n{"再来一次": {"x": 0.62, "y": 0.91,},}\n```',
+    "{'再来一次': {'x': 0.62, 'y': 0.91}}",
+    '{再来一次: {x: 0.62, y: 0.91, confidence: 95}}',
+    '好的，结果如下：{"再来一次": [0.62, 0.91, 0.1, 0.05',
+    '{"elements": [{"label": "再来一次", "x": "62%", "y": "91%"}]}',
+])
+def test_repair_malformed_json(text):
+    """测试本地修复各种格式问题"""
+    location = parse_locations(text, LABELS)["再来一次"]
+    assert location is not None
+    assert location.x == pytest.approx(0.62)
+    assert location.y == pytest.approx(0.91)
+    assert 0 <= location.confidence <= 1
+
+def test_repair_keeps_string_contents():
+    """测试修复只作用于字符串以外的部分，标签中的撇号和逗号不被改写"""
+    labels = ["Don't save", "Retry, later"]
+    text = ("""{"Don't save": {"x": 0.2, "y": 0.8, "note": "it's 'ok', True",}, """
+            """'Retry, later': {x: 0.7, y: 0.8, visible: True,},}""")
+    results = parse_locations(text, labels)
+    assert results["Don't save"] == ElementLocation(0.2, 0.8, 0.0, 0.0, 1.0)
+    assert results["Retry, later"] == ElementLocation(0.7, 0.8, 0.0, 0.0, 1.0)
+
+def test_pixel_coordinates_and_bbox():
+    """测试像素坐标和边界框换算为比例"""
+    text = '{"再来一次": {"bbox": [1100, 950, 1300, 1010]}, "退出关卡": {"x": 192, "y": 108}}'
+    results = parse_locations(text, LABELS, image_size=(1920, 1080))
+    assert results["再来一次"].x == pytest.approx(1200 / 1920)
+    assert results["再来一次"].height == pytest.approx(60 / 1080)
+    assert results["退出关卡"] == ElementLocation(0.1, 0.1, 0.0, 0.0, 1.0)
+
+def test_plain_text_fallback():
+    """测试退回解析旧的 x:/y: 文本格式"""
+    location = parse_locations("x: 0.512\ny: 0.803", ["再来一次"])["再来一次"]
+    assert location.to_absolute(1000, 1000) == (512, 803)
+    assert parse_locations("未找到按钮", ["再来一次"])["再来一次"] is None
+
+def test_locate_elements_uses_json_mode(monkeypatch):
+    """测试locate_elements一次请求并使用JSON模式"""
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    with FakeGroqServer() as server:
+        server.queue.append(FakeResponse(200, '{"再来一次": {"x": 0.5, "y": 0.9}, "退出关卡": null}'))
+        controller = GroqController(base_url=server.base_url)
+        results = controller.locate_elements(Image.new("RGB", (320, 180)), LABELS)
+
+    assert results["再来一次"].to_absolute(1920, 1080) == (960, 972)
+    assert results["退出关卡"] is None
+    assert len(server.requests) == 1
+    assert server.requests[0]["response_format"] == {"type": "json_object"}
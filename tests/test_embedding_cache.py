@@ -0,0 +1,35 @@
+import pytest
+from PIL import Image
+
+torch = pytest.importorskip("torch")
+
+from src.embedding_cache import EmbeddingCache, image_digest
+
+
+def test_digest_depends_on_content_and_model():
+    """测试缓存键随图像内容和模型参数变化"""
+    red = Image.new("RGB", (32, 32), "red")
+    assert image_digest(red, "model") == image_digest(red.copy(), "model")
+    assert image_digest(red, "model") != image_digest(Image.new("RGB", (32, 32), "blue"), "model")
+    assert image_digest(red, "model", "float32") != image_digest(red, "model", "int8")
+
+def test_lru_eviction_under_memory_cap():
+    """测试总大小超过上限时淘汰最久未使用的条目"""
+    cache = EmbeddingCache(max_bytes=3 * 400)
+    for key in "abc":
+        cache.put(key, torch.zeros(100))  # 每个400字节
+    assert cache.get("a") is not None
+    cache.put("d", torch.zeros(100))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.bytes == 3 * 400
+    assert cache.stats()["hits"] == 2
+
+def test_oversized_tensor_not_cached():
+    """测试超过上限的张量不缓存，max_bytes=0时关闭缓存"""
+    cache = EmbeddingCache(max_bytes=100)
+    cache.put("a", torch.zeros(100))
+    assert len(cache) == 0
+    cache.put("b", torch.zeros(10))
+    assert len(cache) == 1
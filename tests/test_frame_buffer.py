@@ -0,0 +1,150 @@
+import time
+
+import numpy as np
+import pytest
+
+from src.frame_buffer import FrameBuffer
+from src.screen_capture import CaptureBackend
+
+
+class CountingBackend(CaptureBackend):
+    """每次截图返回像素值等于截图次数的图像"""
+
+    def __init__(self, size=(40, 30)):
+        self.size = size
+        self.grabs = 0
+
+    def grab(self, region=None):
+        self.grabs += 1
+        width, height = region[2:] if region else self.size
+        return np.full((height, width, 3), self.grabs % 256, dtype=np.uint8)
+
+def test_ring_buffer_accessors():
+    """测试环形缓冲区的latest/at/since在覆盖旧帧后仍然正确"""
+    buffer = FrameBuffer(CountingBackend(), capacity=4)
+    assert buffer.latest() is None and buffer.since(-1) == []
+    for _ in range(6):
+        buffer.capture_once()
+
+    latest = buffer.latest()
+    assert latest.frame_id == 5 and latest.image[0, 0, 0] == 6
+    assert [frame.frame_id for frame in buffer.since(-1)] == [2, 3, 4, 5]
+    assert [frame.frame_id for frame in buffer.since(3)] == [4, 5]
+    oldest = buffer.since(-1)[0]
+    assert buffer.at(oldest.timestamp - 10).frame_id == 2
+    assert buffer.at(latest.timestamp).frame_id == 5
+
+    # 返回的帧是副本，之后写入的帧不会改变它
+    buffer.capture_once()
+    assert latest.image[0, 0, 0] == 6
+
+def test_memory_cap():
+    """测试缓冲帧数受内存上限约束并在stats中报告"""
+    frame_bytes = 40 * 30 * 3
+    buffer = FrameBuffer(CountingBackend(), capacity=100, max_memory_mb=frame_bytes * 10 / 1024 / 1024)
+    buffer.capture_once()
+    stats = buffer.stats()
+    assert buffer.capacity == 10
+    assert stats["memory_bytes"] == frame_bytes * 10 <= stats["max_bytes"]
+
+def test_background_thread():
+    """测试后台线程按帧率截图，wait返回新帧"""
+    backend = CountingBackend()
+    with FrameBuffer(backend, fps=100, capacity=8, region=(0, 0, 8, 4)) as buffer:
+        first = buffer.wait(timeout=1.0)
+        second = buffer.wait(first.frame_id, timeout=1.0)
+        assert second.frame_id > first.frame_id
+        assert second.image.shape == (4, 8, 3)
+        time.sleep(0.1)
+    assert not buffer.running
+    grabs = backend.grabs
+    time.sleep(0.05)
+    assert backend.grabs == grabs
+    assert buffer.stats()["frames"] == grabs
+
+def test_frame_larger_than_memory_cap():
+    """测试一帧超过内存上限时报错，而不是超额分配"""
+    buffer = FrameBuffer(CountingBackend(), max_memory_mb=100 / 1024 / 1024)
+    with pytest.raises(ValueError):
+        buffer.capture_once()
+    assert buffer.memory_bytes == 0
+
+class FlakyBackend(CountingBackend):
+    """前几次截图抛出异常，之后恢复正常"""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def grab(self, region=None):
+        if self.failures > 0:
+            self.failures -= 1
+            raise RuntimeError("display changed")
+        return super().grab(region)
+
+def test_background_errors_are_recorded(capsys):
+    """测试后台截图出错时线程继续运行，记录错误并在恢复后继续截图"""
+    backend = FlakyBackend(failures=3)
+    with FrameBuffer(backend, fps=200, capacity=4) as buffer:
+        frame = buffer.wait(timeout=2.0)
+        assert frame is not None
+        assert buffer.running and buffer.healthy
+    assert buffer.errors == 3 == buffer.stats()["errors"]
+    assert isinstance(buffer.last_error, RuntimeError)
+    out = capsys.readouterr().out
+    assert out.count("后台截图失败") == 1
+    assert "连续失败 3 次后恢复" in out
+
+def test_persistent_errors_mark_unhealthy():
+    """测试截图一直失败时线程仍在运行，但不再视为健康"""
+    with FrameBuffer(FlakyBackend(failures=10 ** 6), fps=200) as buffer:
+        time.sleep(0.05)
+        assert buffer.running and not buffer.healthy
+        assert buffer.errors >= 1 and buffer.latest() is None
+
+class ResizingBackend(CountingBackend):
+    """截图尺寸可以随时改变，模拟调整分辨率或换显示器"""
+
+    def grab(self, region=None):
+        return super().grab(None)
+
+def test_resolution_change_reallocates(capsys):
+    """测试截图尺寸变化后重新分配缓冲区，不再返回变化前的帧"""
+    backend = ResizingBackend(size=(20, 10))
+    frame_bytes = 20 * 10 * 3
+    buffer = FrameBuffer(backend, capacity=8, max_memory_mb=frame_bytes * 4 / 1024 / 1024)
+    for _ in range(3):
+        buffer.capture_once()
+    assert buffer.capacity == 4
+
+    backend.size = (40, 20)
+    frame_id = buffer.capture_once()
+    assert frame_id == 3 and "重新分配缓冲区" in capsys.readouterr().out
+    assert buffer.capacity == 1 and buffer.memory_bytes <= buffer.max_bytes
+    assert buffer.latest().image.shape == (20, 40, 3)
+    assert [frame.frame_id for frame in buffer.since(-1)] == [3]
+    assert buffer.at(0.0).frame_id == 3
+    assert buffer.pixels(np.array([39]), np.array([19]))[0] == 3
+    stats = buffer.stats()
+    assert stats["reallocations"] == 1 and stats["buffered"] == 1
+
+    # 新尺寸超过内存上限时报错，缓冲区清空而不是继续返回旧帧
+    backend.size = (400, 200)
+    with pytest.raises(ValueError):
+        buffer.capture_once()
+    assert buffer.latest() is None and buffer.since(-1) == [] and buffer.at(0.0) is None
+    assert buffer.pixels(np.array([0]), np.array([0])) is None
+    assert buffer.wait(timeout=0.01) is None
+
+def test_background_thread_survives_resolution_change():
+    """测试后台线程在截图尺寸变化后继续写入新尺寸的帧"""
+    backend = ResizingBackend(size=(20, 10))
+    with FrameBuffer(backend, fps=200, capacity=4) as buffer:
+        first = buffer.wait(timeout=1.0)
+        backend.size = (24, 12)
+        deadline = time.monotonic() + 2.0
+        frame = buffer.wait(first.frame_id, timeout=1.0)
+        while frame.image.shape != (12, 24, 3) and time.monotonic() < deadline:
+            frame = buffer.wait(frame.frame_id, timeout=1.0)
+        assert frame.image.shape == (12, 24, 3)
+        assert buffer.healthy and buffer.errors == 0
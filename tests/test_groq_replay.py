@@ -0,0 +1,101 @@
+import asyncio
+import time
+import pytest
+from PIL import Image
+from src.groq_controller import GroqController
+from src.groq_errors import GroqControllerError, GroqServerError
+from src.groq_replay import ReplayClient, RecordingClient
+from tests.fake_groq_server import FakeGroqServer, FakeResponse
+
+MESSAGES = [{"role": "user", "content": "你好"}]
+
+
+@pytest.fixture
+def fixture_file(tmp_path, monkeypatch):
+    """通过本地模拟服务录制一份夹具"""
+    path = str(tmp_path / "groq_fixture.jsonl")
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setenv("GROQ_RECORD_FILE", path)
+    with FakeGroqServer() as server:
+        server.queue.append(FakeResponse(200, "你好，我是助手", headers={"x-ratelimit-remaining-requests": "99"}))
+        server.queue.append(FakeResponse(200, "这是战斗结算界面"))
+        controller = GroqController(base_url=server.base_url)
+        assert isinstance(controller.client, RecordingClient)
+        controller.chat(MESSAGES)
+        controller.analyze_image(Image.new("RGB", (64, 64), "red"), "描述界面")
+    monkeypatch.delenv("GROQ_RECORD_FILE")
+    return path
+
+def test_replay_without_network(fixture_file, monkeypatch):
+    """测试通过环境变量回放录制的响应，不需要API密钥"""
+    monkeypatch.delenv("GROQ_API_KEY")
+    monkeypatch.setenv("GROQ_REPLAY_FILE", fixture_file)
+    controller = GroqController()
+    controller.client.latency_scale = 0
+
+    assert controller.chat(MESSAGES) == "你好，我是助手"
+    # 截图不同但提示词相同，按提示词匹配
+    assert controller.analyze_image(Image.new("RGB", (64, 64), "blue"), "描述界面") == "这是战斗结算界面"
+
+def test_strict_replay_misses(fixture_file, monkeypatch):
+    """测试严格模式下图像不同的请求不匹配"""
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    controller = GroqController(max_retries=0)
+    controller.client = ReplayClient(fixture_file, latency=0, strict=True)
+    with pytest.raises(GroqControllerError):
+        controller.analyze_image(Image.new("RGB", (64, 64), "blue"), "描述界面")
+
+def test_injected_latency_and_errors(fixture_file, monkeypatch):
+    """测试注入延迟和错误率"""
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    controller = GroqController(max_retries=0, coalesce=False)
+    controller.client = ReplayClient(fixture_file, latency=0.05)
+    start = time.perf_counter()
+    controller.chat(MESSAGES)
+    assert time.perf_counter() - start >= 0.05
+
+    controller.client = ReplayClient(fixture_file, latency=0, error_rate=1.0)
+    with pytest.raises(GroqServerError):
+        controller.chat(MESSAGES)
+    assert controller.client.injected_errors == 1
+
+def test_async_replay_without_network(fixture_file, monkeypatch):
+    """测试GROQ_REPLAY_FILE同样作用于异步和批量请求"""
+    from src.async_groq_controller import AsyncGroqController
+    from src.groq_replay import AsyncReplayClient
+
+    monkeypatch.delenv("GROQ_API_KEY")
+    monkeypatch.setenv("GROQ_REPLAY_FILE", fixture_file)
+    # 指向不可达的地址，确认不会访问网络
+    controller = AsyncGroqController(base_url="http://127.0.0.1:9")
+    assert isinstance(controller.async_client, AsyncReplayClient)
+    controller.async_client.latency_scale = 0
+    try:
+        assert asyncio.run(controller.chat_async(MESSAGES)) == "你好，我是助手"
+        # 图像不同，两次请求都不会被合并
+        images = [Image.new("RGB", (64, 64), color) for color in ("blue", "green")]
+        results = controller.analyze_images_sync(images, "描述界面")
+        assert [r.value for r in results] == ["这是战斗结算界面"] * 2
+        assert controller.async_client.calls == 3
+    finally:
+        controller.close()
+
+def test_async_recording(tmp_path, monkeypatch):
+    """测试异步请求也录制到GROQ_RECORD_FILE，且录制结果可以回放"""
+    from src.async_groq_controller import AsyncGroqController
+    from src.groq_replay import AsyncRecordingClient
+
+    path = str(tmp_path / "async_fixture.jsonl")
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setenv("GROQ_RECORD_FILE", path)
+    with FakeGroqServer() as server:
+        server.queue.append(FakeResponse(200, "异步回复"))
+        controller = AsyncGroqController(base_url=server.base_url)
+        assert isinstance(controller.async_client, AsyncRecordingClient)
+        assert asyncio.run(controller.chat_async(MESSAGES)) == "异步回复"
+        controller.close()
+
+    replay = ReplayClient(path, latency=0)
+    response = replay.chat.completions.create(model=controller.model, messages=MESSAGES,
+                                              max_tokens=1000, temperature=0.7)
+    assert response.choices[0].message.content == "异步回复"
@@ -0,0 +1,103 @@
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from src.groq_controller import GroqController
+from src.groq_errors import (
+    GroqServerError, GroqRequestError, GroqAuthenticationError, GroqRateLimitError, parse_duration,
+)
+from src.rate_limiter import RateLimiter
+from tests.fake_groq_server import FakeGroqServer, FakeResponse
+
+MESSAGES = [{"role": "user", "content": "你好"}]
+
+
+@pytest.fixture
+def server():
+    with FakeGroqServer() as server:
+        yield server
+
+
+@pytest.fixture
+def controller(server, monkeypatch):
+    """指向本地模拟服务的控制器，重试等待缩短到毫秒级"""
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setattr("src.groq_controller.backoff_delay",
+                        lambda attempt, retry_after=None: retry_after or 0.01)
+    return GroqController(base_url=server.base_url, max_retries=2)
+
+def test_parse_duration():
+    """测试速率限制头的时长解析"""
+    assert parse_duration("2m59.56s") == pytest.approx(179.56)
+    assert parse_duration("7.66s") == pytest.approx(7.66)
+    assert parse_duration("120ms") == pytest.approx(0.12)
+    assert parse_duration("3") == 3.0
+    assert parse_duration("abc") is None
+
+def test_retry_after_rate_limit(server, controller):
+    """测试429后按retry-after重试成功"""
+    server.queue.append(FakeResponse(429, "rate limited", headers={"retry-after": "0.05"}))
+    server.queue.append(FakeResponse(200, "你好！"))
+    assert controller.chat(MESSAGES) == "你好！"
+    assert len(server.requests) == 2
+
+def test_server_error_exhausts_retries(server, controller):
+    """测试5xx重试用尽后抛出GroqServerError"""
+    server.responder = lambda body: FakeResponse(503, "unavailable")
+    with pytest.raises(GroqServerError) as info:
+        controller.chat(MESSAGES)
+    assert info.value.status_code == 503
+    assert len(server.requests) == 3
+
+def test_client_errors_not_retried(server, controller):
+    """测试4xx错误不重试"""
+    server.queue.append(FakeResponse(400, "bad request"))
+    with pytest.raises(GroqRequestError):
+        controller.chat(MESSAGES)
+    server.queue.append(FakeResponse(401, "invalid key"))
+    with pytest.raises(GroqAuthenticationError):
+        controller.chat(MESSAGES)
+    assert len(server.requests) == 2
+
+def test_rate_limit_without_retries(server, monkeypatch):
+    """测试不重试时直接抛出GroqRateLimitError"""
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    controller = GroqController(base_url=server.base_url, max_retries=0)
+    server.queue.append(FakeResponse(429, "rate limited", headers={"retry-after": "1.5"}))
+    with pytest.raises(GroqRateLimitError) as info:
+        controller.chat(MESSAGES)
+    assert info.value.retry_after == 1.5
+
+def test_limiter_follows_headers(server, controller):
+    """测试额度耗尽时按x-ratelimit-reset-requests等待"""
+    server.queue.append(FakeResponse(200, "a", headers={
+        "x-ratelimit-limit-requests": "10",
+        "x-ratelimit-remaining-requests": "0",
+        "x-ratelimit-reset-requests": "0.3s",
+    }))
+    controller.chat(MESSAGES)
+    start = time.perf_counter()
+    controller.chat(MESSAGES)
+    assert time.perf_counter() - start >= 0.02
+
+def test_token_bucket_reservations():
+    """测试令牌桶对并发预定排队"""
+    limiter = RateLimiter(requests_per_minute=60)
+    waits = [limiter.reserve() for _ in range(62)]
+    assert waits[0] == 0
+    assert waits[-1] == pytest.approx(2.0, abs=0.1)
+
+def test_coalesce_identical_requests(server, controller):
+    """测试相同的并发请求只发出一次"""
+    server.responder = lambda body: FakeResponse(200, "共享回复", delay=0.2)
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        results = list(pool.map(lambda _: controller.chat(MESSAGES), range(5)))
+    assert results == ["共享回复"] * 5
+    assert len(server.requests) == 1
+    assert controller.coalescer.coalesced == 4
+
+def test_stream_through_server(server, controller):
+    """测试流式请求经过本地服务"""
+    server.queue.append(FakeResponse(200, "再来一次"))
+    stream = controller.chat_stream(MESSAGES)
+    assert stream.result() == "再来一次"
+    assert server.requests[0]["stream"] is True
@@ -0,0 +1,44 @@
+import pytest
+from PIL import Image
+from src.image_encoder import ImageEncoder
+
+
+def test_resize_to_max_dimension():
+    """测试按最长边缩放"""
+    encoder = ImageEncoder(max_dimension=640)
+    encoded = encoder.encode(Image.new("RGB", (1920, 1080), color="red"))
+    assert encoded.size == (640, 360)
+    assert encoded.mime_type == "image/jpeg"
+    assert encoded.data_url.startswith("data:image/jpeg;base64,")
+
+def test_max_pixels_budget():
+    """测试总像素预算"""
+    encoder = ImageEncoder(max_dimension=None, max_pixels=100 * 100)
+    encoded = encoder.encode(Image.new("RGB", (400, 100)))
+    width, height = encoded.size
+    assert width * height <= 100 * 100
+
+def test_crop_and_grayscale():
+    """测试区域裁剪和灰度转换"""
+    encoder = ImageEncoder(format="PNG", grayscale=True)
+    encoded = encoder.encode(Image.new("RGB", (200, 200)), region=(10, 20, 50, 30))
+    assert encoded.size == (50, 30)
+    assert encoded.mime_type == "image/png"
+
+def test_cache_by_content():
+    """测试相同内容只编码一次"""
+    encoder = ImageEncoder(cache_size=2)
+    first = encoder.encode(Image.new("RGB", (100, 100), color="blue"))
+    second = encoder.encode(Image.new("RGB", (100, 100), color="blue"))
+    assert first is second
+    assert encoder.hits == 1
+    assert encoder.misses == 1
+
+    encoder.encode(Image.new("RGB", (100, 100), color="green"))
+    encoder.encode(Image.new("RGB", (100, 100), color="white"))
+    assert len(encoder._cache) == 2
+
+def test_invalid_format():
+    """测试不支持的格式"""
+    with pytest.raises(ValueError):
+        ImageEncoder(format="BMP")
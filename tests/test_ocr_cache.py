@@ -0,0 +1,76 @@
+import pytest
+from PIL import Image, ImageDraw
+
+pytest.importorskip("easyocr")
+
+import src.ocr_controller as ocr_controller
+from src.ocr_cache import OCRResultCache
+from src.ocr_controller import OCRController
+from tests.fake_ocr_reader import FakeReader
+
+
+@pytest.fixture
+def fake_reader(monkeypatch, tmp_path):
+    reader = FakeReader()
+    monkeypatch.setattr(ocr_controller.easyocr, "Reader", lambda *a, **k: reader)
+    monkeypatch.setattr(ocr_controller, "_readers", {})
+    monkeypatch.setattr(ocr_controller, "default_model_dir", lambda: str(tmp_path))
+    return reader
+
+def hud(value_width: int) -> Image.Image:
+    image = Image.new("RGB", (400, 300))
+    ImageDraw.Draw(image).rectangle((20, 20, 20 + value_width, 30), fill="white")
+    ImageDraw.Draw(image).rectangle((220, 220, 260, 230), fill="white")
+    return image
+
+def test_unchanged_region_hits_cache(fake_reader):
+    """测试像素不变的区域直接返回缓存，内容或参数变化时重新识别"""
+    ocr = OCRController()
+    first = ocr.recognize_image(hud(40), (10, 10, 100, 40))
+    assert ocr.recognize_image(hud(40), (10, 10, 100, 40)) == first
+    assert len(fake_reader.calls) == 1
+
+    ocr.recognize_image(hud(50), (10, 10, 100, 40))
+    ocr.recognize_image(hud(40), (10, 10, 100, 40), allowlist="0123456789")
+    assert len(fake_reader.calls) == 3
+    assert ocr.cache.stats()["hit_rate"] == pytest.approx(0.25)
+
+def test_cached_result_follows_region_position(fake_reader):
+    """测试相同内容出现在不同位置时命中缓存并换算到新位置"""
+    ocr = OCRController()
+    image = Image.new("RGB", (400, 300))
+    ImageDraw.Draw(image).rectangle((20, 20, 40, 30), fill="white")
+    ImageDraw.Draw(image).rectangle((220, 220, 240, 230), fill="white")
+    assert ocr.recognize_image(image, (10, 10, 50, 30))[0][0][0] == (20, 20)
+    assert ocr.recognize_image(image, (210, 210, 50, 30))[0][0][0] == (220, 220)
+    assert len(fake_reader.calls) == 1
+
+def test_regions_batch_only_changed(fake_reader):
+    """测试多区域识别只把变化的区域送去批量识别"""
+    ocr = OCRController()
+    regions = {"hp": (10, 10, 100, 40), "gold": (210, 210, 100, 40)}
+    ocr.recognize_regions(hud(40), regions)
+    assert ocr.recognize_regions(hud(40), regions) == ocr.recognize_regions(hud(40), regions)
+    assert len(fake_reader.calls) == 1
+
+    results = ocr.recognize_regions(hud(60), regions)
+    assert len(fake_reader.calls) == 2
+    assert results["hp"][0][0][1] == (81, 20)
+    assert ocr.cache.stats()["hits"] == 5
+
+def test_cache_lru_eviction():
+    """测试超过条目上限时淘汰最久未使用的结果"""
+    cache = OCRResultCache(max_entries=2)
+    cache.put("a", [])
+    cache.put("b", [])
+    cache.get("a")
+    cache.put("c", [])
+    assert cache.get("b") is None and cache.get("a") == []
+    assert cache.stats()["evictions"] == 1
+
+def test_cache_disabled(fake_reader):
+    """测试cache_size为0时每次都重新识别"""
+    ocr = OCRController(cache_size=0)
+    ocr.recognize_image(hud(40), (10, 10, 100, 40))
+    ocr.recognize_image(hud(40), (10, 10, 100, 40))
+    assert ocr.cache is None and len(fake_reader.calls) == 2
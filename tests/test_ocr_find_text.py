@@ -0,0 +1,60 @@
+import pytest
+from PIL import Image, ImageDraw
+
+pytest.importorskip("easyocr")
+
+import src.ocr_controller as ocr_controller
+from src.ocr_controller import OCRController, text_similarity
+from tests.fake_ocr_reader import FakeReader
+
+LABELS = {40: "初学者手册", 120: "再来一次", 200: "Exit Game"}
+
+
+@pytest.fixture
+def fake_reader(monkeypatch, tmp_path):
+    reader = FakeReader(labels=LABELS)
+    languages = []
+    monkeypatch.setattr(ocr_controller.easyocr, "Reader", lambda langs, **k: languages.append(langs) or reader)
+    monkeypatch.setattr(ocr_controller, "_readers", {})
+    monkeypatch.setattr(ocr_controller, "default_model_dir", lambda: str(tmp_path))
+    reader.languages = languages
+    return reader
+
+def screen() -> Image.Image:
+    image = Image.new("RGB", (640, 360))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((100, 40, 300, 80), fill="white")   # 5个字，宽高比约5
+    draw.rectangle((100, 120, 260, 160), fill="white")  # 4个字，宽高比约4
+    draw.rectangle((100, 200, 300, 240), fill=(200, 200, 200))
+    return image
+
+def test_text_similarity():
+    """测试全角/半角、大小写和包含关系的相似度"""
+    assert text_similarity("ＥＸＩＴ game", "exit") == 1.0
+    assert text_similarity("再来一欠", "再来一次") == pytest.approx(0.75)
+    assert text_similarity("", "再来一次") == 0.0
+
+def test_find_text_exits_early(fake_reader):
+    """测试按宽高比优先识别最像的文字框，找到后立即返回"""
+    match = OCRController().find_text(screen(), "再来一次")
+    assert match[1] == "再来一次"
+    # 缩小检测后换算回原图，坐标误差在几个像素以内
+    assert match[0][0] == pytest.approx((100, 120), abs=4)
+    recognized = [call for call in fake_reader.calls if call[0] == "recognize"]
+    assert len(recognized) == 1
+
+def test_find_text_region_and_miss(fake_reader):
+    """测试区域坐标换算、仅英文查询使用英文模型、找不到时返回None"""
+    ocr = OCRController()
+    match = ocr.find_text(screen(), "exit game", region=(50, 0, 400, 360))
+    assert match[0][0] == pytest.approx((100, 200), abs=4)
+    assert ["en"] in fake_reader.languages
+    assert ocr.find_text(screen(), "设置") is None
+
+def test_find_text_cached(fake_reader):
+    """测试画面不变时重复查找直接使用缓存"""
+    ocr = OCRController()
+    first = ocr.find_text(screen(), "初学者手册")
+    calls = len(fake_reader.calls)
+    assert ocr.find_text(screen(), "初学者手册") == first
+    assert len(fake_reader.calls) == calls
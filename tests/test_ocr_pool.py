@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+pytest.importorskip("easyocr")
+
+import src.ocr_controller as ocr_controller
+from src.ocr_controller import OCRController, get_reader
+from src.ocr_pool import OCRWorkerPool, split_bands
+from tests.fake_ocr_reader import FakeReader, fake_reader_factory
+
+
+def test_shared_reader(monkeypatch, tmp_path):
+    """测试相同设置的控制器共享一个读取器"""
+    created = []
+    monkeypatch.setattr(ocr_controller.easyocr, "Reader", lambda *a, **k: created.append(a) or FakeReader())
+    monkeypatch.setattr(ocr_controller, "_readers", {})
+    monkeypatch.setattr(ocr_controller, "default_model_dir", lambda: str(tmp_path))
+
+    assert OCRController().reader is OCRController().reader
+    assert get_reader(["en"]) is not OCRController().reader
+    assert len(created) == 2
+
+def test_split_bands_cover_image():
+    """测试条带的核心区域首尾相接覆盖整张图"""
+    bands = split_bands(1080, 4, 64)
+    assert bands[0][2] == 0 and bands[-1][3] == 1080
+    assert all(a[3] == b[2] for a, b in zip(bands, bands[1:]))
+    assert split_bands(100, 8, 64) == [(0, 100, 0, 100)]
+
+def test_pool_band_results_match_single_pass():
+    """测试切条带并行识别的结果与整图识别一致且不重复"""
+    image = Image.new("RGB", (320, 600))
+    draw = ImageDraw.Draw(image)
+    for top in (40, 290, 310, 560):
+        draw.rectangle((10, top, 200, top + 12), fill="white")
+
+    expected = ocr_controller.adjust_result(FakeReader().readtext(np.asarray(image)))
+    with OCRWorkerPool(processes=2, max_pending=2, reader_factory=fake_reader_factory) as pool:
+        results = pool.recognize_image(image, bands=2, overlap=40)
+        assert sorted(bbox for bbox, _, _ in results) == sorted(bbox for bbox, _, _ in expected)
+        assert pool.map([image, image])[1] == expected
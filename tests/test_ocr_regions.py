@@ -0,0 +1,42 @@
+import pytest
+from PIL import Image, ImageDraw
+
+pytest.importorskip("easyocr")
+
+import src.ocr_controller as ocr_controller
+from src.ocr_controller import OCRController
+from tests.fake_ocr_reader import FakeReader
+
+
+@pytest.fixture
+def fake_reader(monkeypatch, tmp_path):
+    reader = FakeReader()
+    monkeypatch.setattr(ocr_controller.easyocr, "Reader", lambda *a, **k: reader)
+    monkeypatch.setattr(ocr_controller, "_readers", {})
+    monkeypatch.setattr(ocr_controller, "default_model_dir", lambda: str(tmp_path))
+    return reader
+
+def test_regions_in_one_batch(fake_reader):
+    """测试多个区域一次批量识别，坐标换算回整张截图"""
+    image = Image.new("RGB", (400, 300))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((20, 20, 60, 30), fill="white")     # 血量
+    draw.rectangle((300, 250, 380, 262), fill="white")  # 金币
+    regions = {"hp": (10, 10, 100, 40), "gold": (290, 240, 100, 30), "empty": (150, 100, 50, 50)}
+
+    results = OCRController().recognize_regions(image, regions)
+
+    assert [call[0] for call in fake_reader.calls] == ["readtext_batched"]
+    assert results["hp"][0][0] == [(20, 20), (61, 20), (61, 31), (20, 31)]
+    assert results["gold"][0][0][0] == (300, 250)
+    assert results["empty"] == []
+
+def test_padding_does_not_create_text(fake_reader):
+    """测试填充区域使用边框颜色，小区域填充后不会多出文字框"""
+    image = Image.new("RGB", (200, 200), "gray")
+    ImageDraw.Draw(image).rectangle((0, 0, 30, 20), fill="black")
+    ImageDraw.Draw(image).rectangle((5, 5, 15, 10), fill="white")
+    ImageDraw.Draw(image).rectangle((0, 100, 199, 199), fill="black")
+    results = OCRController().recognize_regions(image, {"small": (0, 0, 30, 20), "large": (0, 100, 100, 100)})
+    assert [bbox for bbox, _, _ in results["small"]] == [[(5, 5), (16, 5), (16, 11), (5, 11)]]
+    assert results["large"] == []
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from src.frame_buffer import FrameBuffer
+from src.pixel_probe import Probe, ProbeSet
+from src.screen_capture import CaptureBackend
+
+
+def screen() -> np.ndarray:
+    array = np.zeros((100, 200, 3), dtype=np.uint8)
+    array[10, 20] = (255, 0, 0)        # 血条
+    array[50, 150] = (200, 200, 40)    # 按钮高亮
+    return array
+
+def probes() -> ProbeSet:
+    probe_set = ProbeSet(resolution=(200, 100))
+    probe_set.add("hp", 20, 10, (250, 5, 0), tolerance=10)
+    probe_set.add("button", 150, 50, (200, 200, 200), tolerance=20)
+    return probe_set
+
+def test_check_all_probes_at_once():
+    """测试一次比较所有探针，容差按通道最大差值计算"""
+    probe_set = probes()
+    assert probe_set.check(screen()) == {"hp": True, "button": False}
+    assert not probe_set.matches(screen())
+    assert probe_set.bounds == (20, 10, 131, 41)
+
+    # 只截取探针覆盖的区域时通过offset换算坐标
+    left, top, width, height = probe_set.bounds
+    crop = screen()[top:top + height, left:left + width]
+    assert probe_set.check(crop, offset=(left, top)) == {"hp": True, "button": False}
+
+    probe_set.calibrate(screen())
+    assert probe_set.matches(screen())
+
+def test_save_per_resolution(tmp_path):
+    """测试不同分辨率的探针集保存在同一个文件中"""
+    path = str(tmp_path / "probes.json")
+    probes().save(path)
+    ProbeSet([Probe("hp", 40, 20, (255, 0, 0))], resolution=(400, 200)).save(path)
+
+    loaded = ProbeSet.load(path, (200, 100))
+    assert list(loaded) == list(probes())
+    assert ProbeSet.load(path, (400, 200)).names == ["hp"]
+    assert ProbeSet.load(path, (1920, 1080)) is None
+    assert ProbeSet.load(str(tmp_path / "missing.json"), (200, 100)) is None
+
+class StaticBackend(CaptureBackend):
+    def grab(self, region=None):
+        return screen()
+
+def test_probe_from_ring_buffer():
+    """测试直接从环形缓冲区的最新帧取像素"""
+    buffer = FrameBuffer(StaticBackend(), capacity=2)
+    assert buffer.pixels(*probes().points) is None
+    buffer.capture_once()
+    frame_id, _, colors = buffer.pixels(*probes().points)
+    assert frame_id == 0
+    assert probes().compare(colors) == {"hp": True, "button": False}
+
+class RegionBackend(CaptureBackend):
+    def grab(self, region=None):
+        if region is None:
+            return screen()
+        left, top, width, height = region
+        return screen()[top:top + height, left:left + width]
+
+def test_probe_outside_capture_region():
+    """测试探针不在截图区域内时报错，而不是从另一侧取像素"""
+    probe_set = probes()
+    left, top, width, height = probe_set.bounds
+    crop = screen()[top:top + height, left:left + width]
+    probe_set.add("outside", 5, 5, (0, 0, 0))
+    with pytest.raises(ValueError):
+        probe_set.check(crop, offset=(left, top))
+    with pytest.raises(ValueError):
+        probe_set.check(screen()[:, :100])
+
+    buffer = FrameBuffer(RegionBackend(), capacity=2, region=(10, 5, 160, 50))
+    buffer.capture_once()
+    assert probes().compare(buffer.pixels(*probes().points)[2]) == {"hp": True, "button": False}
+    with pytest.raises(ValueError):
+        buffer.pixels(*probe_set.points)
+    with pytest.raises(ValueError):
+        buffer.pixels(np.array([170]), np.array([20]))
@@ -0,0 +1,91 @@
+import time
+from PIL import Image, ImageDraw
+from src.response_cache import ResponseCache, perceptual_hash, hamming_distance
+
+
+def make_screen(offset: int = 0, color: str = "white") -> Image.Image:
+    """生成一张带按钮的模拟界面"""
+    image = Image.new("RGB", (320, 180), color="black")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((100 + offset, 120, 220 + offset, 160), fill=color)
+    return image
+
+def test_perceptual_hash_similarity():
+    """测试相近画面的哈希距离小，不同画面的哈希距离大"""
+    base = perceptual_hash(make_screen())
+    assert hamming_distance(base, perceptual_hash(make_screen(offset=1))) <= 4
+    assert hamming_distance(base, perceptual_hash(make_screen(offset=-100))) > 4
+
+def test_cache_hit_and_miss():
+    """测试命中、未命中和参数隔离"""
+    cache = ResponseCache(tolerance=4)
+    image_hash = cache.image_hash(make_screen())
+    assert cache.get(image_hash, "找按钮", "m", 0.7, 100) is None
+
+    cache.put(image_hash, "找按钮", "m", 0.7, 100, "x: 0.5\ny: 0.8")
+    near_hash = cache.image_hash(make_screen(offset=1))
+    assert cache.get(near_hash, "找按钮", "m", 0.7, 100) == "x: 0.5\ny: 0.8"
+    assert cache.get(image_hash, "找按钮", "m", 0.2, 100) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+def test_cache_lru_and_ttl():
+    """测试LRU淘汰和过期"""
+    cache = ResponseCache(max_entries=2, ttl=0.05, tolerance=0)
+    cache.put(1, "p", "m", 0.7, 100, "a")
+    cache.put(2, "p", "m", 0.7, 100, "b")
+    assert cache.get(1, "p", "m", 0.7, 100) == "a"
+    cache.put(4, "p", "m", 0.7, 100, "c")
+    assert cache.get(2, "p", "m", 0.7, 100) is None
+    assert cache.get(1, "p", "m", 0.7, 100) == "a"
+
+    time.sleep(0.1)
+    assert cache.get(1, "p", "m", 0.7, 100) is None
+    assert cache.stats()["entries"] == 0
+
+def test_cache_persistence(tmp_path):
+    """测试缓存保存到磁盘并在新实例中加载"""
+    path = str(tmp_path / "cache.json")
+    cache = ResponseCache(path=path)
+    cache.put(123, "再来一次", "m", 0.7, 100, "未找到按钮")
+    cache.close()
+
+    restored = ResponseCache(path=path)
+    assert restored.get(123, "再来一次", "m", 0.7, 100) == "未找到按钮"
+
+def test_cache_batched_saves(tmp_path):
+    """测试写入按次数批量保存，close时保存剩余的写入"""
+    path = tmp_path / "cache.json"
+    cache = ResponseCache(path=str(path), save_every=3, save_interval=None)
+    cache.put(1, "p", "m", 0.7, 100, "a")
+    cache.put(2, "p", "m", 0.7, 100, "b")
+    assert not path.exists()
+    cache.put(3, "p", "m", 0.7, 100, "c")
+    assert ResponseCache(path=str(path)).stats()["entries"] == 3
+
+    cache.put(4, "p", "m", 0.7, 100, "d")
+    assert ResponseCache(path=str(path)).stats()["entries"] == 3
+    cache.close()
+    assert ResponseCache(path=str(path)).stats()["entries"] == 4
+    assert list(tmp_path.iterdir()) == [path]
+
+def test_cache_save_interval(tmp_path):
+    """测试距上次保存超过间隔后，下一次写入触发保存"""
+    path = tmp_path / "cache.json"
+    cache = ResponseCache(path=str(path), save_every=100, save_interval=0.05)
+    cache.put(1, "p", "m", 0.7, 100, "a")
+    assert not path.exists()
+    time.sleep(0.1)
+    cache.put(2, "p", "m", 0.7, 100, "b")
+    assert ResponseCache(path=str(path)).stats()["entries"] == 2
+
+def test_cache_separates_response_format():
+    """测试JSON模式和纯文本回复不会互相命中"""
+    cache = ResponseCache(tolerance=0)
+    json_mode = {"type": "json_object"}
+    cache.put(1, "p", "m", 0.0, 100, "纯文本回复")
+    assert cache.get(1, "p", "m", 0.0, 100, json_mode) is None
+
+    cache.put(1, "p", "m", 0.0, 100, '{"x": 1}', json_mode)
+    assert cache.get(1, "p", "m", 0.0, 100, json_mode) == '{"x": 1}'
+    assert cache.get(1, "p", "m", 0.0, 100) == "纯文本回复"
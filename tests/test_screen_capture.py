@@ -0,0 +1,64 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from src import screen_capture
+from src.screen_capture import MSSBackend, PyAutoGUIBackend, get_backend
+
+
+class FakeShot:
+    def __init__(self, monitor):
+        self.width, self.height = monitor["width"], monitor["height"]
+        bgra = np.zeros((self.height, self.width, 4), dtype=np.uint8)
+        bgra[..., 0], bgra[..., 1], bgra[..., 2] = 10, 20, 30   # B, G, R
+        bgra[0, 0, 2] = monitor["left"] % 256
+        self.raw = bytearray(bgra.tobytes())
+
+
+class FakeMSS:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.monitors = [{}, {"left": 0, "top": 0, "width": 64, "height": 48}]
+        self.grabbed = []
+
+    def grab(self, monitor):
+        self.grabbed.append(monitor)
+        self.last = FakeShot(monitor)
+        return self.last
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_mss(monkeypatch):
+    module = types.SimpleNamespace(MSS=FakeMSS)
+    monkeypatch.setitem(sys.modules, "mss", module)
+    return module
+
+def test_mss_grabs_region_as_rgb_view(fake_mss):
+    """测试mss后端只截取请求的区域，并返回截图缓冲区上的RGB视图"""
+    backend = MSSBackend(display=":1")
+    array = backend.grab((100, 20, 16, 8))
+    sct = backend._sct()
+
+    assert sct.kwargs == {"display": ":1"}
+    assert sct.grabbed == [{"left": 100, "top": 20, "width": 16, "height": 8}]
+    assert array.shape == (8, 16, 3)
+    assert tuple(array[1, 1]) == (30, 20, 10)
+    assert array[0, 0, 0] == 100
+    assert np.shares_memory(array, np.frombuffer(sct.last.raw, dtype=np.uint8))
+
+    assert backend.grab().shape == (48, 64, 3)
+    assert backend.grab_image((0, 0, 16, 8)).size == (16, 8)
+
+def test_get_backend(fake_mss, monkeypatch):
+    """测试按名称创建后端，未安装mss时自动退回pyautogui"""
+    monkeypatch.setattr(screen_capture, "_HAS_MSS", True)
+    assert isinstance(get_backend(), MSSBackend)
+    monkeypatch.setattr(screen_capture, "_HAS_MSS", False)
+    assert isinstance(get_backend(), PyAutoGUIBackend)
+    with pytest.raises(ValueError):
+        get_backend("dxcam")
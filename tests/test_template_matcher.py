@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from src.template_matcher import TemplateMatcher, _Level, _Variant
+from scripts.benchmark_image_encoding import synthetic_screenshot
+
+
+@pytest.fixture(scope="module")
+def screen():
+    """在模拟截图上贴一个放大1.25倍的按钮"""
+    array = np.array(synthetic_screenshot())
+    button = array[500:560, 800:920].copy()
+    array[100:175, 300:450] = np.asarray(Image.fromarray(button).resize((150, 75), Image.Resampling.BILINEAR))
+    return array, button
+
+def test_ncc_matches_brute_force():
+    """测试FFT计算的NCC与逐窗口计算一致"""
+    gray = np.random.default_rng(0).random((40, 50)) * 255
+    template = gray[10:18, 20:32]
+    level, variant = _Level(gray), _Variant(template)
+    scores = level.ncc(variant)
+
+    window = gray[3:11, 7:19] - gray[3:11, 7:19].mean()
+    zero_mean = template - template.mean()
+    expected = (window * zero_mean).sum() / np.sqrt((window ** 2).sum() * (zero_mean ** 2).sum())
+    assert scores[3, 7] == pytest.approx(expected)
+    assert np.unravel_index(scores.argmax(), scores.shape) == (10, 20)
+    assert level.ncc_near(variant, 9, 19, 3)[1:] == (10, 20)
+
+def test_locate_with_pyramid_and_region(screen):
+    """测试金字塔粗搜索、多尺度和搜索区域"""
+    array, button = screen
+    matcher = TemplateMatcher(scales=(1.0, 1.25))
+    matcher.add("button", Image.fromarray(button))
+
+    match = matcher.locate(array, "button")
+    assert match[:4] == (800, 500, 120, 60) and match.score > 0.99
+    scaled = matcher.locate(array, "button", region=(250, 50, 300, 200))
+    assert scaled[:4] == (300, 100, 150, 75) and scaled.scale == 1.25
+    assert matcher.locate(array, "button", region=(0, 800, 400, 200)) is None
+
+def test_locate_all_in_one_frame(screen, tmp_path):
+    """测试多个模板共用一帧，模板从文件只读取一次"""
+    array, button = screen
+    path = tmp_path / "button.png"
+    Image.fromarray(button).save(path)
+    matcher = TemplateMatcher(pyramid_factor=1)
+    matcher.add(str(path))
+    matcher.add("corner", array[20:50, 30:90], region=(0, 0, 200, 200))
+    path.unlink()
+
+    results = matcher.locate_all(array)
+    assert results[str(path)][:2] == (800, 500)
+    assert results["corner"][:2] == (30, 20)
+    with pytest.raises(ValueError):
+        matcher.add("flat", np.zeros((10, 10, 3), dtype=np.uint8))
+
+def test_locate_in_cropped_frame(screen):
+    """测试只截取搜索区域时，匹配结果仍换算为屏幕坐标"""
+    array, button = screen
+    matcher = TemplateMatcher(scales=(1.0, 1.25))
+    matcher.add("button", Image.fromarray(button))
+    matcher.add("corner", array[20:50, 30:90], region=(-10, 0, 200, 200))
+    regions = {"button": (250, 50, 300, 200)}
+
+    bounds = matcher.bounds(["button", "corner"], regions, size=(1920, 1080))
+    assert bounds == (0, 0, 550, 250)
+    left, top, width, height = bounds
+    crop = array[top:top + height, left:left + width]
+    assert matcher.locate_all(crop, ["button", "corner"], regions, origin=bounds[:2]) == \
+        matcher.locate_all(array, ["button", "corner"], regions)
+
+    bounds = matcher.bounds(["button"], {"button": (780, 480, 160, 100)})
+    left, top, width, height = bounds
+    match = matcher.locate(array[top:top + height, left:left + width], "button", region=bounds, origin=bounds[:2])
+    assert match[:4] == (800, 500, 120, 60)
+
+    # 有模板需要搜索整个屏幕，或区域在屏幕外时不裁剪
+    assert matcher.bounds(["button", "corner"]) is None
+    assert matcher.bounds(["button"], {"button": (2000, 0, 100, 100)}, size=(1920, 1080)) is None
+
+def labelled_button(text):
+    image = Image.new("RGB", (90, 36), (40, 90, 160))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((2, 2, 87, 33), outline=(230, 230, 230))
+    draw.text((20, 12), text, fill=(255, 255, 255))
+    return image
+
+@pytest.mark.parametrize("left", [300, 301, 305])
+def test_near_duplicate_distractor(left):
+    """测试画面上有相似按钮时，金字塔搜索仍找到完全匹配的位置"""
+    screen = synthetic_screenshot().copy()
+    screen.paste(labelled_button("x18"), (left, 200))
+    screen.paste(labelled_button("x10"), (600, 401))
+    array = np.asarray(screen)
+    matcher = TemplateMatcher()
+    matcher.add("x10", labelled_button("x10"))
+
+    match = matcher.locate(array, "x10")
+    assert match[:4] == (600, 401, 90, 36) and match.score > 0.999
+    brute_force = TemplateMatcher(pyramid_factor=1)
+    brute_force.add("x10", labelled_button("x10"))
+    assert brute_force.locate(array, "x10")[:2] == match[:2]
+
+def test_candidates_refined_at_full_resolution():
+    """测试下采样后与模板完全相同的干扰元素不会挡住真正的匹配"""
+    template = np.asarray(labelled_button("Lv.57").convert("L"))
+    # 每个2x2块内交换左右两列，2倍下采样后与模板相同，原分辨率下不同
+    distractor = template.copy()
+    distractor[:, 0::2], distractor[:, 1::2] = template[:, 1::2], template[:, 0::2]
+    screen = np.array(synthetic_screenshot().convert("L"))
+    screen[100:136, 200:290] = distractor
+    screen[600:636, 1000:1090] = template
+
+    matcher = TemplateMatcher()
+    matcher.add("lv", template)
+    assert matcher.locate(screen, "lv")[:2] == (1000, 600)
@@ -0,0 +1,56 @@
+from src.text_index import TextIndex, normalize_text, text_similarity
+
+
+def box(left, top, width=80, height=30):
+    return [(left, top), (left + width, top), (left + width, top + height), (left, top + height)]
+
+RESULTS = [
+    (box(100, 50), "金幣", 0.95),
+    (box(200, 50), "98321", 0.9),
+    (box(400, 52), "Lv.57", 0.8),
+    (box(100, 300, 160), "再來一次", 0.85),
+    (box(100, 400, 160), "初学者手册", 0.7),
+    (box(900, 900), "ＥＸＩＴ", 0.9),
+]
+
+def test_normalize_text():
+    """测试全角/半角、大小写、空白和繁简体统一"""
+    assert normalize_text("再來 一次") == "再来一次"
+    assert normalize_text("ＥＸＩＴ Game") == "exitgame"
+    assert text_similarity("初學者手冊", "初学者手册") == 1.0
+
+def test_find_fuzzy_and_normalized():
+    """测试按规范化文字精确或模糊查找"""
+    index = TextIndex(RESULTS)
+    assert index.best("再来一次").text == "再來一次"
+    assert index.best("exit").text == "ＥＸＩＴ"
+    assert index.best("初学者手些").text == "初学者手册"
+    assert index.best("设置") is None
+    assert index.best("金币", region=(500, 0, 500, 500)) is None
+
+def test_spatial_queries():
+    """测试最近、区域内和右侧查询"""
+    index = TextIndex(RESULTS, cell_size=64)
+    assert index.nearest(860, 880).text == "ＥＸＩＴ"
+    assert index.nearest(0, 0).text == "金幣"
+    assert index.nearest(0, 0, max_distance=50) is None
+    assert index.nearest(0, 0, query="手册").text == "初学者手册"
+    assert [entry.text for entry in index.inside((0, 0, 600, 100))] == ["金幣", "98321", "Lv.57"]
+    assert [entry.text for entry in index.right_of("金币")] == ["98321", "Lv.57"]
+    assert [entry.text for entry in index.right_of("金币", max_distance=100)] == ["98321"]
+    assert index.right_of("设置") == []
+
+def test_incremental_update():
+    """测试只替换重新识别区域内的结果"""
+    index = TextIndex(RESULTS)
+    index.update([(box(200, 50), "98400", 0.9)], region=(190, 40, 100, 50))
+    assert len(index) == len(RESULTS)
+    assert index.right_of("金币")[0].text == "98400"
+    assert index.best("98321", min_similarity=1.0) is None
+    index.update([(box(10, 10), "暂停", 0.9)])
+    assert [entry.text for entry in index] == ["暂停"]
+
+def test_location_for_clicker():
+    """测试转换为相对坐标的ElementLocation"""
+    location = TextIndex(RESULTS).best("再来一次").location(1000, 1000)
+    assert location.to_absolute(1000, 1000) == (180, 315)
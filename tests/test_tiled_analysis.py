@@ -0,0 +1,45 @@
+import pytest
+from PIL import Image, ImageDraw
+from src.tiled_analysis import TiledAnalyzer, tile_boxes
+
+
+class FakeVLM:
+    """记录每次批量调用的小块，按小块尺寸返回固定的定位结果"""
+
+    def __init__(self):
+        self.batches = []
+
+    def batch_analyze_images(self, images, prompts, micro_batch_size=8, **kwargs):
+        self.batches.append(len(images))
+        return ['{"再来一次": {"x": 0.5, "y": 0.5, "confidence": 0.8}}' for _ in images]
+
+
+def test_tile_boxes_overlap_and_edges():
+    """测试重叠分块覆盖整张图且不越界"""
+    boxes = tile_boxes((1920, 1080), grid=2, overlap=0.2)
+    assert boxes[0] == (0, 0, 960 + 96, 540 + 54)
+    assert boxes[-1] == (960 - 96, 540 - 54, 1920, 1080)
+    with pytest.raises(ValueError):
+        tile_boxes((100, 100), grid=0)
+
+def test_skip_unchanged_tiles():
+    """测试只重新分析像素变化的小块"""
+    vlm = FakeVLM()
+    analyzer = TiledAnalyzer(vlm, grid=2, overlap=0.0)
+    image = Image.new("RGB", (200, 100), "gray")
+    first = analyzer.analyze(image, "描述")
+    assert vlm.batches == [4]
+    assert not any(result.reused for result in first)
+
+    ImageDraw.Draw(image).rectangle((150, 60, 160, 70), fill="red")
+    second = analyzer.analyze(image, "描述")
+    assert vlm.batches == [4, 1]
+    assert [result.reused for result in second] == [True, True, True, False]
+    assert analyzer.stats()["reused"] == 3
+
+def test_locate_elements_full_screen_coordinates():
+    """测试小块坐标换算回全屏比例"""
+    analyzer = TiledAnalyzer(FakeVLM(), grid=2, overlap=0.0, workers=2)
+    location = analyzer.locate_elements(Image.new("RGB", (200, 100)), ["再来一次"])["再来一次"]
+    # 四个小块的中心置信度相同，取第一个（左上角小块的中心）
+    assert location.to_absolute(200, 100) == (50, 25)
@@ -0,0 +1,199 @@
+import os
+
+import pytest
+from PIL import Image
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from src.vlm_controller import VLMController
+from tests.tiny_instructblip import NUM_QUERY_TOKENS, save_tiny_instructblip
+
+IMAGES = [Image.new("RGB", (40, 40), (i * 50, i * 20, 255 - i * 40)) for i in range(5)]
+PROMPTS = [
+    "what is on the screen",
+    "retry",
+    "find the exit button in the battle menu please",
+    "left",
+    "describe this image",
+]
+GREEDY = dict(max_length=16, num_beams=1, temperature=0)
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    """保存到本地目录的微型InstructBLIP模型"""
+    return save_tiny_instructblip(str(tmp_path_factory.mktemp("tiny-instructblip")))
+
+
+@pytest.fixture
+def vlm(model_dir):
+    return VLMController(device="cpu", model_size=model_dir, embedding_cache_mb=0)
+
+
+def test_batches_match_single_prompts(vlm):
+    """测试分批结果按输入顺序返回，且与逐条生成一致"""
+    singles = [vlm.analyze_image(image, prompt, **GREEDY) for image, prompt in zip(IMAGES, PROMPTS)]
+    assert len(set(singles)) == len(singles)
+
+    calls = []
+    language_model = vlm.model.language_model
+    generate = language_model.generate
+    language_model.generate = lambda **kwargs: calls.append(kwargs["inputs_embeds"].shape[0]) or generate(**kwargs)
+
+    # 5条不是2的整数倍，最后一批只有1条
+    assert vlm.batch_analyze_images(IMAGES, PROMPTS, micro_batch_size=2, **GREEDY) == singles
+    assert sorted(calls) == [1, 2, 2]
+    for micro_batch_size in (3, 5, 8):
+        for sort_by_length in (True, False):
+            assert vlm.batch_analyze_images(IMAGES, PROMPTS, micro_batch_size=micro_batch_size,
+                                            sort_by_length=sort_by_length, **GREEDY) == singles
+
+def test_prompts_are_left_padded(vlm):
+    """测试长度不同的提示词在左侧填充，图像占位符在最前面"""
+    loaded = vlm._load_model()
+    assert loaded.processor.tokenizer.padding_side == "left"
+    text_inputs, _ = vlm._tokenize_prompts(loaded.processor, ["retry", "what is on the screen"])
+    mask = text_inputs["attention_mask"]
+    assert mask[:, :NUM_QUERY_TOKENS].all()
+    assert mask[:, -1].all()
+    assert mask[0].sum() < mask[1].sum()
+    # 填充位于图像占位符和文本之间
+    assert not mask[0, NUM_QUERY_TOKENS]
+
+def test_mismatched_inputs(vlm):
+    """测试图像和提示词数量不一致或批大小无效时报错"""
+    with pytest.raises(AssertionError):
+        vlm.batch_analyze_images(IMAGES, PROMPTS[:2])
+    with pytest.raises(ValueError):
+        vlm.batch_analyze_images(IMAGES, PROMPTS, micro_batch_size=0)
+
+@pytest.mark.parametrize("precision,dtype", [
+    ("float32", torch.float32),
+    ("float16", torch.float16),
+    ("bfloat16", torch.bfloat16),
+])
+def test_floating_point_precisions(model_dir, precision, dtype):
+    """测试各浮点精度按对应的dtype加载并可以生成"""
+    vlm = VLMController(device="cpu", model_size=model_dir, precision=precision)
+    assert vlm.analyze_image(IMAGES[0], PROMPTS[0], **GREEDY)
+    assert vlm.model.dtype == dtype
+    assert {p.dtype for p in vlm.model.parameters()} == {dtype}
+    assert "quantize" not in vlm.load_timings[model_dir]
+
+def test_int8_dynamic_quantization(model_dir):
+    """测试int8把线性层替换为动态量化模块，其余参数保持float32"""
+    vlm = VLMController(device="cpu", model_size=model_dir, precision="int8")
+    assert vlm.analyze_image(IMAGES[0], PROMPTS[0], **GREEDY)
+    modules = list(vlm.model.modules())
+    quantized = [m for m in modules if isinstance(m, torch.ao.nn.quantized.dynamic.Linear)]
+    assert quantized
+    assert not any(type(m) is torch.nn.Linear for m in modules)
+    assert quantized[0].weight().dtype == torch.qint8
+    assert vlm.model.dtype == torch.float32
+    assert "quantize" in vlm.load_timings[model_dir]
+
+def test_invalid_precision():
+    """测试未知精度和在GPU上使用int8时报错"""
+    with pytest.raises(ValueError):
+        VLMController(device="cpu", precision="int4")
+    with pytest.raises(ValueError):
+        VLMController(device="cuda", precision="int8")
+
+def test_thread_settings_applied(monkeypatch):
+    """测试num_threads和num_interop_threads传给PyTorch"""
+    calls = {}
+    monkeypatch.setattr(torch, "set_num_threads", lambda n: calls.setdefault("threads", n))
+    monkeypatch.setattr(torch, "get_num_interop_threads", lambda: 1)
+    monkeypatch.setattr(torch, "set_num_interop_threads", lambda n: calls.setdefault("interop", n))
+    VLMController(device="cpu", num_threads=3, num_interop_threads=2)
+    assert calls == {"threads": 3, "interop": 2}
+
+def test_interop_threads_already_fixed(monkeypatch, capsys):
+    """测试inter-op线程数已无法修改时只给出提示，不抛出异常"""
+    def locked(n):
+        raise RuntimeError("cannot set number of interop threads after parallel work has started")
+
+    monkeypatch.setattr(torch, "get_num_interop_threads", lambda: 4)
+    monkeypatch.setattr(torch, "set_num_interop_threads", locked)
+    VLMController(device="cpu", num_interop_threads=2)
+    assert "无法修改inter-op线程数" in capsys.readouterr().out
+
+@pytest.mark.parametrize("num_beams", [1, 3])
+def test_generate_from_embeds_matches_model_generate(vlm, num_beams):
+    """测试从缓存的视觉编码器输出生成的结果与model.generate完全一致"""
+    loaded = vlm._load_model()
+    options = dict(max_length=16, num_beams=num_beams, do_sample=False)
+    cases = [([image], [prompt]) for image, prompt in zip(IMAGES, PROMPTS)]
+    # 长度相同的提示词组成的批次不需要填充
+    cases.append((IMAGES[:2], ["what is on the screen", "where is the retry button"]))
+    for images, prompts in cases:
+        inputs = loaded.processor(images=images, text=prompts, return_tensors="pt", padding=True)
+        with torch.inference_mode():
+            expected = loaded.model.generate(**inputs, **options)
+            actual = vlm._generate_from_embeds(loaded, vlm._image_embeds(loaded, images), prompts, **options)
+        assert torch.equal(actual, expected)
+
+def test_private_accelerate_hook_is_optional(vlm, monkeypatch):
+    """测试transformers中没有_preprocess_accelerate时仍能生成"""
+    loaded = vlm._load_model()
+    monkeypatch.setattr(loaded.model, "hf_device_map", {"": "cpu"}, raising=False)
+    monkeypatch.delattr(type(loaded.model), "_preprocess_accelerate", raising=False)
+    assert vlm.analyze_image(IMAGES[0], PROMPTS[0], **GREEDY)
+
+def test_snapshot_round_trip(model_dir, tmp_path):
+    """测试快照保存后再次加载，输出完全一致，并记录各阶段耗时"""
+    snapshot_dir = str(tmp_path / "snapshots")
+    first = VLMController(device="cpu", model_size=model_dir, snapshot_dir=snapshot_dir)
+    expected = first.analyze_image(IMAGES[1], PROMPTS[2], **GREEDY)
+    timings = first.load_timings[model_dir]
+    assert {"processor", "weights", "snapshot", "to_device", "total"} <= set(timings)
+    snapshot = first._snapshot_path(model_dir)
+    assert os.path.exists(os.path.join(snapshot, "model.safetensors"))
+
+    second = VLMController(device="cpu", model_size=model_dir, snapshot_dir=snapshot_dir)
+    assert second.analyze_image(IMAGES[1], PROMPTS[2], **GREEDY) == expected
+    timings = second.load_timings[model_dir]
+    assert "snapshot" not in timings
+    assert timings["total"] >= timings["weights"] > 0
+    for name, parameter in second.model.state_dict().items():
+        assert torch.equal(parameter, first.model.state_dict()[name])
+
+def test_corrupt_snapshot_falls_back(model_dir, tmp_path):
+    """测试快照损坏时从原始来源加载并重新生成快照"""
+    snapshot_dir = str(tmp_path / "snapshots")
+    expected = VLMController(device="cpu", model_size=model_dir, snapshot_dir=snapshot_dir).analyze_image(
+        IMAGES[0], PROMPTS[0], **GREEDY)
+    vlm = VLMController(device="cpu", model_size=model_dir, snapshot_dir=snapshot_dir)
+    weights = os.path.join(vlm._snapshot_path(model_dir), "model.safetensors")
+    with open(weights, "wb") as f:
+        f.write(b"not a safetensors file")
+
+    assert vlm.analyze_image(IMAGES[0], PROMPTS[0], **GREEDY) == expected
+    assert "snapshot" in vlm.load_timings[model_dir]
+    restored = VLMController(device="cpu", model_size=model_dir, snapshot_dir=snapshot_dir)
+    assert restored.analyze_image(IMAGES[0], PROMPTS[0], **GREEDY) == expected
+    assert "snapshot" not in restored.load_timings[model_dir]
+
+def test_stale_snapshot_is_rebuilt(tmp_path):
+    """测试来源模型更新后不再使用旧快照"""
+    source = save_tiny_instructblip(str(tmp_path / "model"), seed=0)
+    snapshot_dir = str(tmp_path / "snapshots")
+    old = VLMController(device="cpu", model_size=source, snapshot_dir=snapshot_dir).analyze_image(
+        IMAGES[0], PROMPTS[0], **GREEDY)
+
+    save_tiny_instructblip(source, seed=1)
+    fresh = VLMController(device="cpu", model_size=source, embedding_cache_mb=0)
+    expected = fresh.analyze_image(IMAGES[0], PROMPTS[0], **GREEDY)
+    assert expected != old
+
+    vlm = VLMController(device="cpu", model_size=source, snapshot_dir=snapshot_dir)
+    assert vlm.analyze_image(IMAGES[0], PROMPTS[0], **GREEDY) == expected
+    assert "snapshot" in vlm.load_timings[source]
+
+def test_warmup_records_timing(model_dir):
+    """测试后台预热加载模型并记录预热耗时"""
+    vlm = VLMController(device="cpu", model_size=model_dir, warmup=True)
+    assert vlm.wait_until_ready(timeout=60)
+    assert vlm.loaded_models == [model_dir]
+    assert vlm.load_timings[model_dir]["warmup"] > 0
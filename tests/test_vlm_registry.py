@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip("transformers")
+
+from src.vlm_controller import VLMController, MODEL_REGISTRY, _LoadedModel, resolve_model
+
+
+def fake_loaded(name, gigabytes):
+    return _LoadedModel(name, object(), object(), int(gigabytes * 1024 ** 3))
+
+def test_resolve_model_names():
+    """测试注册表名称、别名和本地路径的解析"""
+    assert resolve_model("small") == MODEL_REGISTRY["flan-t5-xl"].repo
+    assert resolve_model("17b") == MODEL_REGISTRY["flan-t5-xxl"].repo
+    assert resolve_model("./models/instructblip") == "./models/instructblip"
+    with pytest.raises(ValueError):
+        resolve_model("huge")
+
+def test_change_model_size_keeps_resident_models():
+    """测试切换默认模型不会卸载已加载的模型"""
+    vlm = VLMController(device="cpu", model_size="small", memory_budget_gb=64, use_server=False)
+    vlm._models[vlm.model_name] = fake_loaded(vlm.model_name, 16)
+    vlm.change_model_size("large")
+    assert vlm.model is None
+    assert vlm.loaded_models == [resolve_model("small")]
+
+def test_lru_eviction_under_budget():
+    """测试按内存预算卸载最久未使用的模型"""
+    vlm = VLMController(device="cpu", precision="float32", memory_budget_gb=30, use_server=False)
+    for name, size in (("a/first", 10), ("a/second", 10)):
+        vlm._models[name] = fake_loaded(name, size)
+    vlm._models.move_to_end("a/first")
+
+    # flan-t5-xl按参数量估算约15GB，只需卸载最久未使用的一个
+    vlm._make_room(resolve_model("small"))
+    assert vlm.loaded_models == ["a/first"]
+
+def test_single_model_without_budget():
+    """测试未设置预算时只保留一个模型"""
+    vlm = VLMController(device="cpu", use_server=False)
+    vlm._models["a/first"] = fake_loaded("a/first", 1)
+    vlm._make_room(resolve_model("small"))
+    assert vlm.loaded_models == []
@@ -0,0 +1,157 @@
+import os
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+from multiprocessing import AuthenticationError
+from src.vlm_server import VLMClient, VLMServer, VLMServerError, authkey_path, default_socket_path
+
+
+class FakeVLM:
+    """记录调用的假控制器，每次推理耗时0.1秒"""
+
+    model_name = "fake-model"
+    device = "cpu"
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def _load_model(self):
+        pass
+
+    def analyze_image(self, image, prompt, **kwargs):
+        return self.batch_analyze_images([image], [prompt], **kwargs)[0]
+
+    def batch_analyze_images(self, images, prompts, **kwargs):
+        with self.lock:
+            self.calls.append(len(images))
+        time.sleep(0.1)
+        if "失败" in prompts:
+            raise ValueError("推理失败")
+        return [f"{prompt}:{image.getpixel((0, 0))[0]}" for image, prompt in zip(images, prompts)]
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = VLMServer(FakeVLM(), socket_path=str(tmp_path / "vlm.sock"), max_batch=8)
+    server.start()
+    yield server
+    server.shutdown()
+
+
+def test_remote_calls_and_stats(server):
+    """测试通过套接字调用并查询健康状态"""
+    client = VLMClient(server.socket_path)
+    image = Image.new("RGB", (8, 8), (7, 0, 0))
+    assert client.call("analyze_image", image=image, prompt="描述") == "描述:7"
+    assert client.call("batch_analyze_images", images=[image, image], prompts=["a", "b"]) == ["a:7", "b:7"]
+    with pytest.raises(VLMServerError):
+        client.call("analyze_image", image=image, prompt="失败")
+
+    stats = client.probe()
+    assert stats["model_name"] == "fake-model"
+    assert stats["processed"] == 3
+    assert stats["queue_depth"] == 0
+    assert stats["latency_p50"] > 0
+
+def test_queued_requests_are_batched(server):
+    """测试排队中参数相同的analyze_image请求合并为一批"""
+    client = VLMClient(server.socket_path)
+    images = [Image.new("RGB", (8, 8), (i, 0, 0)) for i in range(6)]
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(
+            lambda image: client.call("analyze_image", image=image, prompt="p", max_length=16), images
+        ))
+    assert results == [f"p:{i}" for i in range(6)]
+    assert len(server.controller.calls) < 6
+    assert sum(server.controller.calls) == 6
+
+def test_probe_without_server(tmp_path):
+    """测试服务未运行时probe返回None"""
+    assert VLMClient(str(tmp_path / "missing.sock")).probe() is None
+
+
+def test_socket_and_key_are_private(server):
+    """测试套接字创建时即为0600，自动生成的密钥文件为0600"""
+    assert stat.S_IMODE(os.stat(server.socket_path).st_mode) == 0o600
+    key_file = authkey_path(server.socket_path)
+    assert stat.S_IMODE(os.stat(key_file).st_mode) == 0o600
+    assert server.authkey == open(key_file, "rb").read()
+
+def test_client_rejects_untrusted_servers(server, monkeypatch):
+    """测试密钥不一致或套接字不属于当前用户时不连接"""
+    assert VLMClient(server.socket_path, authkey=b"wrong").probe() is None
+    with pytest.raises(AuthenticationError):
+        VLMClient(server.socket_path, authkey=b"wrong").call("stats")
+
+    monkeypatch.setattr(os, "getuid", lambda: os.stat(server.socket_path).st_uid + 1)
+    with pytest.raises(PermissionError):
+        VLMClient(server.socket_path).call("stats")
+    assert VLMClient(server.socket_path).probe() is None
+
+def test_loose_key_file_rejected(server):
+    """测试其他用户可读的密钥文件不被使用"""
+    os.chmod(authkey_path(server.socket_path), 0o644)
+    assert VLMClient(server.socket_path).probe() is None
+
+def test_refuses_shared_directory(tmp_path):
+    """测试套接字所在目录其他用户可写时拒绝启动"""
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    os.chmod(shared, 0o777)
+    with pytest.raises(PermissionError):
+        VLMServer(FakeVLM(), socket_path=str(shared / "vlm.sock")).start()
+
+def test_default_path_in_runtime_dir(tmp_path, monkeypatch):
+    """测试默认套接字位于XDG_RUNTIME_DIR下的私有目录"""
+    monkeypatch.delenv("VLM_SERVER_SOCKET", raising=False)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    assert default_socket_path() == str(tmp_path / "honkai-copilot" / "vlm.sock")
+    server = VLMServer(FakeVLM())
+    server.start()
+    try:
+        assert stat.S_IMODE(os.stat(tmp_path / "honkai-copilot").st_mode) == 0o700
+        assert VLMClient().probe()["model_name"] == "fake-model"
+    finally:
+        server.shutdown()
+
+def test_controller_caches_probe(server):
+    """测试VLMController只在首次使用和连接出错后检查服务"""
+    pytest.importorskip("transformers")
+    from src.vlm_controller import VLMController
+
+    server.controller.model_name = "local/fake-model"
+    vlm = VLMController(device="cpu", model_size="local/fake-model", use_server=True,
+                        server_socket=server.socket_path)
+    probes = []
+    probe = vlm._server.probe
+    vlm._server.probe = lambda: probes.append(1) or probe()
+
+    image = Image.new("RGB", (8, 8), (3, 0, 0))
+    assert vlm.analyze_image(image, "描述") == "描述:3"
+    assert vlm.analyze_image(image, "描述") == "描述:3"
+    assert len(probes) == 1
+
+    def no_local_model(model_name=None):
+        raise RuntimeError("本地没有该模型")
+
+    vlm._load_model = no_local_model
+    server.shutdown()
+    # 服务已退出，转发失败后改为本地推理，下一次调用前重新检查服务
+    with pytest.raises(RuntimeError):
+        vlm.analyze_image(image, "描述")
+    assert len(probes) == 1
+    with pytest.raises(RuntimeError):
+        vlm.analyze_image(image, "描述")
+    assert len(probes) == 2
+
+def test_server_disabled_by_default():
+    """测试默认不使用推理服务"""
+    pytest.importorskip("transformers")
+    from src.vlm_controller import VLMController
+
+    assert VLMController(device="cpu")._server is None
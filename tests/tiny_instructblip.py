@@ -0,0 +1,65 @@
+"""
+测试用的微型InstructBLIP模型，随机初始化，不需要下载权重
+
+分词器按空格切分一个很小的词表，视觉编码器、Q-Former和OPT语言模型都只有一层，
+保存后可以像Hugging Face仓库一样通过本地路径加载。
+"""
+import torch
+from tokenizers import Tokenizer, models, pre_tokenizers
+from transformers import (BlipImageProcessor, InstructBlipConfig, InstructBlipForConditionalGeneration,
+                          InstructBlipProcessor, PreTrainedTokenizerFast)
+
+WORDS = ("what is on the screen where button retry exit describe this image "
+         "a an of in please find left right top bottom battle menu again").split()
+
+NUM_QUERY_TOKENS = 4
+
+
+def _tokenizer() -> PreTrainedTokenizerFast:
+    vocab = {word: index for index, word in enumerate(["<pad>", "<unk>", "<s>", "</s>"] + WORDS)}
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    return PreTrainedTokenizerFast(tokenizer_object=tokenizer, pad_token="<pad>", unk_token="<unk>",
+                                   bos_token="<s>", eos_token="</s>")
+
+
+def build_tiny_instructblip(seed: int = 0):
+    """
+    创建随机初始化的微型模型和处理器
+
+    Returns:
+        (model, processor)
+    """
+    tokenizer = _tokenizer()
+    tokenizer.add_special_tokens({"additional_special_tokens": ["<image>"]})
+    qformer_tokenizer = _tokenizer()
+    processor = InstructBlipProcessor(
+        BlipImageProcessor(size={"height": 32, "width": 32}),
+        tokenizer,
+        qformer_tokenizer,
+        num_query_tokens=NUM_QUERY_TOKENS,
+    )
+    config = InstructBlipConfig(
+        vision_config=dict(hidden_size=32, intermediate_size=64, num_hidden_layers=1, num_attention_heads=2,
+                           image_size=32, patch_size=8),
+        qformer_config=dict(vocab_size=len(qformer_tokenizer), hidden_size=32, intermediate_size=64,
+                            num_hidden_layers=1, num_attention_heads=2, encoder_hidden_size=32,
+                            max_position_embeddings=64),
+        text_config=dict(model_type="opt", vocab_size=len(tokenizer), hidden_size=32, ffn_dim=64,
+                         word_embed_proj_dim=32, num_hidden_layers=1, num_attention_heads=2,
+                         max_position_embeddings=128, pad_token_id=0, bos_token_id=2, eos_token_id=3,
+                         init_std=0.5),
+        num_query_tokens=NUM_QUERY_TOKENS,
+        image_token_index=tokenizer.convert_tokens_to_ids("<image>"),
+    )
+    torch.manual_seed(seed)
+    model = InstructBlipForConditionalGeneration(config).eval()
+    return model, processor
+
+
+def save_tiny_instructblip(path: str, seed: int = 0) -> str:
+    """把微型模型和处理器保存到path，返回path"""
+    model, processor = build_tiny_instructblip(seed)
+    model.save_pretrained(path, safe_serialization=True)
+    processor.save_pretrained(path)
+    return path